@@ -0,0 +1,100 @@
+// ベンチマークの内訳（品質タグ別・元画像の解像度別・クラス別）
+// 結果が1件届くたびにカウンタを足すだけで、最後にまとめて再計算はしない。scripts/breakdown.py と同じ集計
+const RESOLUTION_BUCKETS = [
+  { label: '<200px', max: 200 },
+  { label: '200-299px', max: 300 },
+  { label: '300-399px', max: 400 },
+  { label: '400px+', max: Infinity }
+];
+
+class BenchBreakdown {
+  constructor(numClasses) {
+    this.n = numClasses;
+    // confusion[label * n + pred]。101x101 でも 40KB
+    this.confusion = new Uint32Array(numClasses * numClasses);
+    this.support = new Uint32Array(numClasses);
+    this.predicted = new Uint32Array(numClasses);
+    this.hits = new Uint32Array(numClasses);
+    this.quality = new Map();
+    this.resolution = RESOLUTION_BUCKETS.map(b => BenchBreakdown.group(b.label));
+  }
+
+  static group(label) {
+    return { label, count: 0, correct: 0, inferMs: 0, preMs: 0 };
+  }
+
+  static bucketIndex(width, height) {
+    const side = Math.max(width || 0, height || 0);
+    return RESOLUTION_BUCKETS.findIndex(b => side < b.max);
+  }
+
+  // inferMs: session.run（バッチ時間 / N）、preMs: デコード + リサイズ + 正規化（同じく 1枚あたり）
+  add(item, pred, inferMs, preMs = 0) {
+    const label = item.label;
+    const correct = pred === label;
+    if (label < this.n && pred < this.n) this.confusion[label * this.n + pred]++;
+    if (label < this.n) this.support[label]++;
+    if (pred < this.n) this.predicted[pred]++;
+    if (correct && label < this.n) this.hits[label]++;
+
+    const q = item.quality || 'unknown';
+    if (!this.quality.has(q)) this.quality.set(q, BenchBreakdown.group(q));
+    const groups = [this.quality.get(q)];
+    if (item.width) groups.push(this.resolution[BenchBreakdown.bucketIndex(item.width, item.height)]);
+    groups.forEach(g => {
+      g.count++;
+      if (correct) g.correct++;
+      g.inferMs += inferMs;
+      g.preMs += preMs;
+    });
+  }
+
+  precision(c) {
+    return this.predicted[c] ? this.hits[c] / this.predicted[c] : null;
+  }
+
+  recall(c) {
+    return this.support[c] ? this.hits[c] / this.support[c] : null;
+  }
+
+  perClass() {
+    const rows = [];
+    for (let c = 0; c < this.n; c++) {
+      if (this.support[c] || this.predicted[c]) {
+        rows.push({ index: c, support: this.support[c], precision: this.precision(c), recall: this.recall(c) });
+      }
+    }
+    return rows;
+  }
+
+  // 取り違えの多い (正解, 予測) の組
+  topConfusions(k) {
+    const pairs = [];
+    for (let i = 0; i < this.n; i++) {
+      for (let j = 0; j < this.n; j++) {
+        const count = this.confusion[i * this.n + j];
+        if (i !== j && count > 0) pairs.push({ label: i, pred: j, count });
+      }
+    }
+    return pairs.sort((a, b) => b.count - a.count).slice(0, k);
+  }
+
+  static summarize(g) {
+    return {
+      label: g.label, count: g.count,
+      top1: g.count ? g.correct / g.count * 100 : null,
+      infer_ms: g.count ? g.inferMs / g.count : null,
+      pre_ms: g.count ? g.preMs / g.count : null
+    };
+  }
+
+  // 結果レコード（results.jsonl）用
+  summary() {
+    return {
+      quality: [...this.quality.values()].map(BenchBreakdown.summarize),
+      resolution: this.resolution.filter(g => g.count > 0).map(BenchBreakdown.summarize),
+      per_class: this.perClass(),
+      confusions: this.topConfusions(20)
+    };
+  }
+}
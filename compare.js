@@ -0,0 +1,250 @@
+// モデル比較: 各画像を1回だけデコード・前処理し、同じテンソルを全モデルに渡す（main.js の後に読み込む）
+
+const compareModelList = document.getElementById('compare-models');
+const btnRunCompare = document.getElementById('btn-run-compare');
+const compareProgEl = document.getElementById('compare-prog');
+const compareTableBody = document.getElementById('compare-table-body');
+const compareDiffBody = document.getElementById('compare-diff-body');
+const compareChart = document.getElementById('compare-chart');
+const compareCascadeBody = document.getElementById('compare-cascade-body');
+const compareCascadeTitle = document.getElementById('compare-cascade-title');
+const CASCADE_THRESHOLDS = [0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99];
+
+function initCompareModels() {
+  if (!compareModelList) return;
+  compareModelList.innerHTML = '';
+  MODEL_ENTRIES.forEach(entry => {
+    const label = document.createElement('label');
+    label.className = 'flex items-center gap-2 text-xs';
+    label.innerHTML = `<input type="checkbox" value="${entry.path}" checked> ${entry.name}`;
+    compareModelList.appendChild(label);
+  });
+}
+
+function selectedCompareModels() {
+  const paths = [...compareModelList.querySelectorAll('input:checked')].map(el => el.value);
+  return MODEL_ENTRIES.filter(entry => paths.includes(entry.path));
+}
+
+// 比較用のセッションはプールとは別に作り、終わったら解放する（全モデルを同時に持つため）
+async function createCompareSessions(entries) {
+  const models = [];
+  for (const entry of entries) {
+    compareProgEl.textContent = `${entry.name} を読み込み中...`;
+    const bytes = await fetchModel(entry.path, () => { });
+    const start = performance.now();
+    const s = await ort.InferenceSession.create(bytes, sessionOptions(entry.path));
+    models.push({
+      entry, session: s, uint8: Preprocess.isUint8Model(entry.path), createMs: performance.now() - start,
+      correct: 0, times: [], preds: [], confs: []
+    });
+  }
+  return models;
+}
+
+async function runModel(model, input) {
+  const tensor = Preprocess.makeTensor(input, 1, inputSize);
+  const start = performance.now();
+  const results = await model.session.run({ [model.session.inputNames[0]]: tensor });
+  const time = performance.now() - start;
+  const probs = Preprocess.softmaxInPlace(results[model.session.outputNames[0]].data);
+  return { ...argmax(probs), time };
+}
+
+async function runCompare() {
+  if (isRunning || BENCHMARK_DATA.length === 0) return;
+  const entries = selectedCompareModels();
+  if (entries.length === 0) {
+    alert("比較するモデルを選択してください。");
+    return;
+  }
+  isRunning = true;
+  enableRunButtons(false);
+  btnRunCompare.disabled = true;
+  compareTableBody.innerHTML = '';
+  compareDiffBody.innerHTML = '';
+  compareChart.innerHTML = '';
+  if (compareCascadeBody) compareCascadeBody.innerHTML = '';
+
+  const area = inputSize * inputSize;
+  const floatInput = new Float32Array(3 * area);
+  const uint8Input = new Uint8Array(3 * area);
+  let models = [];
+  const wallStart = performance.now();
+  try {
+    models = await createCompareSessions(entries);
+    const needFloat = models.some(m => !m.uint8);
+    const needUint8 = models.some(m => m.uint8);
+
+    // ウォームアップ（初回のメモリ確保を計測に含めない）
+    for (const m of models) await runModel(m, m.uint8 ? uint8Input : floatInput);
+
+    for (let i = 0; i < BENCHMARK_DATA.length; i++) {
+      const item = BENCHMARK_DATA[i];
+      // デコードと前処理は1枚につき1回だけ
+      const rgba = await Preprocess.centerCrop(await fetchSample(item), inputSize);
+      if (needFloat) Preprocess.fillTensor(rgba, floatInput, 0, area);
+      if (needUint8) Preprocess.fillRGB(rgba, uint8Input, 0, area);
+
+      for (const m of models) {
+        const r = await runModel(m, m.uint8 ? uint8Input : floatInput);
+        m.times.push(r.time);
+        m.preds.push(r.bestIndex);
+        m.confs.push(r.bestProb);
+        if (r.bestIndex === item.label) m.correct++;
+      }
+      if (i % 10 === 0) {
+        compareProgEl.textContent = `${i + 1}/${BENCHMARK_DATA.length}`;
+        await new Promise(r => setTimeout(r, 0));
+      }
+    }
+    compareProgEl.textContent = `${BENCHMARK_DATA.length}/${BENCHMARK_DATA.length}（${((performance.now() - wallStart) / 1000).toFixed(1)}s）`;
+
+    const rows = models.map(summarizeModel);
+    renderCompareTable(rows);
+    renderDisagreements(models);
+    renderPareto(rows);
+    const cascadeRows = renderCascadeSweep(models);
+    window.__compareResult = { rows, cascade: cascadeRows, wallMs: performance.now() - wallStart };
+  } catch (e) {
+    console.error("Comparison failed:", e);
+    alert("比較に失敗しました: " + e.message);
+  } finally {
+    models.forEach(m => m.session.release().catch(() => { }));
+    isRunning = false;
+    enableRunButtons(true);
+    btnRunCompare.disabled = false;
+  }
+}
+
+function summarizeModel(m) {
+  const n = m.times.length;
+  return {
+    name: m.entry.name,
+    file: m.entry.path.split('/').pop(),
+    accuracy: m.correct / n * 100,
+    mean: m.times.reduce((a, b) => a + b, 0) / n,
+    p95: percentile(m.times, 0.95),
+    size: m.entry.size || 0,
+    params: m.entry.params || null,
+    createMs: m.createMs
+  };
+}
+
+function renderCompareTable(rows) {
+  rows.forEach(r => {
+    const row = document.createElement('tr');
+    row.innerHTML = `
+      <td class="text-xs">${r.name}</td>
+      <td class="text-right font-mono text-xs">${r.accuracy.toFixed(1)}%</td>
+      <td class="text-right font-mono text-xs">${r.mean.toFixed(1)}</td>
+      <td class="text-right font-mono text-xs">${r.p95.toFixed(1)}</td>
+      <td class="text-right font-mono text-xs">${r.params ? (r.params / 1e6).toFixed(2) + 'M' : '--'}</td>
+      <td class="text-right font-mono text-xs">${r.size ? (r.size / 1e6).toFixed(1) : '--'}</td>`;
+    compareTableBody.appendChild(row);
+  });
+}
+
+// モデル間で予測が分かれた画像だけを表示する
+function renderDisagreements(models) {
+  let count = 0;
+  BENCHMARK_DATA.forEach((item, i) => {
+    const preds = models.map(m => m.preds[i]);
+    if (preds.every(p => p === preds[0])) return;
+    count++;
+    const imgPath = `./samples/${item.filename}`;
+    const row = document.createElement('tr');
+    row.innerHTML = `
+      <td class="col-img">
+        <img src="${imgPath}" class="w-10 h-10 object-cover rounded border cursor-pointer" onclick="openModal('${imgPath}')">
+      </td>
+      <td class="text-xs">${getLabelName(item.label)}</td>
+      <td class="text-xs">${models.map((m, k) => `
+        <div class="${preds[k] === item.label ? 'text-green-700' : 'text-red-700'}">
+          ${m.entry.name}: ${getLabelName(preds[k])}
+        </div>`).join('')}
+      </td>`;
+    compareDiffBody.appendChild(row);
+  });
+  if (count === 0) {
+    compareDiffBody.innerHTML = '<tr><td colspan="3" class="text-xs text-gray-500 text-center">全モデルの予測が一致しました</td></tr>';
+  }
+}
+
+// 精度 vs 平均レイテンシの散布図。パレート最適（より速く、より正確なモデルがない）点を線で結ぶ
+function renderPareto(rows) {
+  const W = 360, H = 220, PAD = 36;
+  const xs = rows.map(r => r.mean);
+  const ys = rows.map(r => r.accuracy);
+  const xMax = Math.max(...xs) * 1.1 || 1;
+  const yMin = Math.max(0, Math.min(...ys) - 5);
+  const yMax = Math.min(100, Math.max(...ys) + 2);
+  const px = x => PAD + (x / xMax) * (W - 2 * PAD);
+  const py = y => H - PAD - ((y - yMin) / (yMax - yMin || 1)) * (H - 2 * PAD);
+
+  const frontier = rows
+    .filter(r => !rows.some(o => o !== r && o.mean <= r.mean && o.accuracy >= r.accuracy
+      && (o.mean < r.mean || o.accuracy > r.accuracy)))
+    .sort((a, b) => a.mean - b.mean);
+
+  const points = rows.map(r => {
+    const lmfr = r.file.startsWith('lmfrnet');
+    return `
+      <circle cx="${px(r.mean)}" cy="${py(r.accuracy)}" r="${lmfr ? 5 : 4}" fill="${lmfr ? '#2563eb' : '#9ca3af'}"></circle>
+      <text x="${px(r.mean) + 6}" y="${py(r.accuracy) - 6}" font-size="9" fill="#374151">${r.name}</text>`;
+  }).join('');
+
+  compareChart.setAttribute('viewBox', `0 0 ${W} ${H}`);
+  compareChart.innerHTML = `
+    <line x1="${PAD}" y1="${H - PAD}" x2="${W - PAD}" y2="${H - PAD}" stroke="#d1d5db"></line>
+    <line x1="${PAD}" y1="${PAD}" x2="${PAD}" y2="${H - PAD}" stroke="#d1d5db"></line>
+    <text x="${W / 2}" y="${H - 8}" font-size="10" text-anchor="middle" fill="#6b7280">平均レイテンシ (ms)</text>
+    <text x="10" y="${H / 2}" font-size="10" text-anchor="middle" fill="#6b7280" transform="rotate(-90 10 ${H / 2})">Top-1 (%)</text>
+    <text x="${PAD}" y="${H - PAD + 12}" font-size="9" fill="#9ca3af">0</text>
+    <text x="${W - PAD}" y="${H - PAD + 12}" font-size="9" text-anchor="end" fill="#9ca3af">${xMax.toFixed(0)}</text>
+    <text x="${PAD - 4}" y="${py(yMax) + 3}" font-size="9" text-anchor="end" fill="#9ca3af">${yMax.toFixed(0)}</text>
+    <text x="${PAD - 4}" y="${py(yMin) + 3}" font-size="9" text-anchor="end" fill="#9ca3af">${yMin.toFixed(0)}</text>
+    <polyline points="${frontier.map(r => `${px(r.mean)},${py(r.accuracy)}`).join(' ')}"
+      fill="none" stroke="#2563eb" stroke-dasharray="4 3"></polyline>
+    ${points}`;
+}
+
+// カスケードの閾値スイープ: 最速のモデルを1段目、最も正確なモデルを2段目にして、各閾値の結果を計測値から計算する
+// （scripts/cascade.py と同じ計算。画像ごとの推論は上の比較で両モデルとも済んでいる）
+function renderCascadeSweep(models) {
+  if (!compareCascadeBody || models.length < 2) return null;
+  const meanOf = m => m.times.reduce((a, b) => a + b, 0) / m.times.length;
+  const first = models.reduce((a, b) => (meanOf(b) < meanOf(a) ? b : a));
+  const rest = models.filter(m => m !== first);
+  const second = rest.reduce((a, b) => (b.correct > a.correct ? b : a));
+  const n = BENCHMARK_DATA.length;
+  const baseMs = meanOf(second);
+  const baseAcc = second.correct / n * 100;
+  compareCascadeTitle.textContent = `${first.entry.name} → ${second.entry.name}`;
+
+  const rows = CASCADE_THRESHOLDS.map(threshold => {
+    let correct = 0, totalMs = 0, escalated = 0;
+    BENCHMARK_DATA.forEach((item, i) => {
+      const escalate = first.confs[i] < threshold;
+      const pred = escalate ? second.preds[i] : first.preds[i];
+      if (pred === item.label) correct++;
+      totalMs += first.times[i] + (escalate ? second.times[i] : 0);
+      if (escalate) escalated++;
+    });
+    const mean = totalMs / n;
+    return { threshold, top1: correct / n * 100, mean_ms: mean, images_per_sec: 1000 / mean, escalated: escalated / n * 100 };
+  });
+  const fmtRow = (label, r, note) => `
+    <tr>
+      <td class="text-xs">${label}</td>
+      <td class="text-right font-mono text-xs">${r.top1.toFixed(1)}%</td>
+      <td class="text-right font-mono text-xs">${r.mean_ms.toFixed(1)}</td>
+      <td class="text-right font-mono text-xs">${r.images_per_sec.toFixed(1)}</td>
+      <td class="text-right font-mono text-xs">${r.escalated.toFixed(0)}%</td>
+      <td class="text-right font-mono text-xs">${note}</td>
+    </tr>`;
+  compareCascadeBody.innerHTML = rows.map(r => fmtRow(r.threshold.toFixed(2), r,
+    `${(r.top1 - baseAcc >= 0 ? '+' : '')}${(r.top1 - baseAcc).toFixed(1)}pt / ${(r.mean_ms / baseMs).toFixed(2)}x`)).join('')
+    + fmtRow('常に2段目', { top1: baseAcc, mean_ms: baseMs, images_per_sec: 1000 / baseMs, escalated: 100 }, '--');
+  return { first: first.entry.path, second: second.entry.path, rows };
+}
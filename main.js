@@ -1,4 +1,5 @@
-// モデル一覧
+// モデル一覧（models_caltech101/models.json が読めないときの既定）
+const MODEL_MANIFEST = './models_caltech101/models.json';
 const MODEL_OPTIONS = [
   { name: "LMFRNet (Default)", path: "./models_caltech101/lmfrnet.onnx" },
   { name: "LMFRNet Hires", path: "./models_caltech101/lmfrnet_hires.onnx" },
@@ -6,12 +7,43 @@ const MODEL_OPTIONS = [
   { name: "ResNet18", path: "./models_caltech101/resnet18.onnx" }
 ];
 
+let MODEL_ENTRIES = [];
+let loadSeq = 0;
+
+// セッションプール（メインスレッド推論用。ワーカー推論時はワーカー側のプールを使う）
+const DEFAULT_POOL_BUDGET_MB = 64;
+const sessionPool = new SessionPool(DEFAULT_POOL_BUDGET_MB * 1024 * 1024);
+const modelLoadStats = new Map(); // path -> { coldMs, lastSwitchMs, warm, prefetched }
+let pooledKeys = new Set();
+let prefetchTimer = null;
 let LABELS = [];
 let BENCHMARK_DATA = [];
 let session = null;
 let currentModelName = "";
+let currentModelPath = "";
 let isRunning = false;
 
+// Web Worker 推論（OffscreenCanvas が使える環境のみ）
+const workerSupported = typeof Worker !== 'undefined' && typeof OffscreenCanvas !== 'undefined';
+let useWorker = false;
+let inferenceWorker = null;
+
+// 実行設定（EP / WASM スレッド数 / SIMD）。スイープで一番速かった設定を端末ごとに保存する
+const RUNTIME_CONFIG_KEY = 'lmfrnet-runtime-config';
+const DEFAULT_RUNTIME_CONFIG = { ep: 'wasm', numThreads: 1, simd: true }; // iPhone安定優先
+let runtimeConfig = { ...DEFAULT_RUNTIME_CONFIG };
+const SWEEP_IMAGES = 40;
+const SWEEP_WARMUP = 3;
+
+// バッチ推論（dynamic_axes 付きでエクスポートしたモデルのみ N>1 が有効）
+let batchSize = 1;
+let fixedBatchModel = false;
+// 入力解像度（H/W 可変でエクスポートしたモデルのみ 224 以外が有効。scripts/resolution_sweep.py 参照）
+const DEFAULT_INPUT_SIZE = 224;
+let inputSize = DEFAULT_INPUT_SIZE;
+// カスケード: { path, threshold }。1段目（選択中のモデル）の確信度が threshold 未満の画像だけ path で推論し直す
+let cascade = null;
+
 // DOM
 const statusEl = document.getElementById('model-status');
 const modelSelect = document.getElementById('model-select');
@@ -27,8 +59,27 @@ const btnRunBench = document.getElementById('btn-run-bench');
 const btnRunCustom = document.getElementById('btn-run-custom');
 const customResultPanel = document.getElementById('custom-result-panel');
 const modelNameDisplays = document.querySelectorAll('.model-name-display');
+const optWorker = document.getElementById('opt-worker');
+const optBatch = document.getElementById('opt-batch');
+const optInputSize = document.getElementById('opt-input-size');
+const optCascade = document.getElementById('opt-cascade');
+const optCascadeModel = document.getElementById('opt-cascade-model');
+const optCascadeThreshold = document.getElementById('opt-cascade-threshold');
+const benchBatchTimeEl = document.getElementById('bench-batch-time');
+const btnRunSweep = document.getElementById('btn-run-sweep');
+const sweepTableBody = document.getElementById('sweep-table-body');
+const runtimeConfigEl = document.getElementById('runtime-config');
+const optPoolBudget = document.getElementById('opt-pool-budget');
+const poolTableBody = document.getElementById('pool-table-body');
+const btnSaveResults = document.getElementById('btn-save-results');
+const breakdownGroupBody = document.getElementById('breakdown-group-body');
+const breakdownClassBody = document.getElementById('breakdown-class-body');
+const breakdownConfusionEl = document.getElementById('breakdown-confusion');
+const optMemory = document.getElementById('opt-memory');
+const benchMemoryEl = document.getElementById('bench-memory');
 
 let customImages = [];
+let lastResultsRecord = null;
 
 // 初期化
 window.addEventListener('load', async () => {
@@ -40,35 +91,259 @@ window.addEventListener('load', async () => {
 
     // ONNX Runtime Web: CDN を利用
     ort.env.wasm.wasmPaths = 'https://cdn.jsdelivr.net/npm/onnxruntime-web/dist/';
-    ort.env.wasm.numThreads = 1; // iPhone安定優先
-    ort.env.wasm.simd = true;
     ort.env.wasm.proxy = false;
+    // WASM の設定は最初のセッション作成時にしか反映されないので、モデルを読む前に決める
+    applyRuntimeConfig(loadRuntimeConfig());
 
-    initModelSelect();
+    await initModelSelect();
+    initCompareModels();
+    initWorkerOption();
+    initBatchOption();
+    initInputSizeOption();
+    initCascadeOption();
+    initPoolOption();
     await loadLabels();
     await loadSamples();
     renderDatasetGrid();
-    await loadModel(MODEL_OPTIONS[0].path);
+
+    // ?autorun=1&worker=0|1&model=... : scripts/headless_bench.py から自動実行する
+    const params = new URLSearchParams(location.search);
+    if (params.has('worker') && optWorker && workerSupported) {
+      optWorker.checked = useWorker = params.get('worker') !== '0';
+    }
+    if (params.has('size')) {
+      inputSize = parseInt(params.get('size'), 10) || DEFAULT_INPUT_SIZE;
+      if (optInputSize) optInputSize.value = String(inputSize);
+    }
+    if (params.has('batch')) {
+      batchSize = Math.max(1, parseInt(params.get('batch'), 10) || 1);
+      if (optBatch) optBatch.value = String(batchSize);
+    }
+    if (params.get('memory') === '1' && optMemory) optMemory.checked = true;
+    await loadModel(params.get('model') || MODEL_ENTRIES[0].path);
+    if (params.get('autorun') === '1') await runBenchmark();
   } catch (e) {
     console.error("Init Error:", e);
     alert("初期化エラー: " + e.message);
   }
 });
 
-function initModelSelect() {
+// export_pipeline.py / web_manifest.py が書き出すモデル一覧（パス・サイズ・sha256）
+async function loadModelManifest() {
+  try {
+    const res = await fetch(MODEL_MANIFEST, { cache: 'no-cache' });
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    const manifest = await res.json();
+    return manifest.models.map(m => ({
+      ...m, name: m.name === manifest.default ? `${m.label} (Default)` : m.label, file: m.name
+    }));
+  } catch (e) {
+    console.warn("models.json not available, using the built-in model list:", e);
+    return MODEL_OPTIONS;
+  }
+}
+
+async function initModelSelect() {
+  MODEL_ENTRIES = await loadModelManifest();
   modelSelect.innerHTML = '';
-  MODEL_OPTIONS.forEach(opt => {
+  MODEL_ENTRIES.forEach(opt => {
     const option = document.createElement('option');
     option.value = opt.path;
-    option.textContent = opt.name;
+    option.textContent = opt.size ? `${opt.name} - ${(opt.size / 1e6).toFixed(1)} MB` : opt.name;
     modelSelect.appendChild(option);
   });
-  modelSelect.value = MODEL_OPTIONS[0].path;
+  modelSelect.value = MODEL_ENTRIES[0].path;
+  // 選択されたときに初めてダウンロードする（Service Worker は既定モデルだけを事前キャッシュ）
   modelSelect.addEventListener('change', (e) => {
     loadModel(e.target.value);
   });
 }
 
+// sha256 を URL に付けて、モデルが変わったときだけキャッシュを取り直す（sw.js が古い版を消す）
+function modelUrl(path) {
+  const entry = MODEL_ENTRIES.find(m => m.path === path);
+  return entry && entry.sha256 ? `${path}?v=${entry.sha256.slice(0, 16)}` : path;
+}
+
+// モデルを読みながら進捗を表示する（Content-Length がなければ models.json のサイズを使う）
+async function fetchModel(path, onProgress) {
+  const resp = await fetch(modelUrl(path));
+  if (!resp.ok) throw new Error(`HTTP ${resp.status}: ${path}`);
+  const entry = MODEL_ENTRIES.find(m => m.path === path);
+  const total = Number(resp.headers.get('Content-Length')) || (entry && entry.size) || 0;
+  if (!resp.body || !total) return new Uint8Array(await resp.arrayBuffer());
+
+  let bytes = new Uint8Array(total);
+  let received = 0;
+  const reader = resp.body.getReader();
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    if (received + value.length > bytes.length) {
+      const grown = new Uint8Array(Math.max(bytes.length * 2, received + value.length));
+      grown.set(bytes.subarray(0, received));
+      bytes = grown;
+    }
+    bytes.set(value, received);
+    received += value.length;
+    onProgress(received, total);
+  }
+  return received === bytes.length ? bytes : bytes.slice(0, received);
+}
+
+function initWorkerOption() {
+  if (!optWorker) return;
+  optWorker.disabled = !workerSupported;
+  optWorker.checked = workerSupported;
+  useWorker = workerSupported;
+  optWorker.addEventListener('change', () => {
+    useWorker = optWorker.checked;
+    // 使わなくなった側のセッションは解放する
+    if (useWorker) sessionPool.clear();
+    else resetWorker();
+    pooledKeys = new Set();
+    if (currentModelPath) loadModel(currentModelPath);
+  });
+}
+
+function initBatchOption() {
+  if (!optBatch) return;
+  batchSize = parseInt(optBatch.value, 10) || 1;
+  optBatch.addEventListener('change', () => {
+    batchSize = parseInt(optBatch.value, 10) || 1;
+  });
+}
+
+function initInputSizeOption() {
+  if (!optInputSize) return;
+  inputSize = parseInt(optInputSize.value, 10) || DEFAULT_INPUT_SIZE;
+  optInputSize.addEventListener('change', () => {
+    inputSize = parseInt(optInputSize.value, 10) || DEFAULT_INPUT_SIZE;
+  });
+}
+
+function initCascadeOption() {
+  if (!optCascade) return;
+  optCascadeModel.innerHTML = '';
+  MODEL_ENTRIES.forEach(entry => {
+    const option = document.createElement('option');
+    option.value = entry.path;
+    option.textContent = entry.name;
+    optCascadeModel.appendChild(option);
+  });
+  if (MODEL_ENTRIES.length > 1) optCascadeModel.value = MODEL_ENTRIES[1].path;
+  const update = () => {
+    cascade = optCascade.checked
+      ? { path: optCascadeModel.value, threshold: parseFloat(optCascadeThreshold.value) || 0.8 }
+      : null;
+  };
+  [optCascade, optCascadeModel, optCascadeThreshold].forEach(el => el.addEventListener('change', update));
+  update();
+}
+
+function initPoolOption() {
+  if (!optPoolBudget) return;
+  optPoolBudget.value = String(DEFAULT_POOL_BUDGET_MB);
+  optPoolBudget.addEventListener('change', async () => {
+    const budget = (parseInt(optPoolBudget.value, 10) || DEFAULT_POOL_BUDGET_MB) * 1024 * 1024;
+    sessionPool.setBudget(budget, poolKey(currentModelPath));
+    if (inferenceWorker) {
+      const { pool } = await workerCall({ type: 'budget', poolBudget: budget });
+      updatePoolState(pool);
+    } else {
+      updatePoolState(sessionPool.stats());
+    }
+  });
+}
+
+function deviceId() {
+  return `${navigator.userAgent}|${navigator.hardwareConcurrency || 1}`;
+}
+
+function loadRuntimeConfig() {
+  try {
+    const saved = JSON.parse(localStorage.getItem(RUNTIME_CONFIG_KEY));
+    if (saved && saved.device === deviceId()) return saved;
+  } catch (e) { }
+  return DEFAULT_RUNTIME_CONFIG;
+}
+
+function saveRuntimeConfig(config) {
+  localStorage.setItem(RUNTIME_CONFIG_KEY, JSON.stringify({ ...config, device: deviceId(), savedAt: Date.now() }));
+}
+
+function applyRuntimeConfig(config) {
+  // マルチスレッドには SharedArrayBuffer（= cross-origin isolation）が必要
+  const numThreads = self.crossOriginIsolated ? config.numThreads : 1;
+  runtimeConfig = { ep: config.ep, numThreads, simd: config.simd };
+  ort.env.wasm.numThreads = numThreads;
+  ort.env.wasm.simd = config.simd;
+  if (runtimeConfigEl) runtimeConfigEl.textContent = configLabel(runtimeConfig);
+}
+
+function configLabel(config) {
+  if (config.ep !== 'wasm') return config.ep;
+  return `wasm / ${config.numThreads} threads / SIMD ${config.simd ? 'on' : 'off'}`;
+}
+
+function wasmSettings(config = runtimeConfig) {
+  const { wasmPaths } = ort.env.wasm;
+  return { wasmPaths, numThreads: config.numThreads, simd: config.simd, proxy: false };
+}
+
+function sessionOptions(path, ep = runtimeConfig.ep) {
+  // optimize_onnx.py で最適化済みのモデル（*.opt.onnx / *.ort）はブラウザ側で再最適化しない
+  const preoptimized = path.endsWith('.opt.onnx') || path.endsWith('.ort');
+  return {
+    executionProviders: [ep],
+    graphOptimizationLevel: preoptimized ? 'disabled' : 'all'
+  };
+}
+
+// ワーカー1つ分のクライアント（メッセージを id で対応付けて Promise で待つ）
+function createWorkerClient() {
+  const worker = new Worker('./worker.js');
+  const pending = new Map();
+  let seq = 0;
+  worker.onmessage = (e) => {
+    const { id, ok, result, error } = e.data;
+    const p = pending.get(id);
+    if (!p) return;
+    pending.delete(id);
+    ok ? p.resolve(result) : p.reject(new Error(error));
+  };
+  return {
+    call(msg, transfer = []) {
+      return new Promise((resolve, reject) => {
+        const id = ++seq;
+        pending.set(id, { resolve, reject });
+        worker.postMessage({ ...msg, id }, transfer);
+      });
+    },
+    terminate() {
+      worker.terminate();
+      pending.forEach(p => p.reject(new Error('worker terminated')));
+      pending.clear();
+    }
+  };
+}
+
+function workerCall(msg, transfer = []) {
+  return inferenceWorker.call(msg, transfer);
+}
+
+async function ensureWorker() {
+  if (inferenceWorker) return;
+  const client = createWorkerClient();
+  await client.call({ type: 'init', wasm: wasmSettings(), poolBudget: sessionPool.budgetBytes });
+  inferenceWorker = client;
+}
+
+function resetWorker() {
+  if (inferenceWorker) inferenceWorker.terminate();
+  inferenceWorker = null;
+}
+
 async function loadLabels() {
   const res = await fetch('labels.json');
   LABELS = await res.json();
@@ -80,8 +355,11 @@ async function loadSamples() {
 }
 
 async function loadModel(path) {
+  const seq = ++loadSeq;
   const name = path.split('/').pop().replace('.onnx', '');
   currentModelName = name;
+  currentModelPath = path;
+  fixedBatchModel = false;
   updateModelNameDisplay(name);
 
   statusEl.textContent = "ロード中...";
@@ -89,10 +367,34 @@ async function loadModel(path) {
   enableRunButtons(false);
 
   try {
-    session = await ort.InferenceSession.create(path, {
-      executionProviders: ['wasm'],
-      graphOptimizationLevel: 'all'
+    const options = sessionOptions(path);
+    const key = poolKey(path);
+    const size = modelSize(path);
+    const start = performance.now();
+    if (useWorker) await ensureWorker();
+    // プールにあれば（warm）ダウンロードもセッション作成もしない
+    const warm = useWorker ? await workerCall({ type: 'has', key }) : sessionPool.has(key);
+    const bytes = warm ? null : await fetchModel(path, (received, total) => {
+      if (seq === loadSeq) statusEl.textContent = `ダウンロード中 ${Math.min(100, received / total * 100).toFixed(0)}%`;
     });
+    // 読み込み中に別のモデルが選ばれたら、この結果は捨てる
+    if (seq !== loadSeq) return;
+    statusEl.textContent = "ロード中...";
+    let result;
+    if (useWorker) {
+      // セッションはワーカー側だけに持つ
+      result = await workerCall({ type: 'load', key, path, model: bytes, size, options }, bytes ? [bytes.buffer] : []);
+      session = { worker: true };
+      updatePoolState(result.pool);
+    } else {
+      result = await sessionPool.get(key, () => ort.InferenceSession.create(bytes, options), size);
+      if (seq !== loadSeq) return;
+      session = result.session;
+      updatePoolState(sessionPool.stats());
+    }
+    if (seq !== loadSeq) return;
+    recordModelSwitch(path, result, performance.now() - start);
+    schedulePrefetch(path);
     statusEl.textContent = "準備完了";
     statusEl.className = "text-xs px-2 py-1 rounded bg-green-200 text-green-800 font-bold";
     enableRunButtons(true);
@@ -104,6 +406,87 @@ async function loadModel(path) {
   }
 }
 
+// プールのキーは EP ごとに分ける（同じモデルでも wasm と webgpu は別セッション）
+function poolKey(path) {
+  return `${runtimeConfig.ep}|${path}`;
+}
+
+function modelSize(path) {
+  const entry = MODEL_ENTRIES.find(m => m.path === path);
+  return entry && entry.size ? entry.size : 0;
+}
+
+function recordModelSwitch(path, result, switchMs) {
+  const stats = modelLoadStats.get(path) || {};
+  // cold = 実際にセッションを作った時間（ダウンロードを除く）、switch = 選択から準備完了まで
+  if (!result.warm || stats.coldMs === undefined) stats.coldMs = result.createMs;
+  stats.prefetched = false;
+  stats.lastSwitchMs = switchMs;
+  stats.lastWarm = result.warm;
+  modelLoadStats.set(path, stats);
+  renderPoolTable();
+}
+
+function updatePoolState(pool) {
+  pooledKeys = new Set(pool.map(e => e.key));
+  renderPoolTable();
+}
+
+function renderPoolTable() {
+  if (!poolTableBody) return;
+  poolTableBody.innerHTML = '';
+  MODEL_ENTRIES.forEach(entry => {
+    const stats = modelLoadStats.get(entry.path) || {};
+    const pooled = pooledKeys.has(poolKey(entry.path));
+    const state = entry.path === currentModelPath ? '使用中' : (pooled ? (stats.prefetched ? 'prefetch 済み' : 'warm') : '-');
+    const row = document.createElement('tr');
+    row.innerHTML = `
+      <td class="text-xs">${entry.name}</td>
+      <td class="text-xs">${state}</td>
+      <td class="text-right font-mono text-xs">${stats.coldMs !== undefined ? stats.coldMs.toFixed(0) : '--'}</td>
+      <td class="text-right font-mono text-xs">${stats.lastSwitchMs !== undefined
+        ? `${stats.lastSwitchMs.toFixed(0)} (${stats.lastWarm ? 'warm' : 'cold'})` : '--'}</td>
+      <td class="text-right font-mono text-xs">${entry.size ? (SessionPool.estimateBytes(entry.size) / 1e6).toFixed(1) : '--'}</td>`;
+    poolTableBody.appendChild(row);
+  });
+}
+
+// 空き時間に次のモデル（一覧で次のもの）をダウンロードしてセッションまで作っておく
+function schedulePrefetch(path) {
+  if (prefetchTimer) clearTimeout(prefetchTimer);
+  const index = MODEL_ENTRIES.findIndex(m => m.path === path);
+  if (index < 0 || MODEL_ENTRIES.length < 2) return;
+  const next = MODEL_ENTRIES[(index + 1) % MODEL_ENTRIES.length].path;
+  const idle = window.requestIdleCallback || ((cb) => setTimeout(cb, 200));
+  prefetchTimer = setTimeout(() => idle(() => prefetchModel(next).catch(e => console.warn("Prefetch failed:", e))), 1000);
+}
+
+async function prefetchModel(path) {
+  if (isRunning || pooledKeys.has(poolKey(path))) return;
+  const key = poolKey(path);
+  const size = modelSize(path);
+  // 上限を超えるなら prefetch しない（使用中のセッションを追い出さない）
+  const used = [...pooledKeys].reduce((sum, k) => sum + SessionPool.estimateBytes(modelSize(k.split('|')[1])), 0);
+  if (used + SessionPool.estimateBytes(size) > sessionPool.budgetBytes) return;
+  const options = sessionOptions(path);
+  const bytes = await fetchModel(path, () => { });
+  let prefetched;
+  if (useWorker && inferenceWorker) {
+    const r = await workerCall({ type: 'prefetch', key, path, model: bytes, size, options }, [bytes.buffer]);
+    prefetched = r.prefetched;
+    updatePoolState(r.pool);
+  } else {
+    prefetched = await sessionPool.prefetch(key, () => ort.InferenceSession.create(bytes, options), size);
+    updatePoolState(sessionPool.stats());
+  }
+  if (prefetched) {
+    const stats = modelLoadStats.get(path) || {};
+    stats.prefetched = true;
+    modelLoadStats.set(path, stats);
+    renderPoolTable();
+  }
+}
+
 function updateModelNameDisplay(name) {
   modelNameDisplays.forEach(el => el.textContent = `Model: ${name}`);
 }
@@ -111,38 +494,76 @@ function updateModelNameDisplay(name) {
 function enableRunButtons(enabled) {
   btnRunBench.disabled = !enabled;
   btnRunCustom.disabled = !enabled || customImages.length === 0;
+  if (btnRunSweep) btnRunSweep.disabled = !enabled;
+}
+
+// N 枚をまとめて推論する。probs は画像ごとの確率、time はバッチ全体の session.run 時間
+async function runInferenceBatch(blobs) {
+  if (blobs.length > 1 && fixedBatchModel) return runOneByOne(blobs);
+  try {
+    const { logits, time, preMs, wasmBytes } = useWorker
+      ? await workerCall({ type: 'infer', blobs, size: inputSize })
+      : await runSessionMain(blobs, inputSize);
+    return { probs: splitProbs(logits, blobs.length), time, preMs, wasmBytes };
+  } catch (e) {
+    if (blobs.length === 1) throw e;
+    // dynamic_axes なしでエクスポートされたモデル（batch=1 固定）は1枚ずつに戻す
+    console.warn("Batched run failed, falling back to batch=1:", e);
+    fixedBatchModel = true;
+    return runOneByOne(blobs);
+  }
 }
 
-async function runInference(blob) {
-  // 1. 前処理（224センタークロップ、CHW、正規化）
-  const pixelData = await loadAndCenterCrop(blob, 224);
-  const size = 224;
-  const float32Data = new Float32Array(3 * size * size);
-  for (let i = 0; i < size * size; i++) {
-    const r = pixelData[i * 4] / 255.0;
-    const g = pixelData[i * 4 + 1] / 255.0;
-    const b = pixelData[i * 4 + 2] / 255.0;
-    float32Data[i] = (r - 0.485) / 0.229;
-    float32Data[size * size + i] = (g - 0.456) / 0.224;
-    float32Data[2 * size * size + i] = (b - 0.406) / 0.225;
+async function runOneByOne(blobs) {
+  const probs = [];
+  let time = 0;
+  let preMs = 0;
+  let wasmBytes;
+  for (const blob of blobs) {
+    const r = await runInferenceBatch([blob]);
+    probs.push(r.probs[0]);
+    time += r.time;
+    preMs += r.preMs || 0;
+    wasmBytes = r.wasmBytes;
   }
+  return { probs, time, preMs, wasmBytes };
+}
+
+// メインスレッド版: 前処理（センタークロップ、CHW、正規化）した N 枚を1つの Float32Array に詰める
+// 入力バッファとキャンバスは preprocess.js のプールを使い回す
+async function runSessionMain(blobs, size, s = session, path = currentModelPath) {
+  const plane = 3 * size * size;
+  const Type = Preprocess.isUint8Model(path) ? Uint8Array : Float32Array;
+  const inputData = Preprocess.acquire(blobs.length * plane, Type);
+  try {
+    const preStart = performance.now();
+    for (let n = 0; n < blobs.length; n++) {
+      await Preprocess.decodeInto(blobs[n], size, inputData, n * plane);
+    }
+    const preMs = performance.now() - preStart;
 
-  const tensor = new ort.Tensor('float32', float32Data, [1, 3, size, size]);
-  const feeds = { [session.inputNames[0]]: tensor };
+    const tensor = Preprocess.makeTensor(inputData, blobs.length, size);
+    const feeds = { [s.inputNames[0]]: tensor };
 
-  const start = performance.now();
-  const results = await session.run(feeds);
-  const end = performance.now();
+    const start = performance.now();
+    const results = await s.run(feeds);
+    const end = performance.now();
 
-  const output = results[session.outputNames[0]].data;
-  return { probs: softmax(Array.from(output)), time: end - start };
+    return { logits: results[s.outputNames[0]].data, time: end - start, preMs };
+  } finally {
+    Preprocess.release(inputData);
+  }
 }
 
-function softmax(arr) {
-  const max = Math.max(...arr);
-  const exps = arr.map(x => Math.exp(x - max));
-  const sum = exps.reduce((a, b) => a + b, 0);
-  return exps.map(x => x / sum);
+// [N * classes] の logits をその場で softmax し、画像ごとの確率（コピーなしのビュー）に分ける
+function splitProbs(logits, n) {
+  const classes = logits.length / n;
+  const probs = [];
+  for (let k = 0; k < n; k++) {
+    Preprocess.softmaxInPlace(logits, k * classes, classes);
+    probs.push(logits.subarray(k * classes, (k + 1) * classes));
+  }
+  return probs;
 }
 
 function argmax(probs) {
@@ -153,34 +574,51 @@ function argmax(probs) {
   return { bestIndex: best, bestProb: probs[best] };
 }
 
-// 224センタークロップ
-async function loadAndCenterCrop(blob, target) {
-  const url = URL.createObjectURL(blob);
-  try {
-    const img = await new Promise((resolve, reject) => {
-      const image = new Image();
-      image.crossOrigin = "anonymous";
-      image.onload = () => resolve(image);
-      image.onerror = reject;
-      image.src = url;
-    });
+// カスケード用のセッション（メインスレッドのプールから取る。ワーカー使用時もカスケードはメインスレッドで実行）
+async function pooledSession(path, pinned = []) {
+  const key = poolKey(path);
+  const bytes = sessionPool.has(key) ? null : await fetchModel(path, () => { });
+  const { session: s } = await sessionPool.get(
+    key, () => ort.InferenceSession.create(bytes, sessionOptions(path)), modelSize(path), pinned);
+  updatePoolState(sessionPool.stats());
+  return s;
+}
 
-    const canvas = document.createElement('canvas');
-    canvas.width = target;
-    canvas.height = target;
-    const ctx = canvas.getContext('2d');
+async function cascadeStages() {
+  const first = await pooledSession(currentModelPath);
+  const second = await pooledSession(cascade.path, [poolKey(currentModelPath)]);
+  return { first, second };
+}
 
-    const scale = Math.max(target / img.width, target / img.height);
-    const scaledWidth = img.width * scale;
-    const scaledHeight = img.height * scale;
-    const dx = (target - scaledWidth) / 2;
-    const dy = (target - scaledHeight) / 2;
+// バッチ固定のモデルは1枚ずつに戻す
+async function runStage(s, path, blobs) {
+  try {
+    const { logits, time, preMs } = await runSessionMain(blobs, inputSize, s, path);
+    return { probs: splitProbs(logits, blobs.length), time, preMs };
+  } catch (e) {
+    if (blobs.length === 1) throw e;
+    const out = { probs: [], time: 0, preMs: 0 };
+    for (const blob of blobs) {
+      const r = await runStage(s, path, [blob]);
+      out.probs.push(r.probs[0]);
+      out.time += r.time;
+      out.preMs += r.preMs;
+    }
+    return out;
+  }
+}
 
-    ctx.drawImage(img, dx, dy, scaledWidth, scaledHeight);
-    return ctx.getImageData(0, 0, target, target).data;
-  } finally {
-    URL.revokeObjectURL(url);
+async function runCascadeBatch(blobs, stages) {
+  const r = await runStage(stages.first, currentModelPath, blobs);
+  const unsure = [];
+  r.probs.forEach((p, k) => { if (argmax(p).bestProb < cascade.threshold) unsure.push(k); });
+  if (unsure.length > 0) {
+    const r2 = await runStage(stages.second, cascade.path, unsure.map(k => blobs[k]));
+    unsure.forEach((k, j) => { r.probs[k] = r2.probs[j]; });
+    r.time += r2.time;
+    r.preMs += r2.preMs;
   }
+  return { ...r, escalated: unsure.length };
 }
 
 // ベンチマーク
@@ -201,61 +639,388 @@ async function runBenchmark() {
   benchProgressBar.style.width = '0%';
   benchProgressContainer.style.display = 'block';
 
-  let correct = 0;
-  let totalTime = 0;
-  let totalConf = 0;
+  const stats = {
+    correct: 0, totalTime: 0, totalConf: 0, count: 0, times: [], batchTimes: [], images: [],
+    breakdown: new BenchBreakdown(LABELS.length || 101), escalated: 0, memory: new MemoryTracker()
+  };
+  renderBreakdown(stats.breakdown, true);
+  if (benchBatchTimeEl) benchBatchTimeEl.textContent = '';
+  if (benchMemoryEl) benchMemoryEl.textContent = '';
+  const measureUA = !!(optMemory && optMemory.checked);
+  const workerRun = useWorker && !cascade;
+  // 計測開始時点（モデル読み込み後）のメモリ。ワーカー版の WASM ヒープはワーカー側の値
+  if (measureUA) benchProgEl.textContent = 'メモリ計測中...';
+  await stats.memory.start(await wasmHeapBytes(workerRun), measureUA);
+  const batches = chunk(BENCHMARK_DATA, batchSize);
+  const wallStart = performance.now();
+
+  let infer = runInferenceBatch;
+  if (cascade) {
+    try {
+      const stages = await cascadeStages();
+      infer = (blobs) => runCascadeBatch(blobs, stages);
+    } catch (e) {
+      console.error("Cascade setup failed:", e);
+      alert("カスケードの2段目のモデルを読み込めませんでした: " + e.message);
+      isRunning = false;
+      enableRunButtons(true);
+      benchProgressContainer.style.display = 'none';
+      return;
+    }
+  }
 
-  for (let i = 0; i < BENCHMARK_DATA.length; i++) {
-    const item = BENCHMARK_DATA[i];
-    const imgPath = `./samples/${item.filename}`;
+  if (workerRun) {
+    await runBenchmarkWorker(stats, batches);
+  } else {
+    for (let i = 0; i < batches.length; i++) {
+      const items = batches[i];
+      try {
+        const blobs = await Promise.all(items.map(fetchSample));
+        recordBenchBatch(stats, items, await infer(blobs));
+      } catch (e) {
+        console.error(`Error processing ${items.map(item => item.filename).join(', ')}:`, e);
+      }
+
+      await new Promise(r => setTimeout(r, 0));
+    }
+  }
+
+  // ヘッドレス計測用に結果を公開する（time は session.run のみ）
+  const wallMs = performance.now() - wallStart;
+  if (measureUA) benchProgEl.textContent = 'メモリ計測中...';
+  await stats.memory.finish(await wasmHeapBytes(workerRun), measureUA);
+  benchProgEl.textContent = `${stats.count}/${BENCHMARK_DATA.length}`;
+  renderMemory(stats.memory.summary());
+  lastResultsRecord = stats.count > 0 ? buildResultsRecord(stats, wallMs) : null;
+  if (btnSaveResults) btnSaveResults.disabled = !lastResultsRecord;
+  window.__benchResult = {
+    model: currentModelName,
+    worker: workerRun,
+    escalated: stats.escalated,
+    memory: stats.memory.summary(),
+    count: stats.count,
+    correct: stats.correct,
+    times: stats.times,
+    batchSize,
+    batchTimes: stats.batchTimes,
+    wallMs,
+    record: lastResultsRecord
+  };
+
+  renderBreakdown(stats.breakdown, true);
+  if (stats.count === 0 && inputSize !== DEFAULT_INPUT_SIZE) {
+    alert(`このモデルは ${inputSize}px の入力に対応していません（入力サイズ固定でエクスポートされたモデル）。`);
+  }
+  isRunning = false;
+  enableRunButtons(true);
+  benchProgressContainer.style.display = 'none';
+}
+
+// scripts/results_log.py と同じ形式の結果レコード（check_regression.py でベースラインと比較できる）
+function buildResultsRecord(stats, wallMs) {
+  const entry = MODEL_ENTRIES.find(m => m.path === currentModelPath) || {};
+  const mean = stats.totalTime / stats.count;
+  return {
+    schema: 1,
+    source: 'web',
+    timestamp: new Date().toISOString(),
+    model: { file: currentModelPath.split('/').pop(), sha256: entry.sha256 || null, size: entry.size || null },
+    runtime: {
+      runtime: 'onnxruntime-web',
+      version: (ort.env.versions && ort.env.versions.web) || null,
+      provider: runtimeConfig.ep,
+      threads: runtimeConfig.numThreads,
+      simd: runtimeConfig.simd,
+      batch_size: fixedBatchModel ? 1 : batchSize,
+      input_size: inputSize,
+      worker: useWorker && !cascade,
+      cascade: cascade ? `${cascade.path.split('/').pop()}@${cascade.threshold}` : null
+    },
+    device: {
+      user_agent: navigator.userAgent,
+      platform: navigator.platform,
+      hardware_concurrency: navigator.hardwareConcurrency || null,
+      device_memory: navigator.deviceMemory || null,
+      cross_origin_isolated: !!self.crossOriginIsolated,
+      webgpu: !!navigator.gpu
+    },
+    aggregates: {
+      count: stats.count,
+      top1: stats.correct / stats.count * 100,
+      mean_ms: mean,
+      p50_ms: percentile(stats.times, 0.5),
+      p95_ms: percentile(stats.times, 0.95),
+      p99_ms: percentile(stats.times, 0.99),
+      images_per_sec: stats.count / (wallMs / 1000),
+      wall_ms: wallMs
+    },
+    images: stats.images,
+    breakdown: stats.breakdown.summary(),
+    memory: stats.memory.summary()
+  };
+}
 
+async function wasmHeapBytes(workerRun) {
+  if (!workerRun) return WasmMemories.bytes();
+  const { wasmBytes } = await workerCall({ type: 'memory' });
+  return wasmBytes;
+}
+
+function renderMemory(m) {
+  if (!benchMemoryEl) return;
+  const mb = (bytes) => `${(bytes / 1024 / 1024).toFixed(1)}MB`;
+  const parts = [];
+  if (m.wasm_heap) parts.push(`WASM ${mb(m.wasm_heap.start)} → 最大 ${mb(m.wasm_heap.peak)}`);
+  if (m.js_heap) parts.push(`JS ${mb(m.js_heap.start)} → 最大 ${mb(m.js_heap.peak)}`);
+  if (m.ua_start && m.ua_end) parts.push(`ページ全体 ${mb(m.ua_start.bytes)} → ${mb(m.ua_end.bytes)}`);
+  benchMemoryEl.textContent = parts.length ? `メモリ: ${parts.join(' / ')}` : '';
+}
+
+// 結果レコードを JSONL で保存する（results/results.jsonl に追記して check_regression.py に渡す）
+function saveResults() {
+  if (!lastResultsRecord) return;
+  const blob = new Blob([JSON.stringify(lastResultsRecord) + '\n'], { type: 'application/x-ndjson' });
+  const a = document.createElement('a');
+  a.href = URL.createObjectURL(blob);
+  a.download = `results-${lastResultsRecord.model.file.replace(/\.[^.]+$/, '')}-${Date.now()}.jsonl`;
+  a.click();
+  setTimeout(() => URL.revokeObjectURL(a.href), 1000);
+}
+
+function chunk(items, size) {
+  const out = [];
+  for (let i = 0; i < items.length; i += size) out.push(items.slice(i, i + size));
+  return out;
+}
+
+function fetchSample(item) {
+  return fetch(`./samples/${item.filename}`).then(r => r.blob());
+}
+
+// ワーカー版: 先読みして常に数バッチをワーカーに渡しておく（N+1 番目のデコードを N 番目の推論と重ねる）
+async function runBenchmarkWorker(stats, batches, inFlight = 3) {
+  const queue = [];
+  let next = 0;
+  const submit = () => {
+    const items = batches[next++];
+    queue.push({ items, promise: Promise.all(items.map(fetchSample)).then(runInferenceBatch) });
+  };
+  while (next < batches.length && queue.length < inFlight) submit();
+
+  while (queue.length > 0) {
+    const { items, promise } = queue.shift();
+    if (next < batches.length) submit();
     try {
-      const resp = await fetch(imgPath);
-      const blob = await resp.blob();
+      recordBenchBatch(stats, items, await promise);
+    } catch (e) {
+      console.error(`Error processing ${items.map(item => item.filename).join(', ')}:`, e);
+    }
+  }
+}
 
-      const { probs, time } = await runInference(blob);
-      const { bestIndex, bestProb } = argmax(probs);
-      const isCorrect = bestIndex === item.label;
+// 1バッチ分の結果を記録する（1枚あたりの時間はバッチ時間 / N）
+function recordBenchBatch(stats, items, { probs, time, preMs = 0, escalated = 0, wasmBytes }) {
+  stats.batchTimes.push(time);
+  stats.memory.sample(wasmBytes);
+  stats.escalated += escalated;
+  items.forEach((item, k) => recordBenchResult(stats, item, probs[k], time / items.length, preMs / items.length));
+  renderBreakdown(stats.breakdown, false);
+  if (benchBatchTimeEl) {
+    const meanBatch = stats.batchTimes.reduce((a, b) => a + b, 0) / stats.batchTimes.length;
+    benchBatchTimeEl.textContent = cascade
+      ? `カスケード: 2段目 ${stats.escalated}/${stats.count}枚`
+      : fixedBatchModel
+        ? `バッチ固定モデル: 1枚ずつ実行`
+        : `1バッチ(${batchSize}枚) ${meanBatch.toFixed(0)}ms`;
+  }
+}
 
-      if (isCorrect) correct++;
-      totalTime += time;
-      totalConf += bestProb;
+function recordBenchResult(stats, item, probs, time, preMs = 0) {
+  const imgPath = `./samples/${item.filename}`;
+  const { bestIndex, bestProb } = argmax(probs);
+  const isCorrect = bestIndex === item.label;
 
-      const row = document.createElement('tr');
-      row.className = isCorrect ? 'bg-green-50' : 'bg-red-50';
-      row.innerHTML = `
-        <td class="col-res text-center">${isCorrect ? '✅' : '❌'}</td>
-        <td class="col-img">
-          <div class="flex items-center gap-2">
-            <img src="${imgPath}" class="w-10 h-10 object-cover rounded border cursor-pointer" onclick="openModal('${imgPath}')">
-            <span class="text-xs text-gray-500">${getLabelName(item.label)}</span>
-          </div>
-        </td>
-        <td class="text-xs">
-          <div>正解: ${getLabelName(item.label)}</div>
-          <div class="${isCorrect ? 'text-green-700' : 'text-red-700'} font-bold">予測: ${getLabelName(bestIndex)}</div>
-        </td>
-        <td class="col-conf text-right font-mono text-xs">
-          ${(bestProb * 100).toFixed(1)}%
-        </td>`;
-      benchTableBody.prepend(row);
-
-      const count = i + 1;
-      benchAccEl.textContent = `${((correct / count) * 100).toFixed(1)}%`;
-      benchTimeEl.textContent = `${(totalTime / count).toFixed(0)}ms`;
-      benchConfEl.textContent = `${((totalConf / count) * 100).toFixed(1)}%`;
-      benchProgEl.textContent = `${count}/${BENCHMARK_DATA.length}`;
-      benchProgressBar.style.width = `${(count / BENCHMARK_DATA.length) * 100}%`;
+  if (isCorrect) stats.correct++;
+  stats.totalTime += time;
+  stats.times.push(time);
+  stats.totalConf += bestProb;
+  stats.count++;
+  stats.images.push({ file: item.filename, label: item.label, pred: bestIndex, prob: bestProb, ms: time, pre_ms: preMs });
+  stats.breakdown.add(item, bestIndex, time, preMs);
+
+  const row = document.createElement('tr');
+  row.className = isCorrect ? 'bg-green-50' : 'bg-red-50';
+  row.innerHTML = `
+    <td class="col-res text-center">${isCorrect ? '✅' : '❌'}</td>
+    <td class="col-img">
+      <div class="flex items-center gap-2">
+        <img src="${imgPath}" class="w-10 h-10 object-cover rounded border cursor-pointer" onclick="openModal('${imgPath}')">
+        <span class="text-xs text-gray-500">${getLabelName(item.label)}</span>
+      </div>
+    </td>
+    <td class="text-xs">
+      <div>正解: ${getLabelName(item.label)}</div>
+      <div class="${isCorrect ? 'text-green-700' : 'text-red-700'} font-bold">予測: ${getLabelName(bestIndex)}</div>
+    </td>
+    <td class="col-conf text-right font-mono text-xs">
+      ${(bestProb * 100).toFixed(1)}%
+    </td>`;
+  benchTableBody.prepend(row);
+
+  const count = stats.count;
+  benchAccEl.textContent = `${((stats.correct / count) * 100).toFixed(1)}%`;
+  benchTimeEl.textContent = `${(stats.totalTime / count).toFixed(0)}ms`;
+  benchConfEl.textContent = `${((stats.totalConf / count) * 100).toFixed(1)}%`;
+  benchProgEl.textContent = `${count}/${BENCHMARK_DATA.length}`;
+  benchProgressBar.style.width = `${(count / BENCHMARK_DATA.length) * 100}%`;
+}
+
+// 内訳の表。品質・解像度の表は毎バッチ、クラス別の表は最後（full = true）だけ描き直す
+function renderBreakdown(breakdown, full) {
+  if (!breakdownGroupBody) return;
+  const groups = [...breakdown.quality.values(), ...breakdown.resolution].filter(g => g.count > 0);
+  breakdownGroupBody.innerHTML = groups.map(g => {
+    const s = BenchBreakdown.summarize(g);
+    return `
+      <tr>
+        <td class="text-xs">${s.label}</td>
+        <td class="text-right font-mono text-xs">${s.count}</td>
+        <td class="text-right font-mono text-xs">${s.top1.toFixed(1)}%</td>
+        <td class="text-right font-mono text-xs">${s.infer_ms.toFixed(1)}</td>
+        <td class="text-right font-mono text-xs">${s.pre_ms.toFixed(1)}</td>
+      </tr>`;
+  }).join('');
+  if (!full) return;
+
+  const fmt = v => v === null ? '--' : `${(v * 100).toFixed(0)}%`;
+  // 再現率の低いクラスから並べる
+  const classes = breakdown.perClass().sort((a, b) => (a.recall ?? 1) - (b.recall ?? 1) || (a.precision ?? 1) - (b.precision ?? 1));
+  breakdownClassBody.innerHTML = classes.map(c => `
+    <tr>
+      <td class="text-xs">${getLabelName(c.index)}</td>
+      <td class="text-right font-mono text-xs">${c.support}</td>
+      <td class="text-right font-mono text-xs">${fmt(c.precision)}</td>
+      <td class="text-right font-mono text-xs">${fmt(c.recall)}</td>
+    </tr>`).join('');
+  breakdownConfusionEl.innerHTML = breakdown.topConfusions(10)
+    .map(p => `<div>${getLabelName(p.label)} → ${getLabelName(p.pred)}: ${p.count}</div>`).join('');
+}
+
+// 実行設定スイープ: 設定ごとに新しいワーカーを作って計測する
+// （WASM のスレッド数/SIMD は初期化後に変えられないため、メインスレッドでは切り替えられない）
+function sweepConfigs() {
+  const configs = [];
+  const cores = navigator.hardwareConcurrency || 1;
+  const threadCounts = self.crossOriginIsolated
+    ? [...new Set([1, 2, 4, cores])].filter(t => t <= cores).sort((a, b) => a - b)
+    : [1];
+  for (const simd of simdOffSupported() ? [true, false] : [true]) {
+    threadCounts.forEach(numThreads => configs.push({ ep: 'wasm', numThreads, simd }));
+  }
+  if (navigator.gpu) configs.push({ ep: 'webgpu', numThreads: 1, simd: true });
+  return configs;
+}
+
+// ORT Web 1.19 以降は SIMD 版の WASM しか配布されておらず、simd=false は無視される
+function simdOffSupported() {
+  const [major, minor] = ((ort.env.versions && ort.env.versions.web) || '0.0').split('.').map(Number);
+  return major < 1 || (major === 1 && minor < 19);
+}
+
+function percentile(values, p) {
+  const sorted = [...values].sort((a, b) => a - b);
+  return sorted[Math.min(sorted.length - 1, Math.floor((sorted.length - 1) * p))];
+}
+
+async function measureConfig(config, blobs) {
+  const client = createWorkerClient();
+  try {
+    await client.call({ type: 'init', wasm: wasmSettings(config) });
+    const { createMs } = await client.call({
+      type: 'load', path: currentModelPath, model: modelUrl(currentModelPath),
+      options: sessionOptions(currentModelPath, config.ep)
+    });
+    for (let i = 0; i < SWEEP_WARMUP; i++) {
+      await client.call({ type: 'infer', blobs: [blobs[i % blobs.length]], size: inputSize });
+    }
+    // 全バッチを一度に投げる（ワーカー側でデコードと推論が重なる）
+    const runAll = (size) => Promise.all(chunk(blobs, size).map(b => client.call({ type: 'infer', blobs: b, size: inputSize })));
+    let start = performance.now();
+    let results;
+    try {
+      results = await runAll(fixedBatchModel ? 1 : batchSize);
     } catch (e) {
-      console.error(`Error processing ${item.filename}:`, e);
+      if (fixedBatchModel || batchSize === 1) throw e;
+      fixedBatchModel = true;
+      start = performance.now();
+      results = await runAll(1);
     }
+    const wallMs = performance.now() - start;
+    const times = results.map(r => r.time / r.batch);
+    return {
+      createMs,
+      mean: times.reduce((a, b) => a + b, 0) / times.length,
+      p50: percentile(times, 0.5),
+      p95: percentile(times, 0.95),
+      imagesPerSec: blobs.length / (wallMs / 1000)
+    };
+  } finally {
+    client.terminate();
+  }
+}
 
-    if (i % 5 === 0) await new Promise(r => setTimeout(r, 0));
+async function runSweep() {
+  if (isRunning || !session || BENCHMARK_DATA.length === 0) return;
+  if (!workerSupported) {
+    alert("このブラウザは Web Worker / OffscreenCanvas に対応していないため、スイープできません。");
+    return;
+  }
+  isRunning = true;
+  enableRunButtons(false);
+  sweepTableBody.innerHTML = '';
+
+  const blobs = await Promise.all(BENCHMARK_DATA.slice(0, SWEEP_IMAGES).map(fetchSample));
+  const notes = [];
+  if (!self.crossOriginIsolated) notes.push('cross-origin isolation が無効のため 1 スレッドのみ（server.py 経由で開いてください）');
+  if (!simdOffSupported()) notes.push(`ORT Web ${ort.env.versions.web} には非SIMDビルドがないため SIMD off は計測しません`);
+  notes.forEach(note => {
+    const row = document.createElement('tr');
+    row.innerHTML = `<td colspan="6" class="text-xs text-gray-500">${note}</td>`;
+    sweepTableBody.appendChild(row);
+  });
+  let best = null;
+  for (const config of sweepConfigs()) {
+    const row = document.createElement('tr');
+    row.innerHTML = `<td class="text-xs">${configLabel(config)}</td><td colspan="5" class="text-xs text-gray-500">計測中...</td>`;
+    sweepTableBody.appendChild(row);
+    try {
+      const r = await measureConfig(config, blobs);
+      row.innerHTML = `
+        <td class="text-xs">${configLabel(config)}</td>
+        <td class="text-right font-mono text-xs">${r.imagesPerSec.toFixed(1)}</td>
+        <td class="text-right font-mono text-xs">${r.mean.toFixed(1)}</td>
+        <td class="text-right font-mono text-xs">${r.p50.toFixed(1)}</td>
+        <td class="text-right font-mono text-xs">${r.p95.toFixed(1)}</td>
+        <td class="text-right font-mono text-xs">${r.createMs.toFixed(0)}</td>`;
+      if (!best || r.imagesPerSec > best.imagesPerSec) best = { ...config, imagesPerSec: r.imagesPerSec, row };
+    } catch (e) {
+      console.warn(`Sweep config failed (${configLabel(config)}):`, e);
+      row.innerHTML = `<td class="text-xs">${configLabel(config)}</td><td colspan="5" class="text-xs text-red-700">未対応: ${e.message}</td>`;
+    }
   }
 
   isRunning = false;
-  enableRunButtons(true);
-  benchProgressContainer.style.display = 'none';
+  if (best) {
+    best.row.className = 'bg-green-50';
+    const { ep, numThreads, simd, imagesPerSec } = best;
+    saveRuntimeConfig({ ep, numThreads, simd, imagesPerSec });
+    // 新しい設定はページの再読み込み後にメインスレッドへ反映される（ワーカーは作り直す）
+    applyRuntimeConfig({ ep, numThreads, simd });
+    resetWorker();
+    await loadModel(currentModelPath);
+  } else {
+    enableRunButtons(true);
+  }
 }
 
 // カスタム検証
@@ -316,28 +1081,29 @@ async function runCustomBatch() {
   let totalConf = 0;
   let countWithLabel = 0;
 
-  for (let i = 0; i < customImages.length; i++) {
-    const item = customImages[i];
-    const { probs, time } = await runInference(item.file);
-    const { bestIndex, bestProb } = argmax(probs);
-    const isCorrect = item.labelIndex !== -1 && bestIndex === item.labelIndex;
+  for (const items of chunk(customImages, batchSize)) {
+    const result = await runInferenceBatch(items.map(item => item.file));
+    items.forEach((item, k) => {
+      const { bestIndex, bestProb } = argmax(result.probs[k]);
+      const isCorrect = item.labelIndex !== -1 && bestIndex === item.labelIndex;
 
-    totalTime += time;
-    totalConf += bestProb;
-    if (item.labelIndex !== -1) countWithLabel++;
-    if (isCorrect) correct++;
+      totalTime += result.time / items.length;
+      totalConf += bestProb;
+      if (item.labelIndex !== -1) countWithLabel++;
+      if (isCorrect) correct++;
 
-    const row = document.createElement('tr');
-    row.className = isCorrect ? 'bg-green-50' : (item.labelIndex === -1 ? '' : 'bg-red-50');
-    row.innerHTML = `
-      <td class="col-res text-center">${item.labelIndex === -1 ? '－' : (isCorrect ? '✅' : '❌')}</td>
-      <td class="col-img"><img src="${item.url}" class="thumb" onclick="openModal('${item.url}')"></td>
-      <td class="text-xs">
-        <div>指定: ${item.labelIndex === -1 ? '未指定' : getLabelName(item.labelIndex)}</div>
-        <div class="${isCorrect ? 'text-green-700' : 'text-red-700'} font-bold">予測: ${getLabelName(bestIndex)}</div>
-      </td>
-      <td class="col-conf text-right font-mono text-xs">${(bestProb * 100).toFixed(1)}%</td>`;
-    tbody.appendChild(row);
+      const row = document.createElement('tr');
+      row.className = isCorrect ? 'bg-green-50' : (item.labelIndex === -1 ? '' : 'bg-red-50');
+      row.innerHTML = `
+        <td class="col-res text-center">${item.labelIndex === -1 ? '－' : (isCorrect ? '✅' : '❌')}</td>
+        <td class="col-img"><img src="${item.url}" class="thumb" onclick="openModal('${item.url}')"></td>
+        <td class="text-xs">
+          <div>指定: ${item.labelIndex === -1 ? '未指定' : getLabelName(item.labelIndex)}</div>
+          <div class="${isCorrect ? 'text-green-700' : 'text-red-700'} font-bold">予測: ${getLabelName(bestIndex)}</div>
+        </td>
+        <td class="col-conf text-right font-mono text-xs">${(bestProb * 100).toFixed(1)}%</td>`;
+      tbody.appendChild(row);
+    });
   }
 
   const total = customImages.length;
@@ -376,6 +1142,7 @@ function switchTab(tabId) {
   document.getElementById('view-bench').classList.add('hidden');
   document.getElementById('view-dataset').classList.add('hidden');
   document.getElementById('view-custom').classList.add('hidden');
+  document.getElementById('view-compare').classList.add('hidden');
   document.getElementById(`view-${tabId}`).classList.remove('hidden');
 }
 
@@ -0,0 +1,101 @@
+// メモリ計測: WASM ヒープ（WebAssembly.Memory の大きさ）、JS ヒープ、performance.measureUserAgentSpecificMemory
+// ORT Web は WASM のメモリを外に出さないので、WebAssembly.instantiate と Memory の生成をフックして拾う
+// （ORT が最初のセッションを作る前に読み込むこと。worker.js でも importScripts する）
+const WasmMemories = (() => {
+  const memories = new Set();
+  const collect = (result) => {
+    const instance = result && (result.instance || result);
+    if (instance && instance.exports) {
+      Object.values(instance.exports).forEach(v => { if (v instanceof WebAssembly.Memory) memories.add(v); });
+    }
+    return result;
+  };
+  if (typeof WebAssembly !== 'undefined') {
+    const { instantiate, instantiateStreaming, Memory } = WebAssembly;
+    WebAssembly.instantiate = function (...args) { return instantiate.apply(this, args).then(collect); };
+    if (instantiateStreaming) {
+      WebAssembly.instantiateStreaming = function (...args) { return instantiateStreaming.apply(this, args).then(collect); };
+    }
+    // スレッド版（SharedArrayBuffer）は JS 側で new WebAssembly.Memory() してから渡す
+    WebAssembly.Memory = new Proxy(Memory, {
+      construct(target, args) {
+        const memory = new target(...args);
+        memories.add(memory);
+        return memory;
+      }
+    });
+  }
+  return {
+    bytes() {
+      let total = 0;
+      memories.forEach(m => { total += m.buffer.byteLength; });
+      return total;
+    }
+  };
+})();
+
+class MemoryTracker {
+  constructor() {
+    this.samples = [];
+    this.uaStart = null;
+    this.uaEnd = null;
+  }
+
+  // Chrome のみ（performance.memory は非標準）。ない場合は null
+  static jsHeapBytes() {
+    return self.performance && performance.memory ? performance.memory.usedJSHeapSize : null;
+  }
+
+  static uaSupported() {
+    return !!(self.crossOriginIsolated && self.performance && performance.measureUserAgentSpecificMemory);
+  }
+
+  // ページ全体（DOM・画像・ワーカーを含む）の計測。次の GC まで待つので数秒〜20秒ほどかかる
+  static async measureUA(timeoutMs = 30000) {
+    if (!MemoryTracker.uaSupported()) return null;
+    try {
+      const result = await Promise.race([
+        performance.measureUserAgentSpecificMemory(),
+        new Promise((_, reject) => setTimeout(() => reject(new Error('timeout')), timeoutMs))
+      ]);
+      const types = {};
+      result.breakdown.forEach(b => {
+        const type = b.types.length ? b.types.join('+') : 'other';
+        types[type] = (types[type] || 0) + b.bytes;
+      });
+      return { bytes: result.bytes, types };
+    } catch (e) {
+      console.warn('measureUserAgentSpecificMemory failed:', e);
+      return null;
+    }
+  }
+
+  // wasmBytes: ワーカーで推論したときはワーカー側の値を渡す（省略時はこのスレッドの WASM ヒープ）
+  sample(wasmBytes = WasmMemories.bytes()) {
+    this.samples.push({ wasm: wasmBytes, js: MemoryTracker.jsHeapBytes() });
+  }
+
+  async start(wasmBytes, measureUA = false) {
+    this.sample(wasmBytes);
+    if (measureUA) this.uaStart = await MemoryTracker.measureUA();
+  }
+
+  async finish(wasmBytes, measureUA = false) {
+    this.sample(wasmBytes);
+    if (measureUA) this.uaEnd = await MemoryTracker.measureUA();
+  }
+
+  summary() {
+    const pick = (key) => this.samples.map(s => s[key]).filter(v => v !== null && v !== undefined);
+    const range = (values) => values.length
+      ? { start: values[0], peak: Math.max(...values), end: values[values.length - 1], growth: values[values.length - 1] - values[0] }
+      : null;
+    return {
+      wasm_heap: range(pick('wasm')),
+      js_heap: range(pick('js')),
+      ua_start: this.uaStart,
+      ua_end: this.uaEnd,
+      samples: this.samples.length
+    };
+  }
+}
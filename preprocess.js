@@ -0,0 +1,152 @@
+// 前処理エンジン（main.js / worker.js 共通）
+// キャンバスと入力バッファを使い回し、正規化は x * SCALE + BIAS の1回の積和にする。
+// Python 側の bench_common.normalize と同じ定数・同じ float32 の丸めなので、同じ RGBA からは同じテンソルになる。
+const Preprocess = (() => {
+  const MEAN = [0.485, 0.456, 0.406];
+  const STD = [0.229, 0.224, 0.225];
+  // (x / 255 - mean) / std = x * (1 / (255 * std)) + (-mean / std)
+  const SCALE = Float32Array.from(STD, s => 1 / (255 * s));
+  const BIAS = Float32Array.from(MEAN, (m, c) => -m / STD[c]);
+  const POOL_LIMIT = 4;
+
+  let canvas = null;
+  let ctx = null;
+  const pool = new Map();
+
+  function getContext(size) {
+    if (!canvas || canvas.width !== size || canvas.height !== size) {
+      if (typeof OffscreenCanvas !== 'undefined') {
+        canvas = new OffscreenCanvas(size, size);
+      } else {
+        canvas = document.createElement('canvas');
+        canvas.width = size;
+        canvas.height = size;
+      }
+      ctx = canvas.getContext('2d', { willReadFrequently: true });
+    }
+    return ctx;
+  }
+
+  // 型と長さごとに入力バッファを使い回す（毎枚の確保と GC をなくす）
+  function acquire(length, Type = Float32Array) {
+    const list = pool.get(`${Type.name}:${length}`);
+    return list && list.length > 0 ? list.pop() : new Type(length);
+  }
+
+  function release(buffer) {
+    // 転送済み（detached）のバッファは戻さない
+    if (!buffer || buffer.buffer.byteLength === 0) return;
+    const key = `${buffer.constructor.name}:${buffer.length}`;
+    let list = pool.get(key);
+    if (!list) pool.set(key, list = []);
+    if (list.length < POOL_LIMIT) list.push(buffer);
+  }
+
+  async function decodeImage(blob) {
+    if (typeof createImageBitmap === 'function') return createImageBitmap(blob);
+    const url = URL.createObjectURL(blob);
+    try {
+      return await new Promise((resolve, reject) => {
+        const image = new Image();
+        image.onload = () => resolve(image);
+        image.onerror = reject;
+        image.src = url;
+      });
+    } finally {
+      URL.revokeObjectURL(url);
+    }
+  }
+
+  // センタークロップした size x size の RGBA を返す（短辺を size に合わせる）
+  async function centerCrop(blob, size) {
+    const source = await decodeImage(blob);
+    const c = getContext(size);
+    const scale = Math.max(size / source.width, size / source.height);
+    const scaledWidth = source.width * scale;
+    const scaledHeight = source.height * scale;
+    c.drawImage(source, (size - scaledWidth) / 2, (size - scaledHeight) / 2, scaledWidth, scaledHeight);
+    if (source.close) source.close();
+    return c.getImageData(0, 0, size, size).data;
+  }
+
+  // RGBA -> CHW float32 を out[offset..] に書く
+  function fillTensor(rgba, out, offset, area) {
+    const s0 = SCALE[0], s1 = SCALE[1], s2 = SCALE[2];
+    const b0 = BIAS[0], b1 = BIAS[1], b2 = BIAS[2];
+    const g = offset + area;
+    const b = offset + 2 * area;
+    // Math.fround で積を float32 に丸めてから足す（NumPy の float32 演算と同じ結果）
+    for (let i = 0, p = 0; i < area; i++, p += 4) {
+      out[offset + i] = Math.fround(rgba[p] * s0) + b0;
+      out[g + i] = Math.fround(rgba[p + 1] * s1) + b1;
+      out[b + i] = Math.fround(rgba[p + 2] * s2) + b2;
+    }
+    return out;
+  }
+
+  // RGBA -> NHWC uint8（前処理つきモデル *.u8.onnx 用。正規化はグラフ内で行う）
+  function fillRGB(rgba, out, offset, area) {
+    for (let i = 0, p = 0, q = offset; i < area; i++, p += 4, q += 3) {
+      out[q] = rgba[p];
+      out[q + 1] = rgba[p + 1];
+      out[q + 2] = rgba[p + 2];
+    }
+    return out;
+  }
+
+  // out が Uint8Array なら NHWC の画素、Float32Array なら正規化済みの CHW を書く
+  async function decodeInto(blob, size, out, offset = 0) {
+    const rgba = await centerCrop(blob, size);
+    return out instanceof Uint8Array
+      ? fillRGB(rgba, out, offset, size * size)
+      : fillTensor(rgba, out, offset, size * size);
+  }
+
+  // uint8 入力のモデルかどうか（preprocess_prefix.py の出力は *.u8.onnx）
+  function isUint8Model(path) {
+    return /\.u8\.(opt\.)?(onnx|ort)$/.test(path);
+  }
+
+  // 入力テンソルを作る（uint8 は [N, H, W, 3]、float32 は [N, 3, H, W]）
+  function makeTensor(data, batch, size) {
+    return data instanceof Uint8Array
+      ? new ort.Tensor('uint8', data, [batch, size, size, 3])
+      : new ort.Tensor('float32', data, [batch, 3, size, size]);
+  }
+
+  // logits[offset .. offset+length] をその場で確率にする
+  function softmaxInPlace(x, offset = 0, length = x.length - offset) {
+    const end = offset + length;
+    let max = -Infinity;
+    for (let i = offset; i < end; i++) if (x[i] > max) max = x[i];
+    let sum = 0;
+    for (let i = offset; i < end; i++) {
+      x[i] = Math.exp(x[i] - max);
+      sum += x[i];
+    }
+    const inv = 1 / sum;
+    for (let i = offset; i < end; i++) x[i] *= inv;
+    return x;
+  }
+
+  // 上位 k 件（降順）。全体のソートはしない
+  function topK(probs, k) {
+    const top = [];
+    for (let i = 0; i < probs.length; i++) {
+      const p = probs[i];
+      if (top.length === k && p <= top[k - 1].prob) continue;
+      let j = Math.min(top.length, k - 1);
+      top[j] = { index: i, prob: p };
+      while (j > 0 && top[j - 1].prob < p) {
+        [top[j - 1], top[j]] = [top[j], top[j - 1]];
+        j--;
+      }
+    }
+    return top;
+  }
+
+  return {
+    MEAN, STD, SCALE, BIAS, acquire, release, centerCrop, fillTensor, fillRGB, decodeInto, isUint8Model, makeTensor,
+    softmaxInPlace, topK
+  };
+})();
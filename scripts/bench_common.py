@@ -0,0 +1,156 @@
+import json
+import os
+import time
+
+import numpy as np
+import onnxruntime as ort
+from PIL import Image
+
+# リポジトリ直下を基準にする（/home/loki/public 固定パスをやめる）
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SAMPLES_JSON = os.path.join(ROOT_DIR, "samples.json")
+SAMPLES_DIR = os.path.join(ROOT_DIR, "samples")
+LABELS_JSON = os.path.join(ROOT_DIR, "labels.json")
+MODELS_DIR = os.path.join(ROOT_DIR, "models_caltech101")
+DEFAULT_MODEL = os.path.join(MODELS_DIR, "lmfrnet.onnx")
+
+# 前処理（学習時と同じ: Resize(256) -> CenterCrop(224) -> Normalize）
+RESIZE = 256
+CROP = 224
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+# (x / 255 - mean) / std = x * SCALE + BIAS（Web 版 preprocess.js と同じ値・同じ float32 の丸め）
+SCALE = (1.0 / (255.0 * np.asarray(STD, dtype=np.float64))).astype(np.float32)
+BIAS = (-np.asarray(MEAN, dtype=np.float64) / np.asarray(STD, dtype=np.float64)).astype(np.float32)
+
+
+def load_samples(path=SAMPLES_JSON):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_labels(path=LABELS_JSON):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def resize_center_crop(img, resize=RESIZE, crop=CROP):
+    # torchvision の Resize(int) / CenterCrop と同じ計算（PIL bilinear）
+    w, h = img.size
+    if w <= h:
+        new_w, new_h = resize, int(resize * h / w)
+    else:
+        new_w, new_h = int(resize * w / h), resize
+    img = img.resize((new_w, new_h), Image.BILINEAR)
+    left = int(round((new_w - crop) / 2.0))
+    top = int(round((new_h - crop) / 2.0))
+    return img.crop((left, top, left + crop, top + crop))
+
+
+def load_image(path, resize=RESIZE, crop=CROP):
+    # HWC uint8
+    with Image.open(path) as img:
+        return np.asarray(resize_center_crop(img.convert("RGB"), resize, crop), dtype=np.uint8)
+
+
+def normalize(hwc, out=None):
+    # HWC(またはNHWC) uint8 -> CHW(NCHW) float32
+    x = np.multiply(hwc, SCALE, dtype=np.float32)
+    x += BIAS
+    axes = (2, 0, 1) if x.ndim == 3 else (0, 3, 1, 2)
+    if out is None:
+        return np.ascontiguousarray(x.transpose(axes))
+    out[...] = x.transpose(axes)
+    return out
+
+
+def softmax(logits, axis=-1):
+    # その場で確率にする（logits は上書きされる）
+    logits -= logits.max(axis=axis, keepdims=True)
+    np.exp(logits, out=logits)
+    logits /= logits.sum(axis=axis, keepdims=True)
+    return logits
+
+
+def topk_indices(probs, k):
+    # 1次元の確率から上位 k 件のインデックス（降順）。全体のソートはしない
+    k = min(k, probs.shape[-1])
+    idx = np.argpartition(-probs, k - 1)[:k]
+    return idx[np.argsort(-probs[idx])]
+
+
+def load_sample_tensors(samples, samples_dir=SAMPLES_DIR, resize=RESIZE, crop=CROP):
+    # 全サンプルを1つの連続した NCHW float32 配列に前処理する
+    batch = np.empty((len(samples), 3, crop, crop), dtype=np.float32)
+    for i, sample in enumerate(samples):
+        hwc = load_image(os.path.join(samples_dir, sample["filename"]), resize, crop)
+        normalize(hwc, out=batch[i])
+    labels = np.asarray([s["label"] for s in samples], dtype=np.int64)
+    return batch, labels
+
+
+def is_preoptimized(model_path):
+    # optimize_onnx.py で最適化済みのグラフはセッション作成時に再最適化しない
+    return model_path.endswith((".opt.onnx", ".ort"))
+
+
+def create_session(model_path, intra_op_num_threads=0, inter_op_num_threads=0, profile_prefix=None):
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = intra_op_num_threads
+    opts.inter_op_num_threads = inter_op_num_threads
+    if profile_prefix:
+        # ORT 組み込みプロファイラ（end_profiling() で JSON トレースが書き出される）
+        opts.enable_profiling = True
+        opts.profile_file_prefix = profile_prefix
+    if is_preoptimized(model_path):
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+    return ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+
+
+def is_uint8_input(session):
+    # preprocess_prefix.py で前処理を埋め込んだモデルは uint8 NHWC の画像を受け取る
+    return session.get_inputs()[0].type == "tensor(uint8)"
+
+
+def fixed_batch_size(session):
+    # 入力の batch 軸が固定 (int) ならその値、dynamic_axes なら None
+    dim = session.get_inputs()[0].shape[0]
+    return dim if isinstance(dim, int) else None
+
+
+def run_batched(session, inputs, batch_size):
+    # inputs: NCHW float32。戻り値は (logits, バッチごとの推論時間[秒])
+    input_name = session.get_inputs()[0].name
+    # バッチ軸が固定のモデルは端数のバッチを受け付けないので、最後の画像を繰り返して埋め、余分な logits は捨てる
+    fixed = fixed_batch_size(session)
+    outputs = []
+    times = []
+    for start in range(0, len(inputs), batch_size):
+        chunk = inputs[start:start + batch_size]
+        count = len(chunk)
+        if fixed is not None and count < fixed:
+            chunk = np.concatenate([chunk, np.repeat(chunk[-1:], fixed - count, axis=0)])
+        t0 = time.perf_counter()
+        out = session.run(None, {input_name: chunk})[0]
+        times.append(time.perf_counter() - t0)
+        outputs.append(out[:count])
+    return np.concatenate(outputs, axis=0), times
+
+
+def topk_correct(logits, labels, k):
+    topk = np.argpartition(-logits, kth=min(k, logits.shape[1]) - 1, axis=1)[:, :k]
+    return int((topk == labels[:, None]).any(axis=1).sum())
+
+
+def latency_stats(times):
+    # times: 秒のリスト -> ミリ秒のパーセンタイル
+    ms = np.asarray(times, dtype=np.float64) * 1000
+    return {
+        "count": int(ms.size),
+        "mean": float(ms.mean()),
+        "p50": float(np.percentile(ms, 50)),
+        "p90": float(np.percentile(ms, 90)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+        "max": float(ms.max()),
+    }
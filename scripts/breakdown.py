@@ -0,0 +1,98 @@
+import numpy as np
+
+# 元画像の長辺での区切り（Web 版 breakdown.js の RESOLUTION_BUCKETS と同じ）
+RESOLUTION_BUCKETS = [("<200px", 200), ("200-299px", 300), ("300-399px", 400), ("400px+", float("inf"))]
+
+
+def resolution_bucket(width, height):
+    side = max(width or 0, height or 0)
+    return next(label for label, upper in RESOLUTION_BUCKETS if side < upper)
+
+
+class BenchBreakdown:
+    # 品質タグ別・解像度別・クラス別の集計。結果が1件届くたびに add() でカウンタを足す
+
+    def __init__(self, num_classes):
+        self.n = num_classes
+        # confusion[label, pred]
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.uint32)
+        self.groups = {}
+
+    def _group(self, kind, label):
+        key = (kind, label)
+        if key not in self.groups:
+            self.groups[key] = {"count": 0, "correct": 0, "infer_ms": 0.0, "pre_ms": 0.0}
+        return self.groups[key]
+
+    def add(self, sample, pred, infer_ms, pre_ms=0.0):
+        label = sample["label"]
+        self.confusion[label, pred] += 1
+        keys = [("quality", sample.get("quality", "unknown"))]
+        if sample.get("width"):
+            keys.append(("resolution", resolution_bucket(sample["width"], sample["height"])))
+        for kind, name in keys:
+            g = self._group(kind, name)
+            g["count"] += 1
+            g["correct"] += int(pred == label)
+            g["infer_ms"] += infer_ms
+            g["pre_ms"] += pre_ms
+
+    def group_rows(self, kind):
+        order = [label for label, _ in RESOLUTION_BUCKETS] if kind == "resolution" else None
+        rows = [(name, g) for (k, name), g in self.groups.items() if k == kind]
+        if order:
+            rows.sort(key=lambda r: order.index(r[0]))
+        return [{"label": name, "count": g["count"], "top1": g["correct"] / g["count"] * 100,
+                 "infer_ms": g["infer_ms"] / g["count"], "pre_ms": g["pre_ms"] / g["count"]} for name, g in rows]
+
+    def per_class(self):
+        hits = np.diag(self.confusion).astype(np.float64)
+        support = self.confusion.sum(axis=1)
+        predicted = self.confusion.sum(axis=0)
+        rows = []
+        for c in np.nonzero((support > 0) | (predicted > 0))[0]:
+            rows.append({
+                "index": int(c), "support": int(support[c]),
+                "precision": float(hits[c] / predicted[c]) if predicted[c] else None,
+                "recall": float(hits[c] / support[c]) if support[c] else None,
+            })
+        return rows
+
+    def top_confusions(self, k):
+        off = self.confusion.copy()
+        np.fill_diagonal(off, 0)
+        flat = np.argsort(off, axis=None)[::-1][:k]
+        pairs = [(int(i // self.n), int(i % self.n), int(off.flat[i])) for i in flat]
+        return [{"label": a, "pred": b, "count": c} for a, b, c in pairs if c > 0]
+
+    def summary(self):
+        return {
+            "quality": self.group_rows("quality"),
+            "resolution": self.group_rows("resolution"),
+            "per_class": self.per_class(),
+            "confusions": self.top_confusions(20),
+        }
+
+    def print_report(self, labels, worst=10):
+        for kind, title in (("quality", "quality"), ("resolution", "original long side")):
+            rows = self.group_rows(kind)
+            if not rows:
+                continue
+            print(f"\n{title:<20} {'count':>6} {'top1':>8} {'infer ms':>9} {'pre ms':>9}")
+            for r in rows:
+                print(f"{r['label']:<20} {r['count']:>6} {r['top1']:>7.2f}% {r['infer_ms']:>9.2f} {r['pre_ms']:>9.2f}")
+
+        classes = sorted(self.per_class(), key=lambda c: (c["recall"] if c["recall"] is not None else 1.0,
+                                                          c["precision"] if c["precision"] is not None else 1.0))
+        print(f"\nLowest recall classes ({worst}):")
+        print(f"{'class':<24} {'support':>8} {'precision':>10} {'recall':>8}")
+        for c in classes[:worst]:
+            precision = f"{c['precision'] * 100:.0f}%" if c["precision"] is not None else "--"
+            recall = f"{c['recall'] * 100:.0f}%" if c["recall"] is not None else "--"
+            print(f"{labels[c['index']]:<24} {c['support']:>8} {precision:>10} {recall:>8}")
+
+        confusions = self.top_confusions(worst)
+        if confusions:
+            print("\nMost frequent confusions (label -> predicted):")
+            for p in confusions:
+                print(f"  {labels[p['label']]} -> {labels[p['pred']]}: {p['count']}")
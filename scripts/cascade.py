@@ -0,0 +1,119 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from bench_common import (
+    MODELS_DIR, create_session, fixed_batch_size, is_uint8_input, load_samples, softmax,
+)
+from preprocess_prefix import load_sample_images
+from tensor_cache import load_cached_tensors
+
+DEFAULT_MODELS = "lmfrnet.onnx,lmfrnet_hires.onnx"
+DEFAULT_THRESHOLDS = "0.3,0.4,0.5,0.6,0.7,0.8,0.9,0.95,0.99"
+
+
+def model_inputs(session, samples, tensors):
+    # 前処理つきモデル（*.u8.onnx）には uint8 NHWC の画像を渡す
+    return load_sample_images(samples) if is_uint8_input(session) else tensors
+
+
+def per_image(session, inputs, warmup=3):
+    # 1枚ずつ推論して (予測, 確信度, レイテンシ ms) を集める。カスケードの各閾値はこの結果から計算する
+    name = session.get_inputs()[0].name
+    for i in range(warmup):
+        session.run(None, {name: inputs[i:i + 1]})
+    preds = np.empty(len(inputs), dtype=np.int64)
+    conf = np.empty(len(inputs), dtype=np.float32)
+    ms = np.empty(len(inputs), dtype=np.float64)
+    for i in range(len(inputs)):
+        t0 = time.perf_counter()
+        logits = session.run(None, {name: inputs[i:i + 1]})[0]
+        ms[i] = (time.perf_counter() - t0) * 1000
+        probs = softmax(logits)[0]
+        preds[i] = probs.argmax()
+        conf[i] = probs[preds[i]]
+    return preds, conf, ms
+
+
+def simulate(first, second, labels, threshold):
+    # first の確信度が threshold 未満の画像だけ second で推論し直した場合の精度とレイテンシ
+    escalate = first["conf"] < threshold
+    preds = np.where(escalate, second["preds"], first["preds"])
+    ms = first["ms"] + np.where(escalate, second["ms"], 0.0)
+    return {
+        "threshold": threshold,
+        "top1": float((preds == labels).mean() * 100),
+        "mean_ms": float(ms.mean()),
+        "images_per_sec": float(1000 / ms.mean()),
+        "escalated": float(escalate.mean() * 100),
+    }
+
+
+def run_cascade(first, second, first_inputs, second_inputs, threshold, batch_size=1):
+    # 実際のカスケード実行: first をバッチで流し、確信度が低い画像だけを second にまとめて渡す
+    def run(session, inputs):
+        name = session.get_inputs()[0].name
+        batch = fixed_batch_size(session) or batch_size
+        return np.concatenate([session.run(None, {name: inputs[i:i + batch]})[0]
+                               for i in range(0, len(inputs), batch)])
+
+    t0 = time.perf_counter()
+    probs = softmax(run(first, first_inputs))
+    preds = probs.argmax(axis=1)
+    escalate = np.nonzero(probs[np.arange(len(preds)), preds] < threshold)[0]
+    if len(escalate):
+        preds[escalate] = run(second, second_inputs[escalate]).argmax(axis=1)
+    return preds, time.perf_counter() - t0, len(escalate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confidence-gated cascade: cheap model first, escalate when unsure")
+    parser.add_argument("--models", default=DEFAULT_MODELS, help="two .onnx files (names are relative to models_caltech101)")
+    parser.add_argument("--keep-order", action="store_true",
+                        help="use the given order instead of running the faster model first")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="confidence thresholds to sweep")
+    parser.add_argument("--threshold", type=float, default=None, help="also run the real cascade at this threshold")
+    parser.add_argument("--batch", type=int, default=8, help="batch size for the real cascade run")
+    parser.add_argument("--threads", type=int, default=0, help="intra_op_num_threads (0 = ORT default)")
+    args = parser.parse_args()
+
+    paths = [p if os.path.exists(p) else os.path.join(MODELS_DIR, p) for p in args.models.split(",")]
+    if len(paths) != 2:
+        raise SystemExit("--models takes exactly two models")
+    samples = load_samples()
+    tensors, labels = load_cached_tensors(samples)
+
+    stages = []
+    for path in paths:
+        session = create_session(path, intra_op_num_threads=args.threads)
+        inputs = model_inputs(session, samples, tensors)
+        preds, conf, ms = per_image(session, inputs)
+        stages.append({"name": os.path.basename(path), "session": session, "inputs": inputs,
+                       "preds": preds, "conf": conf, "ms": ms})
+        print(f"{stages[-1]['name']:<28} top1 {(preds == labels).mean() * 100:6.2f}%  mean {ms.mean():7.2f} ms")
+
+    if not args.keep_order:
+        # 安いモデル（平均レイテンシが小さい方）を先に置く
+        stages.sort(key=lambda s: s["ms"].mean())
+    first, second = stages
+    print(f"\nCascade: {first['name']} -> {second['name']} (batch=1, per-image measurements)")
+    base_top1 = (second["preds"] == labels).mean() * 100
+    base_ms = second["ms"].mean()
+    print(f"{'threshold':>9} {'top1':>8} {'mean ms':>9} {'img/s':>8} {'escalated':>10} {'vs ' + second['name']:>24}")
+    for t in [float(x) for x in args.thresholds.split(",") if x.strip()]:
+        r = simulate(first, second, labels, t)
+        print(f"{t:>9.2f} {r['top1']:>7.2f}% {r['mean_ms']:>9.2f} {r['images_per_sec']:>8.1f} {r['escalated']:>9.1f}% "
+              f"{r['top1'] - base_top1:>+8.2f} pt {r['mean_ms'] / base_ms:>8.2f}x time")
+    print(f"{'always':>9} {base_top1:>7.2f}% {base_ms:>9.2f} {1000 / base_ms:>8.1f} {'100.0':>9}%  ({second['name']} only)")
+
+    if args.threshold is not None:
+        preds, elapsed, escalated = run_cascade(first["session"], second["session"], first["inputs"],
+                                                second["inputs"], args.threshold, args.batch)
+        print(f"\nReal cascade at {args.threshold} (batch={args.batch}): top1 {(preds == labels).mean() * 100:.2f}%, "
+              f"{len(labels) / elapsed:.1f} img/s, escalated {escalated}/{len(labels)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+
+from results_log import BASELINE_FILE, RESULTS_FILE, load_records, record_key
+
+LATENCY_METRICS = ("mean_ms", "p95_ms")
+
+
+def latest_by_key(records):
+    # 同じ条件の記録が複数あれば最後（最新）のものを使う
+    latest = {}
+    for record in records:
+        latest[record_key(record)] = record
+    return latest
+
+
+def changed_predictions(base, cur):
+    base_preds = {img["file"]: img["pred"] for img in base.get("images", [])}
+    return sum(1 for img in cur.get("images", []) if img["file"] in base_preds and base_preds[img["file"]] != img["pred"])
+
+
+def compare(base, cur, latency_threshold, accuracy_threshold):
+    # 戻り値: 回帰の説明のリスト（空なら問題なし）
+    problems = []
+    b, c = base["aggregates"], cur["aggregates"]
+    for metric in LATENCY_METRICS:
+        if b.get(metric) and c.get(metric) is not None:
+            change = (c[metric] / b[metric] - 1) * 100
+            if change > latency_threshold:
+                problems.append(f"{metric} {b[metric]:.2f} -> {c[metric]:.2f} ms (+{change:.1f}%)")
+    drop = b["top1"] - c["top1"]
+    if drop > accuracy_threshold:
+        problems.append(f"top1 {b['top1']:.2f}% -> {c['top1']:.2f}% (-{drop:.2f} pt)")
+    return problems
+
+
+def key_label(key):
+    source, model, provider, threads, batch, worker, size, cascade, device = key
+    extra = (", worker" if worker else "") + (f", cascade -> {cascade}" if cascade else "")
+    return f"{source}:{model} [{provider}, threads={threads}, batch={batch}, {size}px{extra}] on {device}"
+
+
+def update_baseline(path, current):
+    baseline = latest_by_key(load_records(path))
+    baseline.update(current)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        for record in baseline.values():
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(path + ".tmp", path)
+    print(f"Updated {path} with {len(current)} records ({len(baseline)} total)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results (JSONL) against a stored baseline")
+    parser.add_argument("--results", default=RESULTS_FILE, help="results written by verify_accuracy.py / the web app")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--latency-threshold", type=float, default=10.0, help="allowed latency increase in percent")
+    parser.add_argument("--accuracy-threshold", type=float, default=1.0, help="allowed top-1 drop in points")
+    parser.add_argument("--update-baseline", action="store_true", help="store the latest results as the new baseline")
+    args = parser.parse_args()
+
+    current = latest_by_key(load_records(args.results))
+    if not current:
+        raise SystemExit(f"No results in {args.results}")
+    if args.update_baseline:
+        update_baseline(args.baseline, current)
+        return
+
+    baseline = latest_by_key(load_records(args.baseline))
+    regressions = 0
+    matched = set()
+    for key, cur in current.items():
+        base = baseline.get(key)
+        label = key_label(key)
+        if base is None:
+            print(f"NEW   {label}: top1 {cur['aggregates']['top1']:.2f}%, mean {cur['aggregates']['mean_ms']:.2f} ms")
+            continue
+        matched.add(key[-1])
+        problems = compare(base, cur, args.latency_threshold, args.accuracy_threshold)
+        notes = []
+        if base["model"].get("sha256") != cur["model"].get("sha256"):
+            notes.append("model changed")
+        changed = changed_predictions(base, cur)
+        if changed:
+            notes.append(f"{changed} predictions changed")
+        note = f" ({', '.join(notes)})" if notes else ""
+        if problems:
+            regressions += 1
+            print(f"FAIL  {label}{note}")
+            for problem in problems:
+                print(f"        {problem}")
+        else:
+            c = cur["aggregates"]
+            print(f"OK    {label}{note}: top1 {c['top1']:.2f}%, mean {c['mean_ms']:.2f} ms, p95 {c['p95_ms']:.2f} ms")
+
+    # ベースラインのある端末で1件も一致しない場合は、比較が何もされていないので失敗にする
+    # （端末の識別子が変わった、または条件の指定を間違えた可能性がある）
+    baseline_devices = {key[-1] for key in baseline}
+    unmatched = sorted({key[-1] for key in current} - matched)
+    if baseline and not matched:
+        raise SystemExit(f"No result matched the baseline (baseline devices: {sorted(baseline_devices)}); "
+                         f"run with --update-baseline to record a baseline for this device")
+    orphaned = [device for device in unmatched if device in baseline_devices]
+    if orphaned:
+        raise SystemExit(f"No result matched the baseline for {orphaned}")
+
+    if regressions:
+        raise SystemExit(f"{regressions} regression(s) beyond thresholds "
+                         f"(latency +{args.latency_threshold}%, top1 -{args.accuracy_threshold} pt)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+from bench_common import MODELS_DIR, create_session, fixed_batch_size, load_samples, run_batched, topk_correct
+from optimize_onnx import session_create_ms
+from tensor_cache import load_cached_tensors
+
+# fp16: 計算も fp16（WebGPU など fp16 カーネルのあるランタイム向け。入出力は fp32 のまま）
+# fp16w: 重みだけ fp16 で保存し、読み込み時に Cast で fp32 に戻して fp32 で計算する（WASM / CPU 向け）
+MODES = {"fp16": "_fp16", "fp16w": "_fp16w"}
+MIN_ELEMENTS = 16  # これより小さい重み（スカラーなど）は fp32 のまま残す
+
+
+def fp16_path_for(model_path, mode="fp16"):
+    root, ext = os.path.splitext(model_path)
+    return f"{root}{MODES[mode]}{ext}"
+
+
+def to_fp16(model):
+    from onnxruntime.transformers.float16 import convert_float_to_float16
+
+    # keep_io_types: 入力と出力は fp32 のまま（クライアントの前処理・後処理を変えなくてよい）
+    return convert_float_to_float16(model, keep_io_types=True)
+
+
+def to_fp16_weights(model, min_elements=MIN_ELEMENTS):
+    # fp32 の initializer を fp16 にして、直後に Cast(to=FLOAT) を置く。
+    # ORT は読み込み時に Cast を定数畳み込みするので、推論は元と同じ fp32 で行われる
+    graph = model.graph
+    casts = []
+    for init in graph.initializer:
+        if init.data_type != TensorProto.FLOAT or int(np.prod(init.dims)) < min_elements:
+            continue
+        weights = numpy_helper.to_array(init)
+        name = init.name
+        init.CopyFrom(numpy_helper.from_array(weights.astype(np.float16), f"{name}_fp16"))
+        casts.append(helper.make_node("Cast", [f"{name}_fp16"], [name], to=TensorProto.FLOAT, name=f"{name}_cast"))
+    nodes = casts + list(graph.node)
+    del graph.node[:]
+    graph.node.extend(nodes)
+    return model
+
+
+def strip_node_metadata(model):
+    # torch.onnx のエクスポートは各ノードにソース位置などの metadata_props を付ける（推論には不要）
+    for node in model.graph.node:
+        del node.metadata_props[:]
+    return model
+
+
+def convert(model_path, mode="fp16"):
+    output_path = fp16_path_for(model_path, mode)
+    model = strip_node_metadata(onnx.load(model_path))
+    model = to_fp16(model) if mode == "fp16" else to_fp16_weights(model)
+    onnx.save(model, output_path)
+    return output_path
+
+
+def evaluate(model_path, inputs, labels):
+    session = create_session(model_path)
+    batch = fixed_batch_size(session) or 1
+    run_batched(session, inputs[:batch], batch)
+    logits, times = run_batched(session, inputs, batch)
+    return {
+        "logits": logits,
+        "top1": topk_correct(logits, labels, 1) / len(labels) * 100,
+        "latency_ms": float(np.mean(times) * 1000 / batch),
+    }
+
+
+def compare(model_path, variant_path, inputs, labels, ref=None):
+    # samples.json の全画像で fp32 と比べる（verify_onnx の乱数1枚ではなく実画像での一致を見る）
+    ref = ref or evaluate(model_path, inputs, labels)
+    var = evaluate(variant_path, inputs, labels)
+    size = os.path.getsize(model_path)
+    variant_size = os.path.getsize(variant_path)
+    return {
+        "file": os.path.basename(variant_path),
+        "size": variant_size,
+        "size_ratio": variant_size / size,
+        "top1": var["top1"],
+        "top1_delta": var["top1"] - ref["top1"],
+        "agreement": float((ref["logits"].argmax(1) == var["logits"].argmax(1)).mean() * 100),
+        "max_abs_diff": float(np.abs(ref["logits"] - var["logits"]).max()),
+        "create_ms": session_create_ms(variant_path),
+        "fp32_create_ms": session_create_ms(model_path),
+        "latency_ms": var["latency_ms"],
+        "fp32_latency_ms": ref["latency_ms"],
+    }
+
+
+def print_report(name, mode, r):
+    print(f"[{name}] {mode}: {r['size'] / 1e6:.2f} MB ({r['size_ratio'] * 100:.0f}% of fp32), "
+          f"top1 {r['top1']:.2f}% ({r['top1_delta']:+.2f}pt), agreement {r['agreement']:.1f}%, "
+          f"max |diff| {r['max_abs_diff']:.4f}")
+    print(f"[{name}] {mode}: load {r['fp32_create_ms']:.1f} -> {r['create_ms']:.1f} ms, "
+          f"latency {r['fp32_latency_ms']:.2f} -> {r['latency_ms']:.2f} ms/img (CPU)")
+
+
+def convert_and_report(model_path, modes=("fp16", "fp16w")):
+    samples = load_samples()
+    inputs, labels = load_cached_tensors(samples)
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    ref = evaluate(model_path, inputs, labels)
+    reports = {}
+    for mode in modes:
+        t0 = time.perf_counter()
+        variant_path = convert(model_path, mode)
+        print(f"[{name}] Converted to {variant_path} in {time.perf_counter() - t0:.1f}s")
+        reports[mode] = compare(model_path, variant_path, inputs, labels, ref)
+        print_report(name, mode, reports[mode])
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fp16 model variants with a parity check on samples.json")
+    parser.add_argument("models", nargs="*", help="fp32 .onnx files (default: models_caltech101/*.onnx)")
+    parser.add_argument("--modes", default="fp16,fp16w",
+                        help="fp16 = fp16 compute, fp16w = fp16 storage with fp32 compute")
+    args = parser.parse_args()
+
+    modes = [m for m in args.modes.split(",") if m]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        raise SystemExit(f"unknown modes: {unknown} (choose from {list(MODES)})")
+    models = args.models or sorted(
+        p for p in glob.glob(os.path.join(MODELS_DIR, "*.onnx"))
+        if not p.endswith(("_int8.onnx", ".opt.onnx", ".u8.onnx", "_fp16.onnx", "_fp16w.onnx")))
+    for path in models:
+        convert_and_report(path, modes)
+
+
+if __name__ == "__main__":
+    main()
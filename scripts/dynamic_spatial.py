@@ -0,0 +1,143 @@
+import argparse
+import os
+
+import numpy as np
+import onnx
+import onnxruntime as ort
+from onnx import TensorProto, helper, shape_inference
+
+# 入力の H/W を可変にする。torch.onnx のトレースは「特徴マップ全体の平均」を固定カーネルの AveragePool として
+# 書き出す（F.avg_pool2d(x, x.size(3)) など）ので、それを GlobalAveragePool に置き換えてから入力の軸を可変にする。
+# 元の入力サイズでは出力は変わらない。
+SPATIAL_NAMES = ("height", "width")
+
+
+def image_input(graph):
+    initializer_names = {init.name for init in graph.initializer}
+    inputs = [i for i in graph.input if i.name not in initializer_names]
+    if len(inputs) != 1:
+        raise ValueError(f"expected a single image input, got {[i.name for i in inputs]}")
+    return inputs[0]
+
+
+def spatial_axes(value_info):
+    # float32 NCHW -> (2, 3)、uint8 NHWC（preprocess_prefix.py の *.u8.onnx）-> (1, 2)
+    return (1, 2) if value_info.type.tensor_type.elem_type == TensorProto.UINT8 else (2, 3)
+
+
+def input_size(session):
+    # セッションの入力の (H, W)。可変なら None
+    inp = session.get_inputs()[0]
+    axes = (1, 2) if inp.type == "tensor(uint8)" else (2, 3)
+    dims = [inp.shape[a] for a in axes]
+    return tuple(dims) if all(isinstance(d, int) for d in dims) else None
+
+
+def make_spatial_dynamic(model):
+    # model を書き換える。戻り値は GlobalAveragePool に置き換えたノード数
+    graph = model.graph
+    inferred = shape_inference.infer_shapes(model).graph
+    shapes = {}
+    for vi in list(inferred.value_info) + list(inferred.input) + list(inferred.output):
+        shapes[vi.name] = [d.dim_value if d.HasField("dim_value") else None for d in vi.type.tensor_type.shape.dim]
+
+    replaced = 0
+    for node in graph.node:
+        if node.op_type != "AveragePool":
+            continue
+        attrs = {a.name: helper.get_attribute_value(a) for a in node.attribute}
+        shape = shapes.get(node.input[0])
+        if (shape and len(shape) == 4 and list(attrs.get("kernel_shape", [])) == shape[2:]
+                and not any(attrs.get("pads", [])) and attrs.get("ceil_mode", 0) == 0):
+            node.op_type = "GlobalAveragePool"
+            del node.attribute[:]
+            replaced += 1
+
+    inp = image_input(graph)
+    dims = inp.type.tensor_type.shape.dim
+    for axis, name in zip(spatial_axes(inp), SPATIAL_NAMES):
+        dims[axis].dim_param = name
+    # 固定サイズで推論された中間の shape は残さない
+    del graph.value_info[:]
+    onnx.checker.check_model(model)
+    return replaced
+
+
+def random_input(session, size, batch=1, seed=0):
+    inp = session.get_inputs()[0]
+    rng = np.random.default_rng(seed)
+    if inp.type == "tensor(uint8)":
+        return rng.integers(0, 256, (batch, size, size, 3), dtype=np.uint8)
+    return rng.standard_normal((batch, 3, size, size), dtype=np.float32)
+
+
+def supported_sizes(session, sizes):
+    # 実際に推論できて出力の形が変わらないサイズだけを返す（Reshape に H/W が焼き込まれたモデルなどを除く）
+    name = session.get_inputs()[0].name
+    ok = []
+    ref_shape = None
+    for size in sizes:
+        try:
+            out = session.run(None, {name: random_input(session, size)})[0]
+        except Exception:
+            continue
+        ref_shape = ref_shape or out.shape
+        if out.shape == ref_shape:
+            ok.append(size)
+    return ok
+
+
+def dynamic_session(model_path, sizes, sess_options=None):
+    # 入力サイズが固定のモデルはメモリ上で可変にし、元のサイズで出力が一致したものだけを使う
+    # 戻り値: (session, 推論できるサイズのリスト, 元の入力サイズ or None)
+    providers = ["CPUExecutionProvider"]
+    session = ort.InferenceSession(model_path, sess_options=sess_options, providers=providers)
+    native = input_size(session)
+    if native is None:
+        return session, supported_sizes(session, sizes), None
+    model = onnx.load(model_path)
+    try:
+        make_spatial_dynamic(model)
+        dyn = ort.InferenceSession(model.SerializeToString(), sess_options=sess_options, providers=providers)
+    except Exception as e:
+        print(f"{os.path.basename(model_path)}: cannot make H/W dynamic ({e}); using {native[0]}x{native[1]} only")
+        return session, [native[0]], native
+    x = random_input(session, native[0])
+    a = session.run(None, {session.get_inputs()[0].name: x})[0]
+    b = dyn.run(None, {dyn.get_inputs()[0].name: x})[0]
+    if not np.allclose(a, b, rtol=1e-4, atol=1e-5):
+        print(f"{os.path.basename(model_path)}: dynamic H/W changes the output at {native[0]}; using fixed size only")
+        return session, [native[0]], native
+    return dyn, supported_sizes(dyn, sizes), native
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Make the input H/W of an exported ONNX model dynamic")
+    parser.add_argument("model", help="path to .onnx")
+    parser.add_argument("--output", default=None, help="output path (default: overwrite the input)")
+    parser.add_argument("--check-sizes", default="128,160,192,224,288")
+    args = parser.parse_args()
+
+    model = onnx.load(args.model)
+    ref = ort.InferenceSession(args.model, providers=["CPUExecutionProvider"])
+    native = input_size(ref)
+    if native is None:
+        print(f"{args.model}: input H/W is already dynamic")
+        return
+    replaced = make_spatial_dynamic(model)
+    dyn = ort.InferenceSession(model.SerializeToString(), providers=["CPUExecutionProvider"])
+    x = random_input(ref, native[0])
+    diff = float(np.abs(ref.run(None, {ref.get_inputs()[0].name: x})[0]
+                        - dyn.run(None, {dyn.get_inputs()[0].name: x})[0]).max())
+    sizes = supported_sizes(dyn, [int(s) for s in args.check_sizes.split(",")])
+    print(f"Replaced {replaced} AveragePool node(s); max |diff| at {native[0]}x{native[1]}: {diff:.2e}; "
+          f"runs at: {sizes}")
+    if diff > 1e-4:
+        raise SystemExit("Output changed at the original input size; not saving")
+    output = args.output or args.model
+    onnx.save(model, output)
+    print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    main()
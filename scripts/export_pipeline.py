@@ -0,0 +1,403 @@
+import argparse
+import hashlib
+import inspect
+import io
+import json
+import multiprocessing as mp
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# エクスポート処理を変えたら上げる（全モデルが再エクスポートされる）
+PIPELINE_VERSION = 1
+OPSET_VERSION = 12
+MANIFEST_NAME = "manifest.json"
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def export_config(spec, opset=OPSET_VERSION):
+    return {
+        "pipeline_version": PIPELINE_VERSION,
+        "arch": spec["arch"],
+        "num_classes": spec["num_classes"],
+        "input_shape": list(spec["input_shape"]),
+        "dynamic_batch": spec.get("dynamic_batch", False),
+        "dynamic_spatial": spec.get("dynamic_spatial", False),
+        "opset": opset,
+    }
+
+
+def config_hash(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def is_up_to_date(entry, output_path, checkpoint_sha, cfg_hash):
+    # チェックポイントとエクスポート設定が前回と同じで、出力ファイルも改変されていなければスキップ
+    return (
+        entry is not None
+        and entry.get("checkpoint_sha256") == checkpoint_sha
+        and entry.get("config_hash") == cfg_hash
+        and os.path.exists(output_path)
+        and entry.get("size") == os.path.getsize(output_path)
+    )
+
+
+def export_model(model, output_path, input_shape, opset=OPSET_VERSION, dynamic_batch=False, dynamic_spatial=False):
+    import torch
+
+    model.eval()
+    dummy_input = torch.randn(*input_shape)
+    dynamic_axes = {'input': {0: 'batch_size'}, 'output': {0: 'batch_size'}} if dynamic_batch else None
+
+    # 新しい torch は dynamo エクスポーターが既定（opset 18 以上 + 外部データ）なので TorchScript 版を使う
+    extra = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        extra["dynamo"] = False
+
+    # メモリ上に書き出してから1ファイルとして保存する（.data の外部データが出ないので onnx.load/save 不要）
+    buf = io.BytesIO()
+    torch.onnx.export(
+        model,
+        dummy_input,
+        buf,
+        export_params=True,
+        opset_version=opset,
+        do_constant_folding=True,
+        input_names=['input'],
+        output_names=['output'],
+        dynamic_axes=dynamic_axes,
+        training=torch.onnx.TrainingMode.EVAL,
+        **extra,
+    )
+    data = buf.getvalue()
+    if dynamic_spatial:
+        # H/W は固定サイズでトレースしてから可変にする（トレースが固定カーネルにした全体平均を GlobalAveragePool に戻す）
+        import onnx
+        from dynamic_spatial import make_spatial_dynamic
+
+        onnx_model = onnx.load_from_string(data)
+        make_spatial_dynamic(onnx_model)
+        data = onnx_model.SerializeToString()
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def verify_onnx(onnx_path, torch_model, input_shape):
+    import onnxruntime
+    import torch
+
+    dummy_input = torch.randn(*input_shape)
+    with torch.no_grad():
+        torch_out = torch_model(dummy_input).numpy()
+    ort_session = onnxruntime.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+    ort_outs = ort_session.run(None, {ort_session.get_inputs()[0].name: dummy_input.numpy()})
+    np.testing.assert_allclose(torch_out, ort_outs[0], rtol=1e-03, atol=1e-05)
+
+
+def sanity_check(model, num_samples=5):
+    import torch
+    from bench_common import load_samples
+    from tensor_cache import load_cached_tensors
+
+    inputs, labels = load_cached_tensors(load_samples())
+    with torch.no_grad():
+        preds = torch.argmax(model(torch.from_numpy(np.array(inputs[:num_samples]))), 1).numpy()
+    return int((preds == labels[:num_samples]).sum())
+
+
+def export_one(name, spec, checkpoint_path, output_path, opset, run_sanity_check):
+    # ワーカープロセスで実行される（1モデル = 1プロセス）
+    import torch
+    from model_registry import build_model
+
+    torch.set_num_threads(1)
+    t0 = time.perf_counter()
+    model = build_model(spec, checkpoint_path)
+    log = [f"Loaded weights for {name}"]
+
+    if run_sanity_check:
+        correct = sanity_check(model)
+        log.append(f"Sanity Check: {correct}/5 Correct")
+        if correct < 3:
+            log.append("!!! WARNING: Model accuracy seems low before export !!!")
+
+    dynamic_spatial = spec.get("dynamic_spatial", False)
+    export_model(model, output_path, spec["input_shape"], opset=opset,
+                 dynamic_batch=spec.get("dynamic_batch", False), dynamic_spatial=dynamic_spatial)
+    if dynamic_spatial and not spatial_check(output_path, model, spec["input_shape"]):
+        # Reshape などに H/W が焼き込まれていて他のサイズで動かないモデルは固定サイズに戻す
+        log.append("Dynamic H/W not supported by this architecture; exporting with a fixed input size")
+        dynamic_spatial = False
+        export_model(model, output_path, spec["input_shape"], opset=opset,
+                     dynamic_batch=spec.get("dynamic_batch", False))
+    verify_onnx(output_path, model, spec["input_shape"])
+    log.append(f"Verification passed for {output_path}" + (" (dynamic H/W)" if dynamic_spatial else ""))
+    return log, time.perf_counter() - t0, dynamic_spatial
+
+
+def spatial_check(onnx_path, torch_model, input_shape):
+    # 元のサイズの 3/4 と 5/4 でも PyTorch と同じ出力になるか
+    try:
+        for scale in (0.75, 1.25):
+            size = int(round(input_shape[2] * scale / 8)) * 8
+            verify_onnx(onnx_path, torch_model, (*input_shape[:2], size, size))
+    except Exception:
+        return False
+    return True
+
+
+def export_parallel(jobs, workers, opset, run_sanity_check, output_dir, manifest):
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    print(f"Exporting {len(jobs)} model(s) with {workers} worker(s)...")
+    if run_sanity_check:
+        # サニティチェック用のテンソルキャッシュは親で1回だけ作る（ワーカーは読むだけ）
+        from bench_common import load_samples
+        from tensor_cache import load_cached_tensors
+        load_cached_tensors(load_samples())
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = {
+            pool.submit(export_one, name, spec, checkpoint_path, output_path, opset, run_sanity_check): (name, output_path, entry)
+            for name, spec, checkpoint_path, output_path, entry in jobs
+        }
+        for future in as_completed(futures):
+            name, output_path, entry = futures[future]
+            try:
+                log, elapsed, dynamic_spatial = future.result()
+            except Exception:
+                print(f"[{name}] Failed to export:")
+                traceback.print_exc()
+                continue
+            for line in log:
+                print(f"[{name}] {line}")
+            entry["size"] = os.path.getsize(output_path)
+            entry["sha256"] = file_sha256(output_path)
+            entry["dynamic_spatial"] = dynamic_spatial
+            entry["exported_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            manifest[name] = entry
+            # 1モデル終わるごとに保存（途中で失敗しても成功分は次回スキップされる）
+            save_manifest(output_dir, manifest)
+            print(f"[{name}] Exported {output_path} ({entry['size'] / 1e6:.2f} MB) in {elapsed:.1f}s")
+
+
+def quantize_stage(manifest, output_dir, names=None, force=False):
+    # fp32 モデルが変わったときだけ INT8 を作り直し、精度差と速度比を manifest に残す
+    from quantize_int8 import int8_path_for, quantize_and_report
+
+    for name, entry in sorted(manifest.items()):
+        if names and name not in names:
+            continue
+        fp32_path = os.path.join(output_dir, entry["file"])
+        int8 = entry.get("int8")
+        if (not force and int8 and int8.get("source_sha256") == entry.get("sha256")
+                and os.path.exists(int8_path_for(fp32_path))):
+            print(f"[{name}] INT8 up to date, skipping.")
+            continue
+        try:
+            report = quantize_and_report(fp32_path)
+        except Exception:
+            print(f"[{name}] Failed to quantize:")
+            traceback.print_exc()
+            continue
+        report["source_sha256"] = entry.get("sha256")
+        report["sha256"] = file_sha256(int8_path_for(fp32_path))
+        entry["int8"] = report
+        save_manifest(output_dir, manifest)
+
+
+def optimize_stage(manifest, output_dir, names=None, force=False, level="extended"):
+    # ORT のオフライン最適化結果を *.opt.onnx として保存し、セッション作成時間の短縮量を記録する
+    from optimize_onnx import optimize_and_report, optimized_path_for
+
+    for name, entry in sorted(manifest.items()):
+        if names and name not in names:
+            continue
+        model_path = os.path.join(output_dir, entry["file"])
+        optimized = entry.get("optimized")
+        if (not force and optimized and optimized.get("source_sha256") == entry.get("sha256")
+                and optimized.get("level") == level and os.path.exists(optimized_path_for(model_path))):
+            print(f"[{name}] Optimized graph up to date, skipping.")
+            continue
+        try:
+            report = optimize_and_report(model_path, level)
+        except Exception:
+            print(f"[{name}] Failed to optimize:")
+            traceback.print_exc()
+            continue
+        report["source_sha256"] = entry.get("sha256")
+        report["sha256"] = file_sha256(optimized_path_for(model_path))
+        entry["optimized"] = report
+        save_manifest(output_dir, manifest)
+
+
+def prefix_stage(manifest, output_dir, names=None, force=False, resize=False):
+    # uint8 NHWC 入力の前処理つきモデル（*.u8.onnx）を作り、元のモデルとの出力一致を記録する
+    from preprocess_prefix import add_prefix_and_report, prefix_path_for
+
+    for name, entry in sorted(manifest.items()):
+        if names and name not in names:
+            continue
+        model_path = os.path.join(output_dir, entry["file"])
+        prefixed = entry.get("uint8_input")
+        if (not force and prefixed and prefixed.get("source_sha256") == entry.get("sha256")
+                and prefixed.get("resize") == resize and os.path.exists(prefix_path_for(model_path))):
+            print(f"[{name}] uint8-input model up to date, skipping.")
+            continue
+        try:
+            input_size = (entry.get("input_shape") or [])[2:] or None
+            report = add_prefix_and_report(model_path, resize, input_size=input_size)
+        except Exception:
+            print(f"[{name}] Failed to add the preprocessing prefix:")
+            traceback.print_exc()
+            continue
+        report["source_sha256"] = entry.get("sha256")
+        report["sha256"] = file_sha256(prefix_path_for(model_path))
+        entry["uint8_input"] = report
+        save_manifest(output_dir, manifest)
+
+
+def fp16_stage(manifest, output_dir, names=None, force=False):
+    # fp16 計算版（*_fp16.onnx）と fp16 保存・fp32 計算版（*_fp16w.onnx）を作り、samples.json での一致を記録する
+    from convert_fp16 import MODES, convert_and_report, fp16_path_for
+
+    for name, entry in sorted(manifest.items()):
+        if names and name not in names:
+            continue
+        model_path = os.path.join(output_dir, entry["file"])
+        modes = [m for m in MODES if force or not entry.get(m)
+                 or entry[m].get("source_sha256") != entry.get("sha256")
+                 or not os.path.exists(fp16_path_for(model_path, m))]
+        if not modes:
+            print(f"[{name}] fp16 variants up to date, skipping.")
+            continue
+        try:
+            reports = convert_and_report(model_path, modes)
+        except Exception:
+            print(f"[{name}] Failed to convert to fp16:")
+            traceback.print_exc()
+            continue
+        for mode, report in reports.items():
+            report["source_sha256"] = entry.get("sha256")
+            report["sha256"] = file_sha256(fp16_path_for(model_path, mode))
+            entry[mode] = report
+        save_manifest(output_dir, manifest)
+
+
+def run(group, names=None, workers=None, force=False, checkpoint_root=None, output_dir=None, opset=OPSET_VERSION,
+        int8=False, optimize=None, uint8_input=None, fp16=False):
+    from model_registry import MODEL_GROUPS
+
+    cfg = MODEL_GROUPS[group]
+    checkpoint_root = checkpoint_root or cfg["checkpoint_root"]
+    output_dir = output_dir or cfg["output_dir"]
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+
+    jobs = []
+    for spec in cfg["models"]:
+        name = spec["name"]
+        if names and name not in names:
+            continue
+        checkpoint_path = os.path.join(checkpoint_root, spec["checkpoint"])
+        if not os.path.exists(checkpoint_path):
+            print(f"[{name}] Checkpoint not found: {checkpoint_path}")
+            continue
+        output_path = os.path.join(output_dir, f"{name}.onnx")
+        config = export_config(spec, opset)
+        entry = {
+            "file": f"{name}.onnx",
+            "checkpoint": checkpoint_path,
+            "checkpoint_sha256": file_sha256(checkpoint_path),
+            "config_hash": config_hash(config),
+            "opset": opset,
+            "input_shape": list(spec["input_shape"]),
+            "dynamic_batch": config["dynamic_batch"],
+        }
+        if not force and is_up_to_date(manifest.get(name), output_path,
+                                       entry["checkpoint_sha256"], entry["config_hash"]):
+            print(f"[{name}] Up to date, skipping.")
+            continue
+        jobs.append((name, spec, checkpoint_path, output_path, entry))
+
+    if jobs:
+        export_parallel(jobs, workers, opset, cfg["sanity_check"], output_dir, manifest)
+    if optimize:
+        optimize_stage(manifest, output_dir, names, force, optimize)
+    if uint8_input:
+        if cfg["sanity_check"]:
+            prefix_stage(manifest, output_dir, names, force, resize=uint8_input == "resize")
+        else:
+            print(f"uint8-input stage skipped: group '{group}' is not evaluated on samples.json")
+    if int8:
+        if cfg["sanity_check"]:
+            quantize_stage(manifest, output_dir, names, force)
+        else:
+            print(f"INT8 stage skipped: group '{group}' is not evaluated on samples.json")
+    if fp16:
+        if cfg["sanity_check"]:
+            fp16_stage(manifest, output_dir, names, force)
+        else:
+            print(f"fp16 stage skipped: group '{group}' is not evaluated on samples.json")
+    if cfg.get("web_manifest"):
+        # Web 版が読むモデル一覧（パス・サイズ・ハッシュ）。Service Worker のキャッシュ無効化に使う
+        from web_manifest import write_web_manifest
+        write_web_manifest(output_dir)
+    return manifest
+
+
+def main(group=None):
+    parser = argparse.ArgumentParser(description="Export registered models to ONNX (parallel, cached)")
+    if group is None:
+        parser.add_argument("--group", default="caltech101", choices=["caltech101", "cifar"])
+    parser.add_argument("--models", default=None, help="comma separated model names (default: all)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="re-export even if unchanged")
+    parser.add_argument("--checkpoint-root", default=None)
+    parser.add_argument("--output-dir", default=None)
+    parser.add_argument("--opset", type=int, default=OPSET_VERSION)
+    parser.add_argument("--int8", action="store_true", help="also emit *_int8.onnx (static quantization on samples.json)")
+    parser.add_argument("--optimize", nargs="?", const="extended", default=None, choices=["basic", "extended", "all"],
+                        help="also save the ORT-optimized graph as *.opt.onnx (default level: extended)")
+    parser.add_argument("--uint8-input", nargs="?", const="fixed", default=None, choices=["fixed", "resize"],
+                        help="also save *.u8.onnx taking uint8 NHWC images (normalization inside the graph; "
+                             "'resize' accepts any HxW)")
+    parser.add_argument("--fp16", action="store_true",
+                        help="also emit *_fp16.onnx (fp16 compute) and *_fp16w.onnx (fp16 weights, fp32 compute)")
+    args = parser.parse_args()
+
+    names = set(args.models.split(",")) if args.models else None
+    run(group or args.group, names=names, workers=args.workers, force=args.force,
+        checkpoint_root=args.checkpoint_root, output_dir=args.output_dir, opset=args.opset, int8=args.int8,
+        optimize=args.optimize, uint8_input=args.uint8_input, fp16=args.fp16)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,11 @@ import torchvision
 import torch.nn as nn
 import onnxruntime as ort
 import numpy as np
-import os
-import onnx
-from PIL import Image
-from torchvision import transforms
-import json
+
+from bench_common import load_samples
+from export_pipeline import export_model
+from model_registry import load_state_dict
+from tensor_cache import load_cached_tensors
 
 def main():
     print("--- ResNet18 Fix Attempt: Replace AdaptiveAvgPool ---")
@@ -27,33 +27,14 @@ def main():
     
     # Load Weights
     weights_path = "/home/loki/LMFRNet/outputs/experiment2/resnet18_s0/best_model.pt"
-    checkpoint = torch.load(weights_path, map_location='cpu')
-    
-    # State dict handling
-    if isinstance(checkpoint, dict):
-        state_dict = checkpoint.get('model_state_dict', checkpoint.get('state_dict', checkpoint))
-    else:
-        state_dict = checkpoint
-
-    new_state_dict = {}
-    for k, v in state_dict.items():
-        name = k[7:] if k.startswith('module.') else k
-        new_state_dict[name] = v
-    
-    model.load_state_dict(new_state_dict, strict=True)
+    model.load_state_dict(load_state_dict(weights_path), strict=True)
     model.eval()
 
     # 2. PyTorch Inference
-    img_path = "/home/loki/public/samples/img_000.jpg"
-    transform = transforms.Compose([
-        transforms.Resize(256),
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
-    
-    img = Image.open(img_path).convert("RGB")
-    input_tensor = transform(img).unsqueeze(0)
+    # 前処理済みテンソルキャッシュから img_000 を読む（JPEG デコードを毎回やり直さない）
+    samples = load_samples()
+    inputs, _ = load_cached_tensors(samples)
+    input_tensor = torch.from_numpy(np.array(inputs[:1]))
     
     with torch.no_grad():
         pt_out = model(input_tensor)
@@ -62,31 +43,7 @@ def main():
 
     # 3. ONNX Export
     onnx_path = "resnet18_fixed.onnx"
-    dummy_input = torch.randn(1, 3, 224, 224)
-    # Export to ONNX
-    torch.onnx.export(
-        model,
-        dummy_input,
-        onnx_path,
-        export_params=True,
-        opset_version=12,
-        do_constant_folding=True,
-        input_names=['input'],
-        output_names=['output'],
-        training=torch.onnx.TrainingMode.EVAL
-    )
-    
-    # Force merge external data (Single file)
-    print(f"Merging external data for {onnx_path}...")
-    onnx_model = onnx.load(onnx_path)
-    onnx.save(onnx_model, onnx_path)
-    
-    # Cleanup .data file if exists
-    data_file = onnx_path + ".data"
-    if os.path.exists(data_file):
-        os.remove(data_file)
-        print(f"Removed external data file: {data_file}")
-
+    export_model(model, onnx_path, (1, 3, 224, 224))
     print(f"Exported to {onnx_path} (Single File)")
 
     # 4. ONNX Verification
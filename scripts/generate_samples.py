@@ -1,85 +1,160 @@
-import os
+import argparse
 import json
+import os
 import random
 import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from PIL import Image
 
+ROOT_DIR = Path(__file__).resolve().parent.parent
+SAMPLE_KEYS = ("filename", "label", "category", "quality", "width", "height")
+
+
+def iter_tasks(dataset_root, categories, per_class, seed):
+    # クラス順（ds.categories）にストリーミングで選出する。全画像リストは作らない
+    index = 0
+    for label, cat in enumerate(categories):
+        cat_dir = dataset_root / cat
+        if not cat_dir.exists():
+            continue
+        names = sorted(e.name for e in os.scandir(cat_dir) if e.name.endswith(".jpg"))
+        random.Random(f"{seed}:{cat}").shuffle(names)
+        if per_class > 0:
+            names = names[:per_class]
+        # 品質タグ（仮）: 各クラスの前半を「High」、後半を「Low」と仮定する（シミュレーション）
+        half = (len(names) + 1) // 2
+        for j, name in enumerate(names):
+            yield {
+                "filename": f"img_{index:03d}.jpg",
+                "source": f"{cat}/{name}",
+                "label": label,
+                "category": cat,
+                "quality": "high" if j < half else "low",
+            }
+            index += 1
+
+
+def convert(task, dataset_root, output_dir, quality):
+    # 画像を再エンコードして保存（PIL のデコード/エンコードは GIL を解放するのでスレッドで並列化できる）
+    with Image.open(dataset_root / task["source"]) as img:
+        img = img.convert("RGB")
+        img.save(output_dir / task["filename"], quality=quality)
+        # 元画像の解像度（ベンチマークの解像度別の内訳に使う）
+        task["width"], task["height"] = img.size
+    return task
+
+
+def load_done(manifest_path):
+    # 途中で止まった場合の再開用: 既に書き出した filename を読む
+    if not manifest_path.exists():
+        return set()
+    valid = []
+    with open(manifest_path, "r") as f:
+        lines = f.readlines()
+    for line in lines:
+        try:
+            valid.append(json.loads(line))
+        except ValueError:
+            continue
+    if len(valid) != len(lines) or (lines and not lines[-1].endswith("\n")):
+        # 中断時に書きかけになった行を取り除く（その画像は作り直す）
+        with open(manifest_path, "w") as f:
+            f.writelines(json.dumps(task) + "\n" for task in valid)
+    return {task["filename"] for task in valid}
+
+
+def write_samples_json(manifest_path, output_json):
+    with open(manifest_path, "r") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    samples.sort(key=lambda s: int(s["filename"][4:-4]))
+    with open(output_json, "w") as f:
+        json.dump([{k: s[k] for k in SAMPLE_KEYS if k in s} for s in samples], f, indent=2)
+    return len(samples)
+
+
 def main():
-    # 設定
-    dataset_root = Path("/home/loki/LMFRNet/data/caltech101/caltech101/101_ObjectCategories")
-    output_dir = Path("/home/loki/public/samples")
-    output_json = Path("/home/loki/public/samples.json")
-    
+    parser = argparse.ArgumentParser(description="Generate a stratified Caltech101 benchmark sample set")
+    parser.add_argument("--dataset-root", default="/home/loki/LMFRNet/data/caltech101")
+    parser.add_argument("--output-dir", default=str(ROOT_DIR / "samples"))
+    parser.add_argument("--output-json", default=str(ROOT_DIR / "samples.json"))
+    parser.add_argument("--output-labels", default=str(ROOT_DIR / "labels.json"))
+    # 既定はクラスごとに2枚（101 クラスで 202 枚。ベンチマーク・キャッシュ・ベースラインはこの規模を前提にしている）
+    parser.add_argument("--per-class", type=int, default=2, help="images per class (0 = the whole dataset)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--quality", type=int, default=95, help="JPEG quality")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fresh", action="store_true", help="discard the manifest and start over")
+    args = parser.parse_args()
+
+    dataset_root = Path(args.dataset_root)
+    images_root = dataset_root / "caltech101" / "101_ObjectCategories"
+    output_dir = Path(args.output_dir)
+    output_json = Path(args.output_json)
+    manifest_path = output_dir / "manifest.jsonl"
+
     # 出力ディレクトリ作成
-    if output_dir.exists():
+    if args.fresh and output_dir.exists():
         shutil.rmtree(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
     # torchvisionのCaltech101クラス順序に完全に合わせる
     from torchvision import datasets
     # ダミーデータセットを作成してクラスリストを取得（ダウンロード済み前提）
-    ds = datasets.Caltech101(root="/home/loki/LMFRNet/data/caltech101", download=False)
+    ds = datasets.Caltech101(root=str(dataset_root), download=False)
     categories = ds.categories
-    
-    # カテゴリ名とインデックスのマッピング
-    class_to_idx = {cls_name: i for i, cls_name in enumerate(categories)}
-    
-    # 全画像リスト取得
-    all_images = []
-    for cat in categories:
-        cat_dir = dataset_root / cat
-        if not cat_dir.exists():
-             continue
-        for img_path in cat_dir.glob("*.jpg"):
-            all_images.append({
-                "path": img_path,
-                "label": class_to_idx[cat],
-                "category": cat
-            })
-    
-    # ランダムに200枚選出
-    # 本来は「高品質」「低品質」の選別が必要だが、今回はランダムに選んで
-    # 半分を「High」、半分を「Low」と仮定してタグ付けする（シミュレーション）
-    random.seed(42)
-    selected_images = random.sample(all_images, 200)
-    
-    samples = []
-    for i, img_info in enumerate(selected_images):
-        # 画像をコピー
-        src_path = img_info["path"]
-        dst_filename = f"img_{i:03d}.jpg"
-        dst_path = output_dir / dst_filename
-        
-        # 画像をリサイズして保存（Web表示用、推論時はJSでリサイズされるが、転送量削減のため）
-        # ただし、画質評価のため、あえてオリジナルに近い方がいいかもしれないが、
-        # ここでは224x224より少し大きめで保存しておく
-        with Image.open(src_path) as img:
-            img = img.convert("RGB")
-            img.save(dst_path, quality=95)
-        
-        # 品質タグ（仮）
-        quality = "high" if i < 100 else "low"
-        
-        samples.append({
-            "filename": dst_filename,
-            "label": img_info["label"],
-            "category": img_info["category"],
-            "quality": quality
-        })
-    
-    # JSON保存
-    with open(output_json, "w") as f:
-        json.dump(samples, f, indent=2)
-    
+
+    # 選出条件が変わるとファイル番号がずれるので、同じ条件のときだけ再開する
+    params = {"dataset_root": str(dataset_root), "per_class": args.per_class, "seed": args.seed, "quality": args.quality}
+    params_path = output_dir / "manifest.params.json"
+    if params_path.exists():
+        with open(params_path, "r") as f:
+            previous = json.load(f)
+        if previous != params:
+            raise SystemExit(f"Manifest was built with {previous}; rerun with --fresh to start over.")
+    else:
+        with open(params_path, "w") as f:
+            json.dump(params, f, indent=2)
+
+    done = load_done(manifest_path)
+    if done:
+        print(f"Resuming: {len(done)} images already in {manifest_path}")
+
+    written = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool, open(manifest_path, "a") as manifest:
+        # 投入数を制限して、未処理タスクがメモリに溜まらないようにする
+        pending = deque()
+        max_pending = args.workers * 4
+
+        def drain(limit):
+            nonlocal written
+            while len(pending) > limit:
+                task = pending.popleft().result()
+                manifest.write(json.dumps(task) + "\n")
+                written += 1
+                if written % 500 == 0:
+                    manifest.flush()
+                    print(f"  {written} images written")
+
+        for task in iter_tasks(images_root, categories, args.per_class, args.seed):
+            if task["filename"] in done:
+                continue
+            pending.append(pool.submit(convert, task, images_root, output_dir, args.quality))
+            drain(max_pending)
+        drain(0)
+
+    total = write_samples_json(manifest_path, output_json)
+
     # ラベルリスト保存
-    output_labels = Path("/home/loki/public/labels.json")
+    output_labels = Path(args.output_labels)
     with open(output_labels, "w") as f:
         json.dump(categories, f, indent=2)
-    
-    print(f"Generated {len(samples)} samples in {output_dir}")
+
+    print(f"Generated {total} samples in {output_dir} ({written} new)")
     print(f"Saved metadata to {output_json}")
     print(f"Saved labels to {output_labels}")
 
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,102 @@
+import argparse
+import functools
+import itertools
+import sys
+import threading
+
+from bench_common import ROOT_DIR, latency_stats
+from results_log import RESULTS_FILE, append_record
+
+sys.path.insert(0, ROOT_DIR)
+import server  # noqa: E402
+
+
+def start_server():
+    # server.py と同じハンドラ（COOP/COEP ヘッダ付き）を空きポートで起動する
+    server.assets = server.AssetCache(ROOT_DIR)
+    handler = functools.partial(server.CustomHandler, directory=ROOT_DIR)
+    httpd = server.ThreadingServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def run_page(page, base_url, model, worker, timeout_ms, size=None, batch=None, memory=False):
+    query = f"autorun=1&worker={int(worker)}"
+    if size:
+        query += f"&size={size}"
+    if batch:
+        query += f"&batch={batch}"
+    if memory:
+        query += "&memory=1"
+    if model:
+        query += f"&model={model}"
+    page.goto(f"{base_url}/index.html?{query}")
+    page.wait_for_function("window.__benchResult !== undefined", timeout=timeout_ms)
+    return page.evaluate("window.__benchResult")
+
+
+def memory_columns(memory):
+    # WASM ヒープは「開始 -> 最大」、ページ全体（measureUserAgentSpecificMemory）は「開始 -> 終了」
+    memory = memory or {}
+    wasm = memory.get("wasm_heap")
+    start, end = memory.get("ua_start"), memory.get("ua_end")
+    wasm_col = f"{wasm['start'] / 2**20:.1f} -> {wasm['peak'] / 2**20:.1f}" if wasm else "--"
+    page_col = f"{start['bytes'] / 2**20:.1f} -> {end['bytes'] / 2**20:.1f}" if start and end else "--"
+    return f"{wasm_col:>16} {page_col:>14}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the web benchmark headlessly (main thread vs Web Worker)")
+    parser.add_argument("--model", default=None, help="model path as used by the page, e.g. ./models_caltech101/lmfrnet.onnx")
+    parser.add_argument("--modes", default="main,worker", help="comma separated: main, worker")
+    parser.add_argument("--browser", default="chromium", choices=["chromium", "firefox", "webkit"])
+    parser.add_argument("--timeout", type=float, default=600, help="seconds per run")
+    parser.add_argument("--sizes", default=None,
+                        help="comma separated input sizes to sweep, e.g. 128,160,192,224,288 (dynamic H/W models)")
+    parser.add_argument("--batches", default=None, help="comma separated batch sizes, e.g. 1,8,32")
+    parser.add_argument("--memory", action="store_true",
+                        help="also measure performance.measureUserAgentSpecificMemory before/after each run (slow)")
+    parser.add_argument("--results", default=RESULTS_FILE, help="append the page's JSONL results record here")
+    parser.add_argument("--no-results", action="store_true", help="do not write results records")
+    args = parser.parse_args()
+
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        raise SystemExit("playwright is required: pip install playwright && playwright install chromium")
+
+    httpd = start_server()
+    base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    print(f"Serving at {base_url}")
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()] if args.sizes else [None]
+    batches = [int(b) for b in args.batches.split(",") if b.strip()] if args.batches else [None]
+    print(f"{'mode':<8} {'size':>5} {'batch':>5} {'model':<20} {'top1':>7} {'mean':>8} {'p50':>8} {'p99':>8} "
+          f"{'wall(s)':>8} {'wasm MB':>16} {'page MB':>14}")
+    try:
+        with sync_playwright() as p:
+            browser = getattr(p, args.browser).launch()
+            for size, batch, mode in itertools.product(sizes, batches, modes):
+                page = browser.new_page()
+                page.on("dialog", lambda d: d.dismiss())
+                r = run_page(page, base_url, args.model, mode == "worker", int(args.timeout * 1000), size, batch,
+                             args.memory)
+                page.close()
+                label = f"{mode:<8} {size or '-':>5} {batch or '-':>5} {r['model']:<20}"
+                if not r["count"]:
+                    print(f"{label} (no results)")
+                    continue
+                s = latency_stats([t / 1000.0 for t in r["times"]])
+                top1 = r["correct"] / r["count"] * 100
+                print(f"{label} {top1:>6.1f}% {s['mean']:>8.2f} {s['p50']:>8.2f} {s['p99']:>8.2f} "
+                      f"{r['wallMs'] / 1000:>8.1f} {memory_columns(r.get('memory'))}")
+                if r.get("record") and not args.no_results:
+                    append_record(r["record"], args.results)
+            browser.close()
+    finally:
+        httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import glob
+import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from bench_common import (
+    CROP, MODELS_DIR, RESIZE, create_session, fixed_batch_size, is_uint8_input, load_image, load_labels, normalize,
+    softmax, topk_indices,
+)
+
+
+class DynamicBatcher:
+    # 同時に届いたリクエストを短い時間窓でまとめ、batch_size 軸で1回の session.run にする
+    def __init__(self, session, max_batch=32, window_ms=5.0):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        fixed = fixed_batch_size(session)
+        # dynamic_axes なしでエクスポートされたモデルはまとめられない
+        self.max_batch = fixed if fixed is not None else max_batch
+        self.window = window_ms / 1000.0
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "infer_sec": 0.0}
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def submit(self, tensor):
+        future = Future()
+        self.queue.put((tensor, future, time.perf_counter()))
+        return future
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            try:
+                x = np.stack([item[0] for item in batch])
+                logits = self.session.run(None, {self.input_name: x})[0]
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            infer_sec = time.perf_counter() - start
+            with self.lock:
+                self.stats["requests"] += len(batch)
+                self.stats["batches"] += 1
+                self.stats["infer_sec"] += infer_sec
+            for (_, future, enqueued), out in zip(batch, logits):
+                future.set_result({
+                    "logits": out,
+                    "batch_size": len(batch),
+                    "queue_ms": (start - enqueued) * 1000,
+                    "infer_ms": infer_sec * 1000,
+                })
+
+
+class InferenceService:
+    # モデルは起動時に1回だけ読み込む（models_caltech101/*.onnx）
+    def __init__(self, models_dir=MODELS_DIR, max_batch=32, window_ms=5.0, threads=0):
+        self.labels = load_labels()
+        self.models = {}
+        for path in sorted(glob.glob(os.path.join(models_dir, "*.onnx"))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            session = create_session(path, intra_op_num_threads=threads)
+            uint8 = is_uint8_input(session)
+            shape = session.get_inputs()[0].shape
+            # uint8 入力（*.u8.onnx）は NHWC、それ以外は NCHW
+            dim = shape[1] if uint8 else shape[2]
+            size = dim if isinstance(dim, int) else CROP
+            self.models[name] = {"batcher": DynamicBatcher(session, max_batch, window_ms), "size": size, "uint8": uint8}
+        self.default_model = "lmfrnet" if "lmfrnet" in self.models else next(iter(self.models), None)
+        self.started = time.perf_counter()
+
+    def describe(self):
+        return {
+            name: {"input_size": m["size"], "max_batch": m["batcher"].max_batch, "uint8_input": m["uint8"]}
+            for name, m in self.models.items()
+        }
+
+    def stats(self):
+        out = {}
+        elapsed = time.perf_counter() - self.started
+        for name, m in self.models.items():
+            with m["batcher"].lock:
+                s = dict(m["batcher"].stats)
+            s["mean_batch"] = s["requests"] / s["batches"] if s["batches"] else 0.0
+            s["images_per_sec"] = s["requests"] / elapsed if elapsed > 0 else 0.0
+            out[name] = s
+        return out
+
+    @staticmethod
+    def decode_image(body, size):
+        # 画像として読めない本文はクライアントの誤りなので ValueError にする（server.py が 400 を返す）
+        # PIL.UnidentifiedImageError や途中で切れた JPEG はどちらも OSError
+        try:
+            return load_image(io.BytesIO(body), RESIZE * size // CROP, size)
+        except OSError as e:
+            raise ValueError(f"body is not a decodable image ({type(e).__name__})") from e
+
+    def to_tensor(self, body, content_type, size, uint8=False):
+        if uint8:
+            # 前処理つきモデル: 生の HWC uint8（1枚分）か画像ファイル。正規化はグラフ内で行う
+            if content_type == "application/octet-stream":
+                x = np.frombuffer(body, dtype=np.uint8)
+                if x.size != size * size * 3:
+                    raise ValueError(f"raw image must be {size}x{size}x3 uint8 ({size * size * 3} bytes)")
+                return x.reshape(size, size, 3)
+            return self.decode_image(body, size)
+        if content_type in ("application/octet-stream", "application/x-float32"):
+            # 前処理済みの NCHW float32（1枚分）
+            x = np.frombuffer(body, dtype=np.float32)
+            if x.size != 3 * size * size:
+                raise ValueError(f"raw tensor must be 3x{size}x{size} float32 ({3 * size * size * 4} bytes)")
+            return x.reshape(3, size, size)
+        # それ以外は画像ファイルとしてデコードする（学習時と同じ前処理）
+        return normalize(self.decode_image(body, size))
+
+    def infer(self, body, content_type, model=None, topk=5, timeout=30.0):
+        name = model or self.default_model
+        if name not in self.models:
+            raise KeyError(name)
+        m = self.models[name]
+        result = m["batcher"].submit(self.to_tensor(body, content_type, m["size"], m["uint8"])).result(timeout)
+        probs = softmax(result["logits"])
+        top = topk_indices(probs, topk)
+        return {
+            "model": name,
+            "topk": [
+                {"index": int(i), "label": self.labels[i] if i < len(self.labels) else str(i), "prob": float(probs[i])}
+                for i in top
+            ],
+            "batch_size": result["batch_size"],
+            "queue_ms": result["queue_ms"],
+            "infer_ms": result["infer_ms"],
+        }
@@ -0,0 +1,304 @@
+import argparse
+import asyncio
+import functools
+import json
+import multiprocessing as mp
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+from bench_common import ROOT_DIR, SAMPLES_DIR, latency_stats, load_samples
+
+# server.py の負荷試験。サーバーは別プロセスで空きポートに起動し、asyncio のクライアント（Keep-Alive）から叩く
+ASSET_PATHS = [
+    "/index.html", "/main.js", "/preprocess.js", "/session_pool.js", "/worker.js", "/compare.js",
+    "/breakdown.js", "/memory.js", "/style.css", "/samples.json", "/labels.json", "/models_caltech101/models.json",
+]
+DEFAULT_MIX = "samples=6,assets=3,models=1"
+
+
+def serve(port_queue, infer, threads, max_batch, window_ms):
+    # 子プロセスで実行される（負荷をかける側と GIL を取り合わないように）
+    sys.path.insert(0, ROOT_DIR)
+    import server
+
+    os.chdir(ROOT_DIR)
+    # アクセスログの stderr 出力は計測のじゃまになるので止める
+    server.CustomHandler.log_message = lambda self, *args: None
+    server.assets = server.AssetCache(ROOT_DIR)
+    server.assets.preload()
+    if infer:
+        from inference_service import InferenceService
+        server.inference = InferenceService(max_batch=max_batch, window_ms=window_ms, threads=threads)
+    handler = functools.partial(server.CustomHandler, directory=ROOT_DIR)
+    httpd = server.ThreadingServer(("127.0.0.1", 0), handler)
+    port_queue.put(httpd.server_address[1])
+    httpd.serve_forever()
+
+
+def start_server_process(infer=False, threads=0, max_batch=32, window_ms=5.0):
+    ctx = mp.get_context("spawn")
+    port_queue = ctx.Queue()
+    proc = ctx.Process(target=serve, args=(port_queue, infer, threads, max_batch, window_ms), daemon=True)
+    proc.start()
+    port = port_queue.get(timeout=120)
+    return proc, port
+
+
+class Connection:
+    # 1本の Keep-Alive 接続。server.py は全レスポンスに Content-Length を付けるので chunked は扱わない
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b"", headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Accept-Encoding: br, gzip"]
+        lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        if body:
+            lines.append(f"Content-Length: {len(body)}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        received = len(status_line)
+        status = int(status_line.split()[1])
+        length, close = 0, False
+        while True:
+            line = await self.reader.readline()
+            received += len(line)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection" and value.strip().lower() == "close":
+                close = True
+        if length and method != "HEAD":
+            await self.reader.readexactly(length)
+            received += length
+        if close:
+            self.close()
+        return status, received
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip():
+            mix[name.strip()] = float(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def build_requests(mix, topk=5):
+    # シナリオごとに (method, path, body, headers) を順番に返すジェネレーターを作る
+    samples = load_samples()
+    with open(os.path.join(ROOT_DIR, "models_caltech101", "models.json")) as f:
+        models = [m["path"].lstrip(".") for m in json.load(f)["models"]]
+    assets = [p for p in ASSET_PATHS if os.path.exists(os.path.join(ROOT_DIR, p.lstrip("/")))]
+    images = None
+    if "infer" in mix:
+        images = []
+        for s in samples:
+            with open(os.path.join(SAMPLES_DIR, s["filename"]), "rb") as f:
+                images.append(f.read())
+
+    def cycle(items):
+        while True:
+            yield from items
+
+    sources = {
+        "samples": cycle([("GET", f"/samples/{s['filename']}", b"", None) for s in samples]),
+        "assets": cycle([("GET", p, b"", None) for p in assets]),
+        "models": cycle([("GET", p, b"", None) for p in models]),
+        "infer": cycle([("POST", f"/api/infer?topk={topk}", body, {"Content-Type": "image/jpeg"})
+                        for body in images]) if images else None,
+    }
+    unknown = [name for name in mix if name not in sources]
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {unknown} (choose from {list(sources)})")
+    return {name: sources[name] for name in mix}
+
+
+class Recorder:
+    def __init__(self, scenarios):
+        self.latencies = {name: [] for name in scenarios}
+        self.bytes = Counter()
+        self.errors = Counter()
+        self.status = {name: Counter() for name in scenarios}
+
+    def add(self, scenario, latency, status=None, received=0, error=None):
+        if error is not None:
+            self.errors[scenario] += 1
+            self.status[scenario][error] += 1
+            return
+        self.latencies[scenario].append(latency)
+        self.bytes[scenario] += received
+        self.status[scenario][status] += 1
+        if status >= 400:
+            self.errors[scenario] += 1
+
+
+async def issue(conn, recorder, scenario, request, start):
+    method, path, body, headers = request
+    try:
+        status, received = await conn.request(method, path, body, headers)
+    except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+        conn.close()
+        recorder.add(scenario, None, error=type(e).__name__)
+        return
+    recorder.add(scenario, time.perf_counter() - start, status, received)
+
+
+async def run_level(host, port, mix, concurrency, duration, rate, seed):
+    requests = build_requests(mix)
+    names, weights = list(mix), list(mix.values())
+    rng = random.Random(seed)
+    recorder = Recorder(names)
+    conns = asyncio.Queue()
+    for _ in range(concurrency):
+        conns.put_nowait(Connection(host, port))
+    deadline = time.perf_counter() + duration
+
+    async def one(scheduled):
+        scenario = rng.choices(names, weights)[0]
+        request = next(requests[scenario])
+        conn = await conns.get()
+        try:
+            # 開ループでは予定時刻から測る（接続待ちの時間もレイテンシに含める）
+            await issue(conn, recorder, scenario, request, scheduled)
+        finally:
+            conns.put_nowait(conn)
+
+    t0 = time.perf_counter()
+    if rate:
+        # 開ループ: 一定間隔でリクエストを発行する（サーバーが遅れても発行は止めない）
+        tasks = []
+        interval = 1.0 / rate
+        n = 0
+        while True:
+            scheduled = t0 + n * interval
+            if scheduled >= deadline:
+                break
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            tasks.append(asyncio.ensure_future(one(scheduled)))
+            n += 1
+        await asyncio.gather(*tasks)
+    else:
+        # 閉ループ: concurrency 本の接続がそれぞれ応答を受け取ったらすぐ次を送る
+        async def worker():
+            while time.perf_counter() < deadline:
+                await one(time.perf_counter())
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    while not conns.empty():
+        conns.get_nowait().close()
+    return summarize(recorder, elapsed)
+
+
+def summarize(recorder, elapsed):
+    rows = {}
+    for name, lat in recorder.latencies.items():
+        count = len(lat) + sum(v for k, v in recorder.status[name].items() if isinstance(k, str))
+        row = {
+            "requests": count,
+            "req_per_sec": count / elapsed,
+            "mb_per_sec": recorder.bytes[name] / elapsed / 1e6,
+            "bytes": recorder.bytes[name],
+            "errors": recorder.errors[name],
+            "error_rate": recorder.errors[name] / count * 100 if count else 0.0,
+            "status": {str(k): v for k, v in recorder.status[name].items()},
+        }
+        if lat:
+            row["latency_ms"] = latency_stats(lat)
+        rows[name] = row
+    all_lat = [t for lat in recorder.latencies.values() for t in lat]
+    total = sum(r["requests"] for r in rows.values())
+    errors = sum(r["errors"] for r in rows.values())
+    rows["total"] = {
+        "requests": total,
+        "req_per_sec": total / elapsed,
+        "mb_per_sec": sum(recorder.bytes.values()) / elapsed / 1e6,
+        "bytes": sum(recorder.bytes.values()),
+        "errors": errors,
+        "error_rate": errors / total * 100 if total else 0.0,
+    }
+    if all_lat:
+        rows["total"]["latency_ms"] = latency_stats(all_lat)
+    return {"elapsed": elapsed, "scenarios": rows}
+
+
+def print_level(concurrency, rate, result):
+    mode = f"rate={rate}/s, max {concurrency} conns" if rate else f"concurrency={concurrency}"
+    print(f"\n--- {mode} ({result['elapsed']:.1f}s) ---")
+    print(f"{'scenario':<10} {'reqs':>7} {'req/s':>8} {'MB/s':>8} {'err%':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for name, r in result["scenarios"].items():
+        lat = r.get("latency_ms")
+        cols = (f"{lat['p50']:>8.2f} {lat['p90']:>8.2f} {lat['p99']:>8.2f} {lat['max']:>8.2f}"
+                if lat else f"{'--':>8} {'--':>8} {'--':>8} {'--':>8}")
+        print(f"{name:<10} {r['requests']:>7} {r['req_per_sec']:>8.1f} {r['mb_per_sec']:>8.2f} "
+              f"{r['error_rate']:>5.1f}% {cols}")
+    for name, r in result["scenarios"].items():
+        odd = {k: v for k, v in r.get("status", {}).items() if k not in ("200", "206", "304")}
+        if odd:
+            print(f"  {name}: {odd}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio load generator for server.py (ephemeral local server)")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help="scenario weights: samples, assets, models, infer (e.g. samples=6,assets=3,models=1)")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated connection counts to test")
+    parser.add_argument("--rate", type=float, default=None, help="open-loop request rate (req/s) instead of closed loop")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--url", default=None, help="test an already running server (http://host:port) instead")
+    parser.add_argument("--infer", action="store_true", help="start the server with --infer (adds the 'infer' scenario)")
+    parser.add_argument("--threads", type=int, default=0, help="server intra_op_num_threads when --infer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    if args.infer and "infer" not in mix:
+        mix["infer"] = 1.0
+    proc = None
+    if args.url:
+        host, _, port = args.url.split("://")[-1].rstrip("/").partition(":")
+        port = int(port or 80)
+    else:
+        proc, port = start_server_process(infer=args.infer, threads=args.threads)
+        host = "127.0.0.1"
+        print(f"Started server.py at http://{host}:{port} (pid {proc.pid})")
+
+    results = []
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+            result = asyncio.run(run_level(host, port, mix, concurrency, args.duration, args.rate, args.seed))
+            print_level(concurrency, args.rate, result)
+            results.append({"concurrency": concurrency, "rate": args.rate, **result})
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.join(5)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"mix": mix, "duration": args.duration, "levels": results}, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
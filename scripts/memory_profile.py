@@ -0,0 +1,174 @@
+import argparse
+import glob
+import importlib
+import json
+import multiprocessing as mp
+import os
+import resource
+import sys
+import time
+
+# メモリ使用量の計測。ピーク RSS はプロセス単位で下がらないので、条件ごとに新しいプロセス（spawn）で測る
+# ORT の Python API はアリーナの使用量を返さないため、アリーナ / メモリパターンの on/off による RSS の差で見る
+ARENA_CONFIGS = {
+    "default": (True, True),
+    "no-arena": (False, True),
+    "no-pattern": (True, False),
+    "off": (False, False),
+}
+IMPORT_STEPS = ["numpy", "onnxruntime", "PIL.Image", "onnx", "torch", "torchvision"]
+
+
+def rss_bytes():
+    # 現在の RSS（Linux の /proc から。ほかの OS では None）
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def delta(after, before):
+    return after - before if after is not None and before is not None else None
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS は bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure_imports():
+    # 1つずつ import して RSS の増加を記録する（torch / torchvision を読むスクリプトの下限）
+    steps = []
+    before = rss_bytes()
+    for name in IMPORT_STEPS:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            steps.append({"module": name, "available": False})
+            continue
+        after = rss_bytes()
+        steps.append({"module": name, "available": True, "rss": after, "delta": delta(after, before)})
+        before = after
+    return {"steps": steps, "peak_rss": peak_rss_bytes()}
+
+
+def measure_session(model_path, batch, arena, mem_pattern, runs, threads):
+    import numpy as np
+    import onnxruntime as ort
+
+    from bench_common import CROP, fixed_batch_size, is_preoptimized, is_uint8_input
+
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = threads
+    opts.enable_cpu_mem_arena = arena
+    opts.enable_mem_pattern = mem_pattern
+    if is_preoptimized(model_path):
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+
+    base = rss_bytes()
+    session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+    after_create = rss_bytes()
+    fixed = fixed_batch_size(session)
+    if fixed is not None and fixed != batch:
+        return {"skipped": f"fixed batch size {fixed}"}
+
+    inp = session.get_inputs()[0]
+    shape = [batch] + [d if isinstance(d, int) else CROP for d in inp.shape[1:]]
+    rng = np.random.default_rng(0)
+    if is_uint8_input(session):
+        x = rng.integers(0, 256, size=shape, dtype=np.uint8)
+    else:
+        x = rng.standard_normal(shape, dtype=np.float32)
+    # 入力テンソルの分は差し引けるように、推論前に確保してから測る
+    before_run = rss_bytes()
+    session.run(None, {inp.name: x})
+    after_first = rss_bytes()
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        session.run(None, {inp.name: x})
+    latency = (time.perf_counter() - t0) / runs * 1000
+    after_runs = rss_bytes()
+    return {
+        "base_rss": base,
+        "session": delta(after_create, base),
+        "first_run": delta(after_first, before_run),
+        # 入力テンソルの確保分を除いた、セッション作成からの増加
+        "steady": delta(delta(after_runs, base), delta(before_run, after_create)),
+        "peak_rss": peak_rss_bytes(),
+        "latency_ms": latency,
+    }
+
+
+def in_subprocess(fn, *args):
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(fn, args)
+
+
+def mb(n):
+    return f"{n / 2**20:8.1f}" if n is not None else f"{'--':>8}"
+
+
+def main():
+    # bench_common は numpy / onnxruntime / PIL を読むので、import の計測（子プロセス）の前には読み込まない
+    from bench_common import MODELS_DIR
+
+    parser = argparse.ArgumentParser(description="Peak RSS and ORT session memory per model, batch size and arena options")
+    parser.add_argument("models", nargs="*", help=".onnx / .ort files (default: models_caltech101/*.onnx)")
+    parser.add_argument("--batches", default="1,8,32", help="comma separated batch sizes (fixed-batch models use their own)")
+    parser.add_argument("--configs", default=",".join(ARENA_CONFIGS),
+                        help="arena / memory pattern settings: " + ", ".join(ARENA_CONFIGS))
+    parser.add_argument("--runs", type=int, default=20, help="inference runs after the first one")
+    parser.add_argument("--threads", type=int, default=0, help="intra_op_num_threads (0 = ORT default)")
+    parser.add_argument("--no-imports", action="store_true", help="skip the import-cost measurement")
+    parser.add_argument("--output", default=None, help="write the measurements as JSON")
+    args = parser.parse_args()
+
+    if rss_bytes() is None:
+        print("Warning: current RSS is not available on this platform (only peak RSS is reported)")
+    models = args.models or sorted(glob.glob(os.path.join(MODELS_DIR, "*.onnx")))
+    batches = [int(b) for b in args.batches.split(",") if b.strip()]
+    configs = [c for c in args.configs.split(",") if c.strip()]
+    unknown = [c for c in configs if c not in ARENA_CONFIGS]
+    if unknown:
+        raise SystemExit(f"unknown configs: {unknown} (choose from {list(ARENA_CONFIGS)})")
+
+    report = {"models": {}}
+    if not args.no_imports:
+        imports = in_subprocess(measure_imports)
+        report["imports"] = imports
+        print("Import cost (RSS after each import, MB):")
+        for step in imports["steps"]:
+            if step["available"]:
+                print(f"  {step['module']:<12} {mb(step['rss'])}  (+{mb(step['delta']).strip()})")
+            else:
+                print(f"  {step['module']:<12} {'not installed':>8}")
+        print(f"  peak RSS {mb(imports['peak_rss']).strip()} MB")
+
+    for path in models:
+        name = os.path.basename(path)
+        print(f"\n{name} ({os.path.getsize(path) / 1e6:.2f} MB on disk)")
+        print(f"{'batch':>5} {'config':<11} {'session':>8} {'1st run':>8} {'steady':>8} {'peak RSS':>8} {'ms/batch':>9}  (MB)")
+        rows = []
+        for batch in batches:
+            for config in configs:
+                arena, mem_pattern = ARENA_CONFIGS[config]
+                r = in_subprocess(measure_session, path, batch, arena, mem_pattern, args.runs, args.threads)
+                if "skipped" in r:
+                    print(f"{batch:>5} {'':<11} skipped: {r['skipped']}")
+                    break
+                rows.append({"batch": batch, "config": config, "arena": arena, "mem_pattern": mem_pattern, **r})
+                print(f"{batch:>5} {config:<11} {mb(r['session'])} {mb(r['first_run'])} {mb(r['steady'])} "
+                      f"{mb(r['peak_rss'])} {r['latency_ms']:>9.2f}")
+        report["models"][name] = rows
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
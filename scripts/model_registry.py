@@ -0,0 +1,121 @@
+import os
+import sys
+
+import torch
+import torchvision
+
+# Add LMFRNet to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../LMFRNet'))
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def build_lmfrnet(num_classes):
+    from lmfrnet.OurLMFRNet import LMFRNet
+    return LMFRNet(num_classes=num_classes)
+
+
+def build_lmfrnet_hires(num_classes):
+    from lmfrnet.LMFRNet_hires import LMFRNet as LMFRNetHires
+    return LMFRNetHires(num_classes=num_classes)
+
+
+def build_resnet18(num_classes):
+    return torchvision.models.resnet18(weights=None, num_classes=num_classes)
+
+
+def build_resnet18_cifar(num_classes):
+    model = torchvision.models.resnet18(weights=None, num_classes=num_classes)
+    model.conv1 = torch.nn.Conv2d(3, 64, kernel_size=3, stride=1, padding=1, bias=False)
+    model.maxpool = torch.nn.Identity()
+    return model
+
+
+def build_mobilenetv3(num_classes):
+    return torchvision.models.mobilenet_v3_large(weights=None, num_classes=num_classes)
+
+
+def build_mobilenetv3_cifar(num_classes):
+    model = torchvision.models.mobilenet_v3_large(weights=None, num_classes=num_classes)
+    model.features[0][0] = torch.nn.Conv2d(3, 16, kernel_size=3, stride=1, padding=1, bias=False)
+    return model
+
+
+BUILDERS = {
+    "lmfrnet": build_lmfrnet,
+    "lmfrnet_hires": build_lmfrnet_hires,
+    "resnet18": build_resnet18,
+    "resnet18_cifar": build_resnet18_cifar,
+    "mobilenetv3": build_mobilenetv3,
+    "mobilenetv3_cifar": build_mobilenetv3_cifar,
+}
+
+# モデル定義（グループごとにチェックポイントの置き場所と出力先が異なる）
+MODEL_GROUPS = {
+    "caltech101": {
+        # 実験2のログルート
+        "checkpoint_root": "/home/loki/LMFRNet/outputs/experiment2",
+        "output_dir": os.path.join(ROOT_DIR, "models_caltech101"),
+        "sanity_check": True,
+        "web_manifest": True,
+        "models": [
+            {"name": "lmfrnet", "arch": "lmfrnet", "checkpoint": "lmfrnet_s0/best_model.pt",
+             "num_classes": 101, "input_shape": (1, 3, 224, 224), "dynamic_batch": True,
+             "dynamic_spatial": True},
+            {"name": "lmfrnet_hires", "arch": "lmfrnet_hires", "checkpoint": "lmfrnet_hires_s0/best_model.pt",
+             "num_classes": 101, "input_shape": (1, 3, 224, 224), "dynamic_batch": True,
+             "dynamic_spatial": True},
+            {"name": "resnet18", "arch": "resnet18", "checkpoint": "resnet18_s0/best_model.pt",
+             "num_classes": 101, "input_shape": (1, 3, 224, 224), "dynamic_batch": True,
+             "dynamic_spatial": True},
+            {"name": "mobilenetv3_large", "arch": "mobilenetv3", "checkpoint": "mobilenetv3_large_s0/best_model.pt",
+             "num_classes": 101, "input_shape": (1, 3, 224, 224), "dynamic_batch": True,
+             "dynamic_spatial": True},
+        ],
+    },
+    "cifar": {
+        "checkpoint_root": "checkpoint",
+        "output_dir": "models_onnx",
+        "sanity_check": False,
+        "models": [
+            # The user's training script used default LMFRNet() which has num_classes=100
+            {"name": "lmfrnet", "arch": "lmfrnet", "checkpoint": "lmfrnet/ckpt.pth",
+             "num_classes": 100, "input_shape": (1, 3, 32, 32), "dynamic_batch": True,
+             "dynamic_spatial": True},
+            {"name": "mobilenetv3_large", "arch": "mobilenetv3_cifar", "checkpoint": "mobilenetv3_large/ckpt.pth",
+             "num_classes": 10, "input_shape": (1, 3, 32, 32), "dynamic_batch": True,
+             "dynamic_spatial": True},
+            {"name": "resnet18", "arch": "resnet18_cifar", "checkpoint": "resnet18/ckpt.pth",
+             "num_classes": 10, "input_shape": (1, 3, 32, 32), "dynamic_batch": True,
+             "dynamic_spatial": True},
+        ],
+    },
+}
+
+
+def unwrap_state_dict(checkpoint):
+    # 学習スクリプトごとに保存形式が違う（net / state_dict / model_state_dict / 素の state_dict）
+    state_dict = checkpoint
+    if isinstance(checkpoint, dict):
+        for key in ("model_state_dict", "state_dict", "net"):
+            if key in checkpoint:
+                state_dict = checkpoint[key]
+                break
+
+    # Remove 'module.' prefix if present (from DataParallel)
+    new_state_dict = {}
+    for k, v in state_dict.items():
+        name = k[7:] if k.startswith('module.') else k
+        new_state_dict[name] = v
+    return new_state_dict
+
+
+def load_state_dict(path):
+    return unwrap_state_dict(torch.load(path, map_location='cpu'))
+
+
+def build_model(spec, checkpoint_path):
+    model = BUILDERS[spec["arch"]](spec["num_classes"])
+    model.load_state_dict(load_state_dict(checkpoint_path))
+    model.eval()
+    return model
@@ -0,0 +1,104 @@
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import onnxruntime as ort
+
+from bench_common import MODELS_DIR, create_session, load_samples
+from tensor_cache import load_cached_tensors
+
+# extended: 定数畳み込み / Conv+BN 等の融合まで（どの EP でも読める。ブラウザの WASM 版でも使える）
+# all: さらに CPU 向けのレイアウト変換（NCHWc）を含む。保存したマシンと同種の CPU 専用
+LEVELS = {
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+def optimized_path_for(model_path, fmt="onnx"):
+    root, _ = os.path.splitext(model_path)
+    return f"{root}.opt.onnx" if fmt == "onnx" else f"{root}.ort"
+
+
+def save_optimized(model_path, output_path, level="extended"):
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = LEVELS[level]
+    opts.optimized_model_filepath = output_path
+    if output_path.endswith(".ort"):
+        opts.add_session_config_entry("session.save_model_format", "ORT")
+    ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+    return output_path
+
+
+def session_create_ms(model_path, repeats=5):
+    # セッション作成（読み込み + グラフ最適化）の中央値
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        create_session(model_path)
+        times.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(times))
+
+
+def check_equivalence(model_path, optimized_path, inputs, rtol=1e-3, atol=1e-4):
+    ref = create_session(model_path)
+    opt = create_session(optimized_path)
+    batch = ref.get_inputs()[0].shape[0]
+    batch = batch if isinstance(batch, int) else len(inputs)
+    max_diff = 0.0
+    agree = 0
+    for start in range(0, len(inputs), batch):
+        x = np.ascontiguousarray(inputs[start:start + batch])
+        a = ref.run(None, {ref.get_inputs()[0].name: x})[0]
+        b = opt.run(None, {opt.get_inputs()[0].name: x})[0]
+        np.testing.assert_allclose(a, b, rtol=rtol, atol=atol)
+        max_diff = max(max_diff, float(np.abs(a - b).max()))
+        agree += int((a.argmax(1) == b.argmax(1)).sum())
+    return max_diff, agree / len(inputs) * 100
+
+
+def optimize_and_report(model_path, level="extended", fmt="onnx", num_check=32):
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    output_path = optimized_path_for(model_path, fmt)
+    save_optimized(model_path, output_path, level)
+
+    inputs, _ = load_cached_tensors(load_samples())
+    max_diff, agreement = check_equivalence(model_path, output_path, inputs[:num_check])
+
+    before = session_create_ms(model_path)
+    after = session_create_ms(output_path)
+    report = {
+        "file": os.path.basename(output_path),
+        "level": level,
+        "size": os.path.getsize(output_path),
+        "create_ms": before,
+        "optimized_create_ms": after,
+        "create_ms_saved": before - after,
+        "max_abs_diff": max_diff,
+        "agreement": agreement,
+    }
+    print(f"[{name}] Saved {output_path} (level={level}, {report['size'] / 1e6:.2f} MB)")
+    print(f"[{name}] session create {before:.1f}ms -> {after:.1f}ms (saved {before - after:.1f}ms), "
+          f"max |diff| {max_diff:.2e}, top-1 agreement {agreement:.1f}%")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialize ORT-optimized graphs (*.opt.onnx / *.ort)")
+    parser.add_argument("models", nargs="*", help=".onnx files (default: models_caltech101/*.onnx)")
+    parser.add_argument("--level", default="extended", choices=sorted(LEVELS))
+    parser.add_argument("--format", default="onnx", choices=["onnx", "ort"])
+    args = parser.parse_args()
+
+    models = args.models or sorted(
+        p for p in glob.glob(os.path.join(MODELS_DIR, "*.onnx"))
+        if not p.endswith((".opt.onnx", "_int8.onnx", ".u8.onnx", "_fp16.onnx", "_fp16w.onnx")))
+    for path in models:
+        optimize_and_report(path, args.level, args.format)
+
+
+if __name__ == "__main__":
+    main()
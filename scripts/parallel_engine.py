@@ -0,0 +1,118 @@
+import multiprocessing as mp
+import os
+import queue
+import time
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from bench_common import create_session, fixed_batch_size, run_batched
+
+# ワーカープロセスごとの状態（セッションは各プロセスで1つだけ作る）
+_worker = {}
+INIT_TIMEOUT = 300  # 全ワーカーのセッション作成を待つ最大秒数
+
+
+def _pin_to_cores(cores):
+    # Linux のみ: ワーカーを専用のコアに固定して intra-op スレッドの奪い合いを防ぐ
+    if cores and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError:
+            pass
+
+
+def _init_worker(model_path, threads, shm_name, shape, dtype, core_queue, ready_queue):
+    # 例外で終わると Pool が代わりのワーカーを起動し、そのワーカーは空の core_queue を待ち続けるので、
+    # 例外はここで捕まえて親に渡す（親が送出して Pool ごと終了する）
+    try:
+        try:
+            cores = core_queue.get(timeout=5)
+        except queue.Empty:
+            cores = None
+        _pin_to_cores(cores)
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _worker["shm"] = shm
+        _worker["inputs"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        session = create_session(model_path, intra_op_num_threads=threads)
+        _worker["session"] = session
+        # ウォームアップ（セッション初期化コストを計測に含めない）。バッチ軸が固定のモデルはその枚数で
+        batch = fixed_batch_size(session) or 1
+        run_batched(session, _worker["inputs"][:batch], batch)
+    except Exception:
+        ready_queue.put(("error", traceback.format_exc()))
+        return
+    ready_queue.put(("ready", os.getpid()))
+
+
+def _run_shard(task):
+    start, end, batch_size = task
+    logits, times = run_batched(_worker["session"], _worker["inputs"][start:end], batch_size)
+    return start, logits, times
+
+
+def split_shards(total, num_shards, batch_size):
+    # バッチ境界に揃えて連続区間に分割する（結果を順番通りに戻せるように）
+    num_batches = -(-total // batch_size)
+    per_shard = -(-num_batches // num_shards)
+    shards = []
+    for i in range(num_shards):
+        start = i * per_shard * batch_size
+        end = min(total, (i + 1) * per_shard * batch_size)
+        if start < end:
+            shards.append((start, end, batch_size))
+    return shards
+
+
+def core_sets(workers, threads):
+    if not hasattr(os, "sched_getaffinity"):
+        return [None] * workers
+    cores = sorted(os.sched_getaffinity(0))
+    if workers * threads > len(cores):
+        return [None] * workers
+    return [set(cores[i * threads:(i + 1) * threads]) for i in range(workers)]
+
+
+def run_parallel(model_path, inputs, batch_size, workers, threads=None, pin=True):
+    """Shard ``inputs`` across ``workers`` processes; returns (logits, elapsed_sec) in input order."""
+    if threads is None:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+    # uint8 は前処理つきモデル（*.u8.onnx）の画像入力
+    inputs = np.ascontiguousarray(inputs, dtype=np.uint8 if inputs.dtype == np.uint8 else np.float32)
+
+    ctx = mp.get_context("spawn")
+    shm = shared_memory.SharedMemory(create=True, size=inputs.nbytes)
+    try:
+        np.ndarray(inputs.shape, dtype=inputs.dtype, buffer=shm.buf)[...] = inputs
+        core_queue = ctx.Queue()
+        ready_queue = ctx.Queue()
+        for cores in (core_sets(workers, threads) if pin else [None] * workers):
+            core_queue.put(cores)
+
+        with ctx.Pool(workers, initializer=_init_worker,
+                      initargs=(model_path, threads, shm.name, inputs.shape, inputs.dtype.str, core_queue, ready_queue)) as pool:
+            # 全ワーカーの初期化完了を待ってから計測を始める
+            for _ in range(workers):
+                try:
+                    status, detail = ready_queue.get(timeout=INIT_TIMEOUT)
+                except queue.Empty:
+                    raise RuntimeError(f"worker initialization did not finish within {INIT_TIMEOUT}s") from None
+                if status == "error":
+                    raise RuntimeError(f"worker initialization failed:\n{detail}")
+            shards = split_shards(len(inputs), workers, batch_size)
+            t0 = time.perf_counter()
+            results = pool.map(_run_shard, shards, chunksize=1)
+            elapsed = time.perf_counter() - t0
+    finally:
+        shm.close()
+        shm.unlink()
+
+    results.sort(key=lambda r: r[0])
+    return np.concatenate([r[1] for r in results], axis=0), elapsed
+
+
+def parse_workers(spec):
+    # "1,2,4,N" の N は CPU コア数
+    n = os.cpu_count() or 1
+    return sorted({n if w.strip().upper() == "N" else int(w) for w in spec.split(",") if w.strip()})
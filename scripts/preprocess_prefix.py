@@ -0,0 +1,161 @@
+import argparse
+import glob
+import os
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+from bench_common import BIAS, MODELS_DIR, SAMPLES_DIR, SCALE, create_session, load_image, load_samples, normalize
+
+# 前処理を含むモデルの入力名（uint8 NHWC）
+IMAGE_INPUT = "image"
+
+
+def prefix_path_for(model_path):
+    root, _ = os.path.splitext(model_path)
+    return f"{root}.u8.onnx"
+
+
+def dim_of(dim):
+    # 固定長なら int、可変（dim_param）ならその名前。どちらもない（0）次元は扱えない
+    if dim.dim_param:
+        return dim.dim_param
+    if dim.dim_value > 0:
+        return dim.dim_value
+    raise ValueError("input has a dimension with neither a size nor a name")
+
+
+def add_prefix(model, resize=False, input_size=None):
+    # uint8 NHWC -> Cast -> Transpose -> (Resize) -> x * SCALE + BIAS -> 元の float32 NCHW 入力
+    # input_size: resize のときのリサイズ先 (H, W)。省略時はグラフの入力サイズ（H/W 可変のモデルでは必須）
+    graph = model.graph
+    initializer_names = {init.name for init in graph.initializer}
+    inputs = [i for i in graph.input if i.name not in initializer_names]
+    if len(inputs) != 1:
+        raise ValueError(f"expected a single image input, got {[i.name for i in inputs]}")
+    orig = inputs[0]
+    dims = orig.type.tensor_type.shape.dim
+    if orig.type.tensor_type.elem_type != TensorProto.FLOAT or len(dims) != 4:
+        raise ValueError(f"input '{orig.name}' is not a float32 NCHW tensor")
+    batch, height, width = dim_of(dims[0]), dim_of(dims[2]), dim_of(dims[3])
+
+    nodes = [
+        helper.make_node("Cast", [IMAGE_INPUT], ["pre_float"], to=TensorProto.FLOAT),
+        helper.make_node("Transpose", ["pre_float"], ["pre_nchw"], perm=[0, 3, 1, 2]),
+    ]
+    initializers = [
+        numpy_helper.from_array(SCALE.reshape(1, 3, 1, 1), "pre_scale"),
+        numpy_helper.from_array(BIAS.reshape(1, 3, 1, 1), "pre_bias"),
+    ]
+    last = "pre_nchw"
+    if resize:
+        # 任意の H x W を学習時の入力サイズにリサイズする（アスペクト比の調整・クロップはクライアント側）
+        target = tuple(input_size) if input_size else (height, width)
+        if not all(isinstance(d, int) and d > 0 for d in target):
+            raise ValueError(f"resize target must be positive integers, got {target} "
+                             "(pass input_size for models exported with dynamic H/W)")
+        initializers += [
+            numpy_helper.from_array(np.array(target, dtype=np.int64), "pre_hw"),
+            numpy_helper.from_array(np.array([], dtype=np.float32), "pre_empty"),
+        ]
+        nodes += [
+            helper.make_node("Shape", [last], ["pre_shape"]),
+            helper.make_node("Slice", ["pre_shape", "pre_zero", "pre_two"], ["pre_nc"]),
+            helper.make_node("Concat", ["pre_nc", "pre_hw"], ["pre_sizes"], axis=0),
+            helper.make_node("Resize", [last, "pre_empty", "pre_empty", "pre_sizes"], ["pre_resized"],
+                             mode="linear", coordinate_transformation_mode="half_pixel"),
+        ]
+        initializers += [
+            numpy_helper.from_array(np.array([0], dtype=np.int64), "pre_zero"),
+            numpy_helper.from_array(np.array([2], dtype=np.int64), "pre_two"),
+        ]
+        last = "pre_resized"
+    nodes += [
+        helper.make_node("Mul", [last, "pre_scale"], ["pre_scaled"]),
+        helper.make_node("Add", ["pre_scaled", "pre_bias"], [orig.name]),
+    ]
+
+    image = helper.make_tensor_value_info(
+        IMAGE_INPUT, TensorProto.UINT8,
+        [batch, "height" if resize else height, "width" if resize else width, 3])
+    graph.input.remove(orig)
+    graph.input.insert(0, image)
+    for node in reversed(nodes):
+        graph.node.insert(0, node)
+    graph.initializer.extend(initializers)
+    onnx.checker.check_model(model)
+    return model
+
+
+def load_sample_images(samples, samples_dir=SAMPLES_DIR, num=None):
+    # NHWC uint8（前処理モデルにそのまま渡せる形）
+    samples = samples[:num] if num else samples
+    return np.stack([load_image(os.path.join(samples_dir, s["filename"])) for s in samples])
+
+
+def check_equivalence(model_path, prefixed_path, images, rtol=1e-3, atol=1e-4):
+    ref = create_session(model_path)
+    pre = create_session(prefixed_path)
+    batch = ref.get_inputs()[0].shape[0]
+    batch = batch if isinstance(batch, int) else len(images)
+    max_diff = 0.0
+    agree = 0
+    for start in range(0, len(images), batch):
+        x = images[start:start + batch]
+        a = ref.run(None, {ref.get_inputs()[0].name: normalize(x)})[0]
+        b = pre.run(None, {IMAGE_INPUT: x})[0]
+        np.testing.assert_allclose(a, b, rtol=rtol, atol=atol)
+        max_diff = max(max_diff, float(np.abs(a - b).max()))
+        agree += int((a.argmax(1) == b.argmax(1)).sum())
+    return max_diff, agree / len(images) * 100
+
+
+def add_prefix_and_report(model_path, resize=False, num_check=32, input_size=None):
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    output_path = prefix_path_for(model_path)
+    model = add_prefix(onnx.load(model_path), resize=resize, input_size=input_size)
+    # 一致を確かめてから置き換える（失敗したモデルを models_caltech101/ に残さない）
+    tmp_path = output_path + ".tmp"
+    onnx.save(model, tmp_path)
+    try:
+        images = load_sample_images(load_samples(), num=num_check)
+        max_diff, agreement = check_equivalence(model_path, tmp_path, images)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+    report = {
+        "file": os.path.basename(output_path),
+        "resize": resize,
+        "size": os.path.getsize(output_path),
+        "input_bytes_per_image": int(images[0].nbytes),
+        "float_input_bytes_per_image": int(images[0].size * 4),
+        "max_abs_diff": max_diff,
+        "agreement": agreement,
+    }
+    print(f"[{name}] Saved {output_path} (uint8 NHWC input{', resize' if resize else ''})")
+    print(f"[{name}] input {report['float_input_bytes_per_image'] / 1024:.0f} KiB -> "
+          f"{report['input_bytes_per_image'] / 1024:.0f} KiB per image, "
+          f"max |diff| {max_diff:.2e}, top-1 agreement {agreement:.1f}%")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepend uint8 NHWC -> normalized NCHW preprocessing to ONNX models")
+    parser.add_argument("models", nargs="*", help=".onnx files (default: models_caltech101/*.onnx)")
+    parser.add_argument("--resize", action="store_true", help="accept any HxW and resize inside the graph")
+    parser.add_argument("--input-size", type=int, default=None,
+                        help="resize target (square) for models exported with dynamic H/W")
+    args = parser.parse_args()
+
+    models = args.models or sorted(
+        p for p in glob.glob(os.path.join(MODELS_DIR, "*.onnx"))
+        if not p.endswith((".opt.onnx", "_int8.onnx", ".u8.onnx", "_fp16.onnx", "_fp16w.onnx")))
+    for path in models:
+        size = (args.input_size, args.input_size) if args.input_size else None
+        add_prefix_and_report(path, args.resize, input_size=size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import glob
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+from bench_common import MODELS_DIR, create_session, is_uint8_input, latency_stats, load_samples
+from preprocess_prefix import load_sample_images
+from tensor_cache import load_cached_tensors
+
+
+def measure_latency(session, inputs, warmup, iters):
+    # ウォームアップ（初回のメモリ確保・カーネル選択）は計測に含めない
+    name = session.get_inputs()[0].name
+    for i in range(warmup):
+        session.run(None, {name: inputs[i % len(inputs)][None]})
+    times = []
+    for i in range(iters):
+        x = inputs[i % len(inputs)][None]
+        t0 = time.perf_counter()
+        session.run(None, {name: x})
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def profile_ops(model_path, inputs, warmup, iters, threads=0):
+    # 計測とは別のセッションで ORT プロファイラを有効にし、演算子の種類ごとに時間を集計する
+    # （スレッド数はレイテンシ計測と同じにする。違うと演算子ごとの時間が比べられない）
+    with tempfile.TemporaryDirectory() as tmp:
+        session = create_session(model_path, intra_op_num_threads=threads,
+                                 profile_prefix=os.path.join(tmp, "ort_profile"))
+        name = session.get_inputs()[0].name
+        for i in range(warmup + iters):
+            session.run(None, {name: inputs[i % len(inputs)][None]})
+        with open(session.end_profiling(), "r") as f:
+            events = json.load(f)
+
+    # ウォームアップ分の実行を除く（model_run イベントの順番で区切る）
+    runs = [e for e in events if e.get("cat") == "Session" and e.get("name") == "model_run"]
+    start_ts = runs[warmup]["ts"] if len(runs) > warmup else 0
+
+    per_op = defaultdict(float)
+    for e in events:
+        if e.get("cat") != "Node" or not e["name"].endswith("_kernel_time") or e["ts"] < start_ts:
+            continue
+        per_op[e["args"].get("op_name", "?")] += e["dur"] / 1000.0 / iters  # ms / run
+    return dict(per_op)
+
+
+def print_ops(title, per_op, top):
+    total = sum(per_op.values()) or 1.0
+    print(f"\n{title}")
+    print(f"  {'op_type':<24} {'ms/run':>8} {'share':>7}")
+    for op, ms in sorted(per_op.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"  {op:<24} {ms:>8.3f} {ms / total * 100:>6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency percentiles and per-operator breakdown")
+    parser.add_argument("models", nargs="*", help=".onnx files (default: models_caltech101/*.onnx)")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--iters", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=0, help="intra_op_num_threads (0 = ORT default)")
+    parser.add_argument("--top", type=int, default=10, help="op types to show per model")
+    parser.add_argument("--no-ops", action="store_true", help="skip the ORT profiler pass")
+    args = parser.parse_args()
+
+    models = args.models or sorted(glob.glob(os.path.join(MODELS_DIR, "*.onnx")))
+    samples = load_samples()
+    inputs, _ = load_cached_tensors(samples)
+    images = None
+
+    print(f"{'model':<28} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}  (ms, batch=1)")
+    rows = []
+    for path in models:
+        session = create_session(path, intra_op_num_threads=args.threads)
+        x = inputs
+        if is_uint8_input(session):
+            # 前処理つきモデル（*.u8.onnx）は uint8 NHWC の画像を渡す
+            images = load_sample_images(samples) if images is None else images
+            x = images
+        s = latency_stats(measure_latency(session, x, args.warmup, args.iters))
+        name = os.path.basename(path)
+        print(f"{name:<28} {s['mean']:>8.2f} {s['p50']:>8.2f} {s['p90']:>8.2f} {s['p99']:>8.2f} {s['max']:>8.2f}")
+        rows.append((name, path, x))
+
+    if args.no_ops:
+        return
+
+    combined = defaultdict(float)
+    for name, path, x in rows:
+        per_op = profile_ops(path, x, args.warmup, args.iters, args.threads)
+        print_ops(f"--- {name}: time per op type ---", per_op, args.top)
+        for op, ms in per_op.items():
+            combined[op] += ms
+    if len(rows) > 1:
+        print_ops("--- All models: time per op type ---", combined, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import numpy as np
+import onnx
+from onnx import version_converter
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from bench_common import MODELS_DIR, create_session, load_samples, run_batched, topk_correct
+from tensor_cache import load_cached_tensors
+
+
+QUANT_OP_TYPES = ["Conv", "Gemm", "MatMul"]
+
+
+class SampleCalibrationReader(CalibrationDataReader):
+    # 前処理済みの samples.json テンソルをキャリブレーションに使う
+    def __init__(self, input_name, inputs, batch_size=1):
+        self.input_name = input_name
+        self.inputs = inputs
+        self.batch_size = batch_size
+        self.pos = 0
+
+    def get_next(self):
+        if self.pos >= len(self.inputs):
+            return None
+        batch = np.ascontiguousarray(self.inputs[self.pos:self.pos + self.batch_size])
+        self.pos += self.batch_size
+        return {self.input_name: batch}
+
+    def rewind(self):
+        self.pos = 0
+
+
+def int8_path_for(fp32_path):
+    root, ext = os.path.splitext(fp32_path)
+    return f"{root}_int8{ext}"
+
+
+def calibration_split(count, num_calib):
+    # キャリブレーションと評価の画像を分ける（同じ画像で評価すると精度が甘く出る）
+    # samples.json はクラス順に並んでいるので、先頭から取らずに一定間隔で取り、両方に多くのクラスが入るようにする
+    step = max(2, count // max(num_calib, 1))
+    calib = np.arange(1, count, step)[:num_calib]
+    if len(calib) == 0:
+        raise ValueError(f"not enough images for a calibration / evaluation split ({count} images)")
+    mask = np.ones(count, dtype=bool)
+    mask[calib] = False
+    return calib, np.flatnonzero(mask), step
+
+
+def get_opset(model):
+    return next(o.version for o in model.opset_import if o.domain in ("", "ai.onnx"))
+
+
+def quantize_model(fp32_path, int8_path, calib_inputs, per_channel=True):
+    session = create_session(fp32_path)
+    input_name = session.get_inputs()[0].name
+    batch_size = session.get_inputs()[0].shape[0]
+    batch_size = batch_size if isinstance(batch_size, int) else 1
+    del session
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # シェイプ推論 + 最適化してから量子化する（ORT 推奨の前処理）
+        prep_path = os.path.join(tmp, "prep.onnx")
+        quant_pre_process(fp32_path, prep_path)
+        # per-channel の DequantizeLinear(axis) は opset 13 以上が必要（エクスポートは opset 12）
+        model = onnx.load(prep_path)
+        if get_opset(model) < 13:
+            onnx.save(version_converter.convert_version(model, 13), prep_path)
+        quantize_static(
+            prep_path,
+            int8_path,
+            SampleCalibrationReader(input_name, calib_inputs, batch_size),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=per_channel,
+            # 正規化層などは fp32 のまま残し、重い演算だけを INT8 にする
+            op_types_to_quantize=QUANT_OP_TYPES,
+        )
+    return int8_path
+
+
+def evaluate(model_path, inputs, labels):
+    session = create_session(model_path)
+    # ウォームアップしてから1枚ずつのレイテンシを測る
+    run_batched(session, inputs[:1], 1)
+    logits, times = run_batched(session, inputs, 1)
+    total = len(labels)
+    return {
+        "top1": topk_correct(logits, labels, 1) / total * 100,
+        "top5": topk_correct(logits, labels, 5) / total * 100,
+        "latency_ms": float(np.mean(times) * 1000),
+        "size": os.path.getsize(model_path),
+        "preds": np.argmax(logits, axis=1),
+    }
+
+
+def compare(fp32_path, int8_path, inputs, labels):
+    fp32 = evaluate(fp32_path, inputs, labels)
+    int8 = evaluate(int8_path, inputs, labels)
+    return {
+        "file": os.path.basename(int8_path),
+        "size": int8["size"],
+        "fp32_top1": fp32["top1"],
+        "int8_top1": int8["top1"],
+        "top1_delta": int8["top1"] - fp32["top1"],
+        "top5_delta": int8["top5"] - fp32["top5"],
+        "agreement": float((fp32["preds"] == int8["preds"]).mean() * 100),
+        "fp32_latency_ms": fp32["latency_ms"],
+        "int8_latency_ms": int8["latency_ms"],
+        "speedup": fp32["latency_ms"] / int8["latency_ms"],
+        "size_ratio": int8["size"] / fp32["size"],
+    }
+
+
+def print_report(name, r):
+    print(f"[{name}] int8 top1 {r['int8_top1']:.2f}% on {r['split']['evaluation']} held-out images (fp32 {r['fp32_top1']:.2f}%, delta {r['top1_delta']:+.2f}pt, "
+          f"agreement {r['agreement']:.1f}%)")
+    print(f"[{name}] latency {r['fp32_latency_ms']:.2f}ms -> {r['int8_latency_ms']:.2f}ms "
+          f"({r['speedup']:.2f}x), size {r['size'] / 1e6:.2f} MB ({r['size_ratio'] * 100:.0f}% of fp32)")
+
+
+def quantize_and_report(fp32_path, num_calib=100):
+    samples = load_samples()
+    inputs, labels = load_cached_tensors(samples)
+    name = os.path.splitext(os.path.basename(fp32_path))[0]
+    int8_path = int8_path_for(fp32_path)
+
+    calib, held_out, step = calibration_split(len(labels), num_calib)
+    print(f"[{name}] Calibrating on {len(calib)} images (every {step} from #1), "
+          f"evaluating on the other {len(held_out)}")
+    t0 = time.perf_counter()
+    quantize_model(fp32_path, int8_path, inputs[calib])
+    print(f"[{name}] Quantized to {int8_path} in {time.perf_counter() - t0:.1f}s")
+
+    report = compare(fp32_path, int8_path, inputs[held_out], labels[held_out])
+    report["split"] = {"calibration": len(calib), "evaluation": len(held_out), "step": step}
+    print_report(name, report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Static INT8 quantization calibrated on samples.json")
+    parser.add_argument("models", nargs="*", help="fp32 .onnx files (default: models_caltech101/*.onnx)")
+    parser.add_argument("--num-calib", type=int, default=100, help="number of calibration images")
+    args = parser.parse_args()
+
+    models = args.models or sorted(
+        p for p in glob.glob(os.path.join(MODELS_DIR, "*.onnx")) if not p.endswith(("_int8.onnx", ".opt.onnx", ".u8.onnx", "_fp16.onnx", "_fp16w.onnx")))
+    for path in models:
+        quantize_and_report(path, args.num_calib)
+
+
+if __name__ == "__main__":
+    main()
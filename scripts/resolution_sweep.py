@@ -0,0 +1,120 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+import onnxruntime as ort
+
+from bench_common import (
+    CROP, MODELS_DIR, RESIZE, SAMPLES_DIR, fixed_batch_size, is_preoptimized, is_uint8_input, latency_stats,
+    load_image, load_sample_tensors, load_samples, run_batched, topk_correct,
+)
+from dynamic_spatial import dynamic_session
+
+DEFAULT_SIZES = "128,160,192,224,288"
+
+
+def session_options(model_path, threads):
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = threads
+    if is_preoptimized(model_path):
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+    return opts
+
+
+def resize_for(size):
+    # 学習時と同じ比率（Resize(256) -> CenterCrop(224)）でリサイズしてからクロップする
+    return int(round(size * RESIZE / CROP))
+
+
+def load_inputs(samples, size, uint8, cache):
+    key = (size, uint8)
+    if key not in cache:
+        if uint8:
+            cache[key] = np.stack([load_image(os.path.join(SAMPLES_DIR, s["filename"]), resize_for(size), size)
+                                   for s in samples])
+        else:
+            cache[key] = load_sample_tensors(samples, resize=resize_for(size), crop=size)[0]
+    return cache[key]
+
+
+def sweep_model(model_path, sizes, samples, labels, batch_size, threads, cache):
+    session, ok_sizes, native = dynamic_session(model_path, sizes, session_options(model_path, threads))
+    skipped = [s for s in sizes if s not in ok_sizes]
+    if skipped:
+        print(f"{os.path.basename(model_path)}: skipping sizes {skipped} (not supported by the graph)")
+    batch = fixed_batch_size(session) or batch_size
+    uint8 = is_uint8_input(session)
+    rows = []
+    for size in ok_sizes:
+        inputs = load_inputs(samples, size, uint8, cache)
+        # ウォームアップ（サイズが変わると ORT は中間バッファを取り直す）
+        run_batched(session, inputs[:batch], batch)
+        t0 = time.perf_counter()
+        logits, times = run_batched(session, inputs, batch)
+        elapsed = time.perf_counter() - t0
+        s = latency_stats([t / batch for t in times])
+        rows.append({
+            "size": size,
+            "top1": topk_correct(logits, labels, 1) / len(labels) * 100,
+            "top5": topk_correct(logits, labels, 5) / len(labels) * 100,
+            "mean_ms": s["mean"],
+            "p95_ms": s["p95"],
+            "images_per_sec": len(labels) / elapsed,
+        })
+    return {"native": native[0] if native else None, "batch_size": batch, "rows": rows}
+
+
+def cheapest(rows, floor):
+    # 精度の下限を満たすなかで最も速い解像度
+    ok = [r for r in rows if r["top1"] >= floor]
+    return min(ok, key=lambda r: r["mean_ms"]) if ok else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy / latency / throughput across input resolutions")
+    parser.add_argument("models", nargs="*", help=".onnx files (default: models_caltech101/*.onnx)")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated input sizes (square)")
+    parser.add_argument("--batch", type=int, default=1, help="batch size (fixed-batch models use their own)")
+    parser.add_argument("--threads", type=int, default=0, help="intra_op_num_threads (0 = ORT default)")
+    parser.add_argument("--accuracy-floor", type=float, default=None, help="report the cheapest size with top1 >= this")
+    parser.add_argument("--output", default=None, help="write the curves as JSON")
+    args = parser.parse_args()
+
+    models = args.models or sorted(
+        p for p in glob.glob(os.path.join(MODELS_DIR, "*.onnx")) if not p.endswith(".u8.onnx"))
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    samples = load_samples()
+    labels = np.asarray([s["label"] for s in samples], dtype=np.int64)
+    cache = {}
+
+    results = {}
+    for path in models:
+        name = os.path.basename(path)
+        r = sweep_model(path, sizes, samples, labels, args.batch, args.threads, cache)
+        results[name] = r
+        native = f", exported at {r['native']}" if r["native"] else ""
+        print(f"\n{name} (batch={r['batch_size']}{native})")
+        print(f"{'size':>6} {'top1':>8} {'top5':>8} {'mean ms':>9} {'p95 ms':>9} {'img/s':>9}")
+        for row in r["rows"]:
+            print(f"{row['size']:>6} {row['top1']:>7.2f}% {row['top5']:>7.2f}% {row['mean_ms']:>9.2f} "
+                  f"{row['p95_ms']:>9.2f} {row['images_per_sec']:>9.1f}")
+        if args.accuracy_floor is not None:
+            best = cheapest(r["rows"], args.accuracy_floor)
+            r["cheapest"] = best["size"] if best else None
+            if best:
+                print(f"Cheapest size with top1 >= {args.accuracy_floor}%: {best['size']} "
+                      f"({best['top1']:.2f}%, {best['mean_ms']:.2f} ms)")
+            else:
+                print(f"No size reaches top1 >= {args.accuracy_floor}%")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"sizes": sizes, "accuracy_floor": args.accuracy_floor, "models": results}, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import datetime
+import json
+import os
+import platform
+import re
+
+import numpy as np
+import onnxruntime as ort
+
+from bench_common import CROP, ROOT_DIR, latency_stats
+
+# ベンチマーク結果の記録（JSON Lines）。Web 版（main.js の buildResultsRecord）も同じ形式で書き出す
+RESULTS_DIR = os.path.join(ROOT_DIR, "results")
+RESULTS_FILE = os.path.join(RESULTS_DIR, "results.jsonl")
+BASELINE_FILE = os.path.join(RESULTS_DIR, "baseline.jsonl")
+RESULTS_SCHEMA = 1
+
+
+def cpu_model():
+    # platform.processor() は Linux では空か "x86_64" になるので、/proc/cpuinfo の model name を優先する
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def device_info():
+    return {
+        "platform": platform.platform(),
+        "system": platform.system(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_model": cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def model_info(model_path):
+    from export_pipeline import file_sha256
+
+    return {"file": os.path.basename(model_path), "sha256": file_sha256(model_path), "size": os.path.getsize(model_path)}
+
+
+def runtime_info(provider="CPUExecutionProvider", threads=0, batch_size=1, **extra):
+    return {"runtime": "onnxruntime", "version": ort.__version__, "provider": provider, "threads": threads,
+            "batch_size": batch_size, **extra}
+
+
+def build_record(model_path, runtime, samples, logits, times, batch_size, wall_s=None):
+    # logits: [N, classes]、times: バッチごとの推論時間[秒]（1枚あたりはバッチ時間 / そのバッチの枚数）
+    probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+    probs /= probs.sum(axis=1, keepdims=True)
+    preds = probs.argmax(axis=1)
+    # 最後のバッチは batch_size より少ないことがあるので、実際の枚数で割る
+    sizes = [min(batch_size, len(samples) - i * batch_size) for i in range(len(times))]
+    per_image = np.repeat([t / n for t, n in zip(times, sizes)], sizes)
+    images = [
+        {"file": s["filename"], "label": int(s["label"]), "pred": int(p), "prob": round(float(probs[i, p]), 6),
+         "ms": round(float(per_image[i]) * 1000, 4)}
+        for i, (s, p) in enumerate(zip(samples, preds))
+    ]
+    return {
+        "schema": RESULTS_SCHEMA,
+        "source": "python",
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "model": model_info(model_path),
+        "runtime": runtime,
+        "device": device_info(),
+        "aggregates": aggregates(images, wall_s if wall_s is not None else sum(times)),
+        "images": images,
+    }
+
+
+def aggregates(images, wall_s):
+    s = latency_stats([img["ms"] / 1000 for img in images])
+    return {
+        "count": len(images),
+        "top1": sum(img["pred"] == img["label"] for img in images) / len(images) * 100,
+        "mean_ms": s["mean"],
+        "p50_ms": s["p50"],
+        "p95_ms": s["p95"],
+        "p99_ms": s["p99"],
+        "images_per_sec": len(images) / wall_s if wall_s > 0 else None,
+    }
+
+
+def append_record(record, path=RESULTS_FILE):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    print(f"Appended results record to {path}")
+
+
+def load_records(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# User-Agent からブラウザの種類だけを取り出す（Edge / Opera は Chrome の UA を含むので先に見る）
+BROWSER_PATTERNS = [("Edge", r"Edg/"), ("Opera", r"OPR/"), ("Firefox", r"Firefox/"), ("Chrome", r"Chrome/"),
+                    ("Safari", r"Safari/")]
+
+
+def browser_family(user_agent):
+    return next((name for name, pattern in BROWSER_PATTERNS if re.search(pattern, user_agent or "")), "other")
+
+
+def device_id(record):
+    # 端末の識別子。OS やブラウザの更新で変わらないものだけを使う（バージョンを含めるとベースラインと一致しなくなる）
+    # Python: OS 名 / アーキテクチャ / CPU / コア数、Web: ブラウザの種類 / navigator.platform / コア数
+    d = record.get("device") or {}
+    if "user_agent" in d:
+        return f"{browser_family(d['user_agent'])} on {d.get('platform')} ({d.get('hardware_concurrency')} threads)"
+    # system / cpu_model のない古い記録は platform 文字列の先頭（"Linux-6.1-..." の "Linux"）と processor を使う
+    system = d.get("system") or (d.get("platform") or "").split("-")[0]
+    cpu = d.get("cpu_model") or d.get("processor")
+    parts = [system, d.get("machine"), cpu]
+    return f"{' '.join(p for p in parts if p)} ({d.get('cpu_count')} cpus)"
+
+
+def record_key(record):
+    # 同じ条件の計測どうしを比較する（モデルの sha256 は含めない: 再エクスポートの前後を比べたいため）
+    rt = record["runtime"]
+    return (record["source"], record["model"]["file"], rt.get("provider"), rt.get("threads"),
+            rt.get("batch_size"), rt.get("worker", False), rt.get("input_size", CROP), rt.get("cascade"),
+            device_id(record))
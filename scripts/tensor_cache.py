@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from bench_common import CROP, MEAN, RESIZE, ROOT_DIR, SAMPLES_DIR, STD, load_image, normalize
+
+# 前処理済みテンソルのキャッシュ（NCHW float32 の .npy をメモリマップで読む）
+CACHE_DIR = os.path.join(ROOT_DIR, ".cache", "tensors")
+CACHE_VERSION = 2
+
+
+def cache_key(samples, samples_dir=SAMPLES_DIR, resize=RESIZE, crop=CROP):
+    # 前処理パラメータ + 元画像のファイル名/サイズ/mtime が変わったら作り直す
+    h = hashlib.sha1()
+    h.update(json.dumps({
+        "version": CACHE_VERSION,
+        "resize": resize,
+        "crop": crop,
+        "mean": MEAN,
+        "std": STD,
+    }, sort_keys=True).encode())
+    for sample in samples:
+        st = os.stat(os.path.join(samples_dir, sample["filename"]))
+        h.update(f"{sample['filename']}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()[:16]
+
+
+def build_cache(path, samples, samples_dir=SAMPLES_DIR, resize=RESIZE, crop=CROP):
+    # 複数プロセスが同時に作っても衝突しないよう、一時ファイル名はプロセスごとに分ける
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                    shape=(len(samples), 3, crop, crop))
+    try:
+        for i, sample in enumerate(samples):
+            normalize(load_image(os.path.join(samples_dir, sample["filename"]), resize, crop), out=out[i])
+        out.flush()
+        del out
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_cached_tensors(samples, samples_dir=SAMPLES_DIR, resize=RESIZE, crop=CROP, cache_dir=CACHE_DIR):
+    """Return (inputs, labels); inputs is a read-only memmap of the preprocessed samples."""
+    os.makedirs(cache_dir, exist_ok=True)
+    key = cache_key(samples, samples_dir, resize, crop)
+    path = os.path.join(cache_dir, f"samples_{crop}_{key}.npy")
+    if not os.path.exists(path):
+        print(f"Building tensor cache: {path}")
+        build_cache(path, samples, samples_dir, resize, crop)
+        # 作り終えてから同じ解像度の古いキャッシュを消す（他のプロセスが消していれば何もしない）
+        for name in os.listdir(cache_dir):
+            old = os.path.join(cache_dir, name)
+            if name.startswith(f"samples_{crop}_") and name.endswith(".npy") and old != path:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+    inputs = np.load(path, mmap_mode="r")
+    labels = np.asarray([s["label"] for s in samples], dtype=np.int64)
+    return inputs, labels
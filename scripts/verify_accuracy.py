@@ -1,101 +1,151 @@
-import torch
-import json
+import argparse
 import os
-from PIL import Image
-from torchvision import transforms, datasets
-from pathlib import Path
-import sys
+import time
 
-# モデル定義のパスを通す
-sys.path.append('/home/loki/LMFRNet')
+import numpy as np
 
-def main():
-    # 設定
-    model_path = "/home/loki/LMFRNet/outputs/experiment2/resnet18_s0/best_model.pt"
-    samples_path = "/home/loki/public/samples.json"
-    samples_dir = "/home/loki/public/samples"
-    dataset_root = "/home/loki/LMFRNet/data/caltech101"
+from bench_common import (
+    DEFAULT_MODEL, SAMPLES_DIR, create_session, fixed_batch_size, is_uint8_input, load_image, load_labels,
+    load_sample_tensors, load_samples, normalize, run_batched, topk_correct,
+)
+from breakdown import BenchBreakdown
+from parallel_engine import parse_workers, run_parallel
+from preprocess_prefix import load_sample_images
+from results_log import RESULTS_FILE, append_record, build_record, runtime_info
+from tensor_cache import load_cached_tensors
 
-    print(f"Checking model: {model_path}")
 
-    # 1. ラベルの整合性確認
+def check_labels(samples, labels):
+    # samples.json の category と labels.json の並びが一致しているか確認
     print("\n--- Checking Label Consistency ---")
-    
-    # torchvisionのCaltech101クラス定義を取得
-    full_dataset = datasets.Caltech101(root=dataset_root, download=False)
-    torch_classes = full_dataset.categories
-    print(f"Torchvision classes: {len(torch_classes)}")
-    print(f"First 5: {torch_classes[:5]}")
-    
-    # generate_samples.pyで生成したlabels.jsonを取得
-    with open("/home/loki/public/labels.json", "r") as f:
-        json_classes = json.load(f)
-    print(f"JSON classes: {len(json_classes)}")
-    print(f"First 5: {json_classes[:5]}")
-
-    if torch_classes != json_classes:
+    print(f"JSON classes: {len(labels)}")
+    mismatches = [s for s in samples if labels[s["label"]] != s["category"]]
+    if mismatches:
         print("!!! WARNING: Class mismatch detected !!!")
-        for i, (t, j) in enumerate(zip(torch_classes, json_classes)):
-            if t != j:
-                print(f"Mismatch at index {i}: Torch='{t}' vs JSON='{j}'")
-                break
+        s = mismatches[0]
+        print(f"Mismatch: {s['filename']} label={s['label']} -> '{labels[s['label']]}' vs category='{s['category']}'")
     else:
         print("Class definitions match.")
 
-    # 2. モデル精度の検証
-    print("\n--- Verifying Model Accuracy (Python) ---")
-    
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    
-    # ResNet18ロード
-    from torchvision.models import resnet18
-    model = resnet18(weights=None, num_classes=101)
-    checkpoint = torch.load(model_path, map_location=device)
-    
-    # state_dictの修正
-    state_dict = checkpoint['model_state_dict']
-    new_state_dict = {}
-    for k, v in state_dict.items():
-        name = k[7:] if k.startswith('module.') else k
-        new_state_dict[name] = v
-    model.load_state_dict(new_state_dict)
-    model.to(device)
-    model.eval()
-
-    # 前処理（学習時と同じ）
-    transform = transforms.Compose([
-        transforms.Resize(256),
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
-
-    # サンプルデータの読み込み
-    with open(samples_path, "r") as f:
-        samples = json.load(f)
-
-    correct = 0
-    total = len(samples)
 
+def benchmark_batch_size(session, inputs, labels, batch_size):
+    # ウォームアップ（初回のメモリ確保をスループットに含めない）
+    run_batched(session, inputs[:batch_size], batch_size)
+
+    t0 = time.perf_counter()
+    logits, times = run_batched(session, inputs, batch_size)
+    elapsed = time.perf_counter() - t0
+
+    total = len(labels)
+    return {
+        "batch_size": batch_size,
+        "top1": topk_correct(logits, labels, 1) / total * 100,
+        "top5": topk_correct(logits, labels, 5) / total * 100,
+        "images_per_sec": total / elapsed,
+        "elapsed": elapsed,
+        "logits": logits,
+        "times": times,
+    }
+
+
+def run_breakdown(session, samples, labels):
+    # 1枚ずつデコード -> 推論して、品質タグ別・解像度別・クラス別の内訳を集計する
+    # （前処理の時間も測るのでテンソルキャッシュは使わない）
+    uint8 = is_uint8_input(session)
+    input_name = session.get_inputs()[0].name
+    breakdown = BenchBreakdown(len(labels))
     for sample in samples:
-        img_path = os.path.join(samples_dir, sample['filename'])
-        image = Image.open(img_path).convert("RGB")
-        input_tensor = transform(image).unsqueeze(0).to(device)
-
-        with torch.no_grad():
-            output = model(input_tensor)
-            _, predicted = torch.max(output, 1)
-            
-        if predicted.item() == sample['label']:
-            correct += 1
-        
-        # デバッグ: 最初の数枚だけ予測を表示
-        if total > 0 and (correct + (total - len(samples))) <= 5: 
-             pass # print(f"Img: {sample['filename']}, Label: {sample['label']}, Pred: {predicted.item()}")
-
-    accuracy = 100 * correct / total
-    print(f"\nResult: {correct}/{total} Correct")
-    print(f"Accuracy: {accuracy:.2f}%")
+        t0 = time.perf_counter()
+        hwc = load_image(os.path.join(SAMPLES_DIR, sample["filename"]))
+        x = hwc[None] if uint8 else normalize(hwc)[None]
+        t1 = time.perf_counter()
+        logits = session.run(None, {input_name: x})[0]
+        t2 = time.perf_counter()
+        breakdown.add(sample, int(logits[0].argmax()), (t2 - t1) * 1000, (t1 - t0) * 1000)
+    breakdown.print_report(labels)
+    return breakdown
+
+
+def scale_workers(model_path, inputs, labels, batch_size, worker_counts, threads):
+    # ワーカー数ごとのスループット（各ワーカーが1セッションを持つ）
+    print(f"\n--- Multi-process scaling (batch={batch_size}) ---")
+    print(f"{'workers':>8} {'threads':>8} {'top1':>8} {'img/s':>10} {'speedup':>8}")
+    base = None
+    for workers in worker_counts:
+        per_worker = threads or max(1, (os.cpu_count() or 1) // workers)
+        logits, elapsed = run_parallel(model_path, inputs, batch_size, workers, threads=per_worker)
+        ips = len(labels) / elapsed
+        base = base or ips
+        top1 = topk_correct(logits, labels, 1) / len(labels) * 100
+        print(f"{workers:>8} {per_worker:>8} {top1:>7.2f}% {ips:>10.1f} {ips / base:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX Runtime accuracy/throughput benchmark on samples.json")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="path to .onnx model")
+    parser.add_argument("--batch-sizes", default="1,8,32", help="comma separated batch sizes")
+    parser.add_argument("--threads", type=int, default=0, help="intra_op_num_threads (0 = ORT default)")
+    parser.add_argument("--workers", default=None,
+                        help="process-pool scaling, e.g. 1,2,4,N (N = CPU count); threads default to cores/workers")
+    parser.add_argument("--no-cache", action="store_true", help="decode JPEGs instead of using the tensor cache")
+    parser.add_argument("--results", default=RESULTS_FILE,
+                        help="append a JSONL results record per batch size (see check_regression.py)")
+    parser.add_argument("--no-results", action="store_true", help="do not write results records")
+    parser.add_argument("--breakdown", action="store_true",
+                        help="per-quality / per-resolution / per-class breakdown (batch 1, decodes every image)")
+    args = parser.parse_args()
+
+    samples = load_samples()
+    labels = load_labels()
+    check_labels(samples, labels)
+
+    print("\n--- Verifying Model Accuracy (ONNX Runtime) ---")
+    print(f"Checking model: {args.model}")
+
+    session = create_session(args.model, intra_op_num_threads=args.threads)
+
+    t0 = time.perf_counter()
+    if is_uint8_input(session):
+        # 前処理つきモデル: 正規化前の uint8 NHWC をそのまま渡す
+        inputs = load_sample_images(samples)
+        targets = np.asarray([s["label"] for s in samples], dtype=np.int64)
+    elif args.no_cache:
+        inputs, targets = load_sample_tensors(samples)
+    else:
+        inputs, targets = load_cached_tensors(samples)
+    print(f"Loaded {len(samples)} images in {time.perf_counter() - t0:.2f}s -> {inputs.shape} {inputs.dtype}")
+    fixed = fixed_batch_size(session)
+
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b.strip()]
+    if fixed is not None:
+        # dynamic_axes なしでエクスポートされたモデルはバッチサイズを変えられない
+        skipped = [b for b in batch_sizes if b != fixed]
+        if skipped:
+            print(f"Model has a fixed batch size of {fixed}; skipping batch sizes {skipped}")
+        batch_sizes = [fixed]
+
+    records = []
+    print(f"\n{'batch':>6} {'top1':>8} {'top5':>8} {'img/s':>10}")
+    for batch_size in batch_sizes:
+        r = benchmark_batch_size(session, inputs, targets, batch_size)
+        print(f"{r['batch_size']:>6} {r['top1']:>7.2f}% {r['top5']:>7.2f}% {r['images_per_sec']:>10.1f}")
+        if not args.no_results:
+            records.append(build_record(args.model, runtime_info(threads=args.threads, batch_size=batch_size),
+                                        samples, r["logits"], r["times"], batch_size, wall_s=r["elapsed"]))
+
+    if args.breakdown:
+        print("\n--- Breakdown (batch=1) ---")
+        summary = run_breakdown(session, samples, labels).summary()
+        for record in records:
+            record["breakdown"] = summary
+
+    if args.workers:
+        scale_workers(args.model, inputs, targets, batch_sizes[-1], parse_workers(args.workers), args.threads)
+
+    print(f"\nResult: {os.path.basename(args.model)} on {len(targets)} images")
+    for record in records:
+        append_record(record, args.results)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,117 @@
+import argparse
+import glob
+import json
+import os
+
+from bench_common import MODELS_DIR, ROOT_DIR
+
+WEB_MANIFEST_NAME = "models.json"
+WEB_MANIFEST_VERSION = 1
+DEFAULT_MODEL_NAME = "lmfrnet"
+
+# Web 版のモデル選択に出す表示名（ここにないモデルはファイル名のまま）
+DISPLAY_NAMES = {
+    "lmfrnet": "LMFRNet",
+    "lmfrnet_hires": "LMFRNet Hires",
+    "mobilenetv3_large": "MobileNetV3 Large",
+    "resnet18": "ResNet18",
+}
+VARIANT_SUFFIXES = [
+    ("_int8", " (INT8)"),
+    ("_fp16", " (FP16)"),
+    ("_fp16w", " (FP16 重み)"),
+    (".u8", " (uint8 入力)"),
+    (".opt", " (最適化済み)"),
+]
+
+
+def display_name(name):
+    suffix = ""
+    stripped = True
+    while stripped:
+        stripped = False
+        for ending, label in VARIANT_SUFFIXES:
+            if name.endswith(ending):
+                name, suffix = name[:-len(ending)], label + suffix
+                stripped = True
+    return DISPLAY_NAMES.get(name, name) + suffix
+
+
+def count_params(path):
+    # 重み（initializer）の要素数。モデル比較の表に出す
+    if not path.endswith(".onnx"):
+        return None
+    try:
+        import onnx
+    except ImportError:
+        return None
+    model = onnx.load(path, load_external_data=False)
+    total = 0
+    for init in model.graph.initializer:
+        n = 1
+        for d in init.dims:
+            n *= d
+        total += n
+    return total
+
+
+def known_hashes(output_dir):
+    # export_pipeline の manifest.json に記録済みのハッシュ（サイズが同じなら再計算しない）
+    from export_pipeline import load_manifest
+
+    hashes = {}
+    for entry in load_manifest(output_dir).values():
+        for record in [entry] + [entry[k] for k in ("int8", "optimized", "uint8_input", "fp16", "fp16w") if k in entry]:
+            if "file" in record and "sha256" in record and "size" in record:
+                hashes[record["file"]] = (record["size"], record["sha256"])
+    return hashes
+
+
+def build_web_manifest(output_dir=MODELS_DIR):
+    from export_pipeline import file_sha256
+
+    hashes = known_hashes(output_dir)
+    rel_dir = os.path.relpath(output_dir, ROOT_DIR).replace(os.sep, "/")
+    models = []
+    for path in sorted(glob.glob(os.path.join(output_dir, "*.onnx")) + glob.glob(os.path.join(output_dir, "*.ort"))):
+        filename = os.path.basename(path)
+        size = os.path.getsize(path)
+        known = hashes.get(filename)
+        sha256 = known[1] if known and known[0] == size else file_sha256(path)
+        name = filename.rsplit(".", 1)[0]
+        models.append({
+            "name": name,
+            "label": display_name(name),
+            "path": f"./{rel_dir}/{filename}",
+            "size": size,
+            "sha256": sha256,
+            "params": count_params(path),
+        })
+    names = [m["name"] for m in models]
+    default = DEFAULT_MODEL_NAME if DEFAULT_MODEL_NAME in names else (names[0] if names else None)
+    # 既定モデルを先頭にする（Service Worker はこれだけを事前キャッシュする）
+    models.sort(key=lambda m: m["name"] != default)
+    return {"version": WEB_MANIFEST_VERSION, "default": default, "models": models}
+
+
+def write_web_manifest(output_dir=MODELS_DIR):
+    manifest = build_web_manifest(output_dir)
+    path = os.path.join(output_dir, WEB_MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    os.replace(path + ".tmp", path)
+    total = sum(m["size"] for m in manifest["models"])
+    print(f"Wrote {path} ({len(manifest['models'])} models, {total / 1e6:.1f} MB, default: {manifest['default']})")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write models.json (path/size/sha256) for the web app")
+    parser.add_argument("--output-dir", default=MODELS_DIR)
+    args = parser.parse_args()
+    write_web_manifest(args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
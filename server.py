@@ -1,10 +1,82 @@
+import argparse
+import email.utils
+import gzip
+import hashlib
 import http.server
-import socketserver
+import json
 import os
+import socketserver
+import sys
+import threading
+from urllib.parse import parse_qs, urlparse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 PORT = 8080
 
+# 圧縮した本文は元と別のバイト列なので、強い ETag もエンコーディングごとに分ける（RFC 9110 8.8.3）
+ETAG_SUFFIX = {"identity": "", "gzip": "-gz", "br": "-br"}
+
+# 起動時に圧縮してメモリに載せるテキスト系アセット
+COMPRESSIBLE = (".html", ".js", ".mjs", ".css", ".json", ".svg", ".txt", ".wasm")
+SKIP_DIRS = {".git", ".cache", "__pycache__", "samples", "scripts"}
+
+
+class AssetCache:
+    # テキスト系アセットを gzip/brotli で事前圧縮して保持する（mtime が変わったら作り直す）
+    def __init__(self, root):
+        self.root = root
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def preload(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+            for name in filenames:
+                if name.endswith(COMPRESSIBLE):
+                    self.get(os.path.join(dirpath, name))
+        return len(self.entries)
+
+    def get(self, path):
+        if not path.endswith(COMPRESSIBLE):
+            return None
+        st = os.stat(path)
+        with self.lock:
+            entry = self.entries.get(path)
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            return entry
+        with open(path, "rb") as f:
+            raw = f.read()
+        entry = {
+            "mtime_ns": st.st_mtime_ns,
+            "mtime": st.st_mtime,
+            "size": st.st_size,
+            "etag": '"%s"' % hashlib.sha1(raw).hexdigest()[:20],
+            "identity": raw,
+            "gzip": gzip.compress(raw, compresslevel=9),
+        }
+        if brotli is not None:
+            entry["br"] = brotli.compress(raw)
+        with self.lock:
+            self.entries[path] = entry
+        return entry
+
+
+assets = None
+
+# --infer 指定時に読み込む推論サービス（scripts/inference_service.py）
+inference = None
+
+
 class CustomHandler(http.server.SimpleHTTPRequestHandler):
+    # Keep-Alive で1台あたりの接続数を減らす（全レスポンスに Content-Length を付けている）
+    protocol_version = "HTTP/1.1"
+    # ヘッダーと本文を別々に書くので、Nagle と遅延 ACK が重なると小さいレスポンスが ~40ms 待たされる
+    disable_nagle_algorithm = True
+
     def end_headers(self):
         # Cross-Origin Isolation Headers (Required for SharedArrayBuffer/WASM threads)
         self.send_header("Cross-Origin-Opener-Policy", "same-origin")
@@ -20,12 +92,216 @@ class CustomHandler(http.server.SimpleHTTPRequestHandler):
             return "application/wasm"
         return super().guess_type(path)
 
-if __name__ == "__main__":
+    def choose_encoding(self, entry):
+        accept = [e.split(";")[0].strip() for e in self.headers.get("Accept-Encoding", "").split(",")]
+        for encoding in ("br", "gzip"):
+            if encoding in accept and encoding in entry and len(entry[encoding]) < entry["size"]:
+                return encoding
+        return "identity"
+
+    def not_modified(self, etag, mtime):
+        inm = self.headers.get("If-None-Match")
+        if inm is not None:
+            return inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]
+        ims = self.headers.get("If-Modified-Since")
+        if ims:
+            try:
+                return int(mtime) <= email.utils.parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError, OverflowError):
+                return False
+        return False
+
+    def parse_range(self, size, etag, mtime):
+        # 単一範囲 "bytes=start-end" のみ対応（モデルの分割/再開ダウンロード用）
+        header = self.headers.get("Range")
+        if not header or not header.startswith("bytes=") or "," in header:
+            return None
+        if_range = self.headers.get("If-Range")
+        if if_range and if_range != etag and if_range != self.date_time_string(mtime):
+            return None
+        start, _, end = header[6:].strip().partition("-")
+        try:
+            if start == "":
+                length = int(end)
+                if length <= 0:
+                    return "invalid"
+                start, end = max(0, size - length), size - 1
+            else:
+                start, end = int(start), (int(end) if end else size - 1)
+        except ValueError:
+            return None
+        if start >= size or start > end:
+            return "invalid"
+        return start, min(end, size - 1)
+
+    def serve_file(self, head_only=False):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, "index.html")
+            if not urlparse(self.path).path.endswith("/") or not os.path.isfile(index):
+                return False  # リダイレクト / ディレクトリ一覧は既定の処理に任せる
+            path = index
+        if not os.path.isfile(path):
+            return False
+
+        st = os.stat(path)
+        entry = assets.get(path) if assets is not None else None
+        encoding = self.choose_encoding(entry) if entry else "identity"
+        # If-None-Match は、これから送るエンコーディングの ETag と比べる
+        base_etag = entry["etag"] if entry else '"%x-%x"' % (st.st_mtime_ns, st.st_size)
+        etag = base_etag[:-1] + ETAG_SUFFIX[encoding] + '"'
+
+        if self.not_modified(etag, st.st_mtime):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            if entry:
+                self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return True
+
+        status, start, end = 200, 0, st.st_size - 1
+        if encoding == "identity":
+            rng = self.parse_range(st.st_size, etag, st.st_mtime)
+            if rng == "invalid":
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{st.st_size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return True
+            if rng:
+                status, (start, end) = 206, rng
+
+        body = entry[encoding] if entry else None
+        length = len(body) if encoding != "identity" else end - start + 1
+        self.send_response(status)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Length", str(length))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.date_time_string(st.st_mtime))
+        # 毎回再検証させる（変更がなければ 304 で本文を送らない）
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Accept-Ranges", "bytes")
+        if entry:
+            self.send_header("Vary", "Accept-Encoding")
+        if encoding != "identity":
+            self.send_header("Content-Encoding", encoding)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{st.st_size}")
+        self.end_headers()
+        if head_only:
+            return True
+
+        if body is not None:
+            self.wfile.write(body if encoding != "identity" else body[start:end + 1])
+        else:
+            with open(path, "rb") as f:
+                f.seek(start)
+                remaining = length
+                while remaining > 0:
+                    chunk = f.read(min(1 << 16, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+        return True
+
+    def do_HEAD(self):
+        if not self.serve_file(head_only=True):
+            super().do_HEAD()
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path.startswith("/api/"):
+            if inference is None:
+                return self.send_json(404, {"error": "inference is disabled (start with --infer)"})
+            if path == "/api/models":
+                return self.send_json(200, inference.describe())
+            if path == "/api/stats":
+                return self.send_json(200, inference.stats())
+            return self.send_json(404, {"error": "not found"})
+        if not self.serve_file():
+            super().do_GET()
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        # Keep-Alive の接続を壊さないよう、本文は先に読み切る
+        # （長さが分からない本文は読み切れないので、応答したら接続を閉じる）
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.close_connection = True
+            return self.send_json(411, {"error": "Content-Length is required"})
+        try:
+            length = int(length)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self.close_connection = True
+            return self.send_json(400, {"error": f"invalid Content-Length: {self.headers['Content-Length']!r}"})
+        body = self.rfile.read(length)
+        if url.path != "/api/infer" or inference is None:
+            return self.send_json(404, {"error": "not found"})
+        query = parse_qs(url.query)
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+        try:
+            result = inference.infer(
+                body, content_type,
+                model=query.get("model", [None])[0],
+                topk=int(query.get("topk", ["5"])[0]),
+            )
+        except KeyError as e:
+            return self.send_json(404, {"error": f"unknown model: {e}"})
+        except ValueError as e:
+            return self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            return self.send_json(500, {"error": str(e)})
+        self.send_json(200, result)
+
+
+class ThreadingServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def main():
+    global assets, inference
+    parser = argparse.ArgumentParser(description="Local server for the LMFRNet benchmark web app")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--infer", action="store_true",
+                        help="enable POST /api/infer (onnxruntime, dynamic batching of concurrent requests)")
+    parser.add_argument("--batch-window-ms", type=float, default=5.0, help="time window for collecting a batch")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="intra_op_num_threads (0 = ORT default)")
+    args = parser.parse_args()
+
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    with socketserver.TCPServer(("", PORT), CustomHandler) as httpd:
-        print(f"Serving at http://localhost:{PORT}")
+    assets = AssetCache(os.getcwd())
+    count = assets.preload()
+    print(f"Precompressed {count} text assets (gzip{', br' if brotli else ''})")
+
+    if args.infer:
+        sys.path.insert(0, os.path.join(os.getcwd(), "scripts"))
+        from inference_service import InferenceService
+        inference = InferenceService(max_batch=args.max_batch, window_ms=args.batch_window_ms, threads=args.threads)
+        print(f"Inference enabled: {', '.join(inference.models)}")
+
+    # 複数の端末から同時にアクセスされても直列化しないよう、リクエストごとにスレッドを使う
+    with ThreadingServer(("", args.port), CustomHandler) as httpd:
+        print(f"Serving at http://localhost:{args.port}")
         print("Press Ctrl+C to stop.")
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+// セッションプール（main.js / worker.js 共通）
+// 最近使ったセッションを残しておき、推定メモリが上限を超えたら最も古いものから解放する。
+class SessionPool {
+  constructor(budgetBytes) {
+    this.budgetBytes = budgetBytes;
+    this.entries = new Map(); // key -> { session, bytes, createMs, hits }。Map の順番 = 古い順
+    this.pending = new Map();
+  }
+
+  // モデルファイルのサイズから、WASM ヒープ上の重み + 最適化後のグラフ分を見積もる
+  static estimateBytes(modelBytes) {
+    return modelBytes * 2;
+  }
+
+  totalBytes() {
+    let total = 0;
+    this.entries.forEach(e => { total += e.bytes; });
+    return total;
+  }
+
+  has(key) {
+    return this.entries.has(key);
+  }
+
+  // 戻り値: { session, warm, createMs }（warm = プールにあったので作成しなかった）
+  // pinned: 一緒に使うので追い出さないキー（カスケードの1段目など）
+  async get(key, create, modelBytes, pinned = []) {
+    const entry = this.entries.get(key);
+    if (entry) {
+      this.entries.delete(key);
+      this.entries.set(key, entry);
+      entry.hits++;
+      return { session: entry.session, warm: true, createMs: entry.createMs };
+    }
+    const created = await this.create(key, create, modelBytes);
+    this.entries.delete(key);
+    this.entries.set(key, created);
+    this.evict([key, ...pinned]);
+    return { session: created.session, warm: false, createMs: created.createMs };
+  }
+
+  // 空き時間に次のモデルを作っておく。上限を超える場合は何もしない（使用中のセッションは追い出さない）
+  async prefetch(key, create, modelBytes) {
+    if (this.entries.has(key) || this.pending.has(key)) return false;
+    if (this.totalBytes() + SessionPool.estimateBytes(modelBytes) > this.budgetBytes) return false;
+    const created = await this.create(key, create, modelBytes);
+    // prefetch したものは次に使われるまで古い側に置く
+    this.entries.delete(key);
+    this.entries = new Map([[key, created], ...this.entries]);
+    return true;
+  }
+
+  async create(key, create, modelBytes) {
+    // 同じモデルの作成が並行したら1つにまとめる（prefetch 中に選ばれた場合など）
+    if (!this.pending.has(key)) {
+      const promise = (async () => {
+        const start = performance.now();
+        const session = await create();
+        const entry = {
+          session, bytes: SessionPool.estimateBytes(modelBytes), createMs: performance.now() - start, hits: 0
+        };
+        this.entries.set(key, entry);
+        return entry;
+      })();
+      this.pending.set(key, promise);
+      promise.finally(() => this.pending.delete(key)).catch(() => { });
+    }
+    return this.pending.get(key);
+  }
+
+  // keep（キーまたはキーの配列）以外を古い順に解放して上限内に収める
+  evict(keep) {
+    const keepKeys = [].concat(keep);
+    for (const [key, entry] of this.entries) {
+      if (this.totalBytes() <= this.budgetBytes) break;
+      if (keepKeys.includes(key)) continue;
+      this.entries.delete(key);
+      if (entry.session.release) entry.session.release().catch(() => { });
+    }
+  }
+
+  setBudget(budgetBytes, keep) {
+    this.budgetBytes = budgetBytes;
+    this.evict(keep);
+  }
+
+  clear() {
+    this.entries.forEach(e => { if (e.session.release) e.session.release().catch(() => { }); });
+    this.entries.clear();
+  }
+
+  stats() {
+    return [...this.entries].map(([key, e]) => ({ key, bytes: e.bytes, createMs: e.createMs, hits: e.hits }));
+  }
+}
@@ -1,4 +1,7 @@
-const CACHE_NAME = 'lmfrnet-web-v40';
+const CACHE_NAME = 'lmfrnet-web-v49';
+// モデルはアプリ本体とは別のキャッシュに置き、models.json の sha256（URL の ?v=）で無効化する
+const MODEL_CACHE = 'lmfrnet-models';
+const MODEL_MANIFEST = './models_caltech101/models.json';
 const ASSETS = [
     './',
     './index.html',
@@ -9,29 +12,90 @@ const ASSETS = [
     './icon-192.png',
     './icon-512.png',
     './main.js',
-    './models_caltech101/lmfrnet.onnx',
-    './models_caltech101/lmfrnet_hires.onnx',
-    './models_caltech101/mobilenetv3_large.onnx',
-    './models_caltech101/resnet18.onnx',
+    './worker.js',
+    './preprocess.js',
+    './session_pool.js',
+    './compare.js',
+    './breakdown.js',
+    './memory.js',
     // CDNキャッシュ（初回オンライン時に取っておく）
-    'https://cdn.jsdelivr.net/npm/onnxruntime-web/dist/ort.wasm.min.js'
+    'https://cdn.jsdelivr.net/npm/onnxruntime-web/dist/ort.webgpu.min.js'
 ];
 
+function isModelRequest(url) {
+    return /\.(onnx|ort)$/.test(url.pathname);
+}
+
+function modelUrl(entry) {
+    return entry.sha256 ? `${entry.path}?v=${entry.sha256.slice(0, 16)}` : entry.path;
+}
+
+// 既定モデル（models.json の先頭）だけを事前キャッシュする。失敗してもインストールは止めない
+async function precacheDefaultModel() {
+    try {
+        const resp = await fetch(MODEL_MANIFEST, { cache: 'no-cache' });
+        const manifest = await resp.json();
+        const entry = manifest.models.find(m => m.name === manifest.default) || manifest.models[0];
+        if (entry) await (await caches.open(MODEL_CACHE)).add(modelUrl(entry));
+    } catch (e) { }
+}
+
+// 同じモデルの古い版（?v= が違うもの）を消す
+async function putModel(request, resp) {
+    const cache = await caches.open(MODEL_CACHE);
+    const url = new URL(request.url);
+    const keys = await cache.keys();
+    await Promise.all(keys
+        .filter(key => new URL(key.url).pathname === url.pathname && key.url !== request.url)
+        .map(key => cache.delete(key)));
+    await cache.put(request, resp);
+}
+
+async function serveModel(request) {
+    const cache = await caches.open(MODEL_CACHE);
+    const url = new URL(request.url);
+    // ?v= なしの要求（古いページなど）は版を問わずキャッシュを使う
+    const cached = await cache.match(request, { ignoreSearch: !url.searchParams.has('v') });
+    if (cached) return cached;
+    const resp = await fetch(request);
+    if (resp && resp.status === 200 && url.searchParams.has('v')) {
+        putModel(request, resp.clone()).catch(() => { });
+    }
+    return resp;
+}
+
 self.addEventListener('install', (event) => {
     self.skipWaiting();
-    event.waitUntil(caches.open(CACHE_NAME).then((cache) => cache.addAll(ASSETS)));
+    event.waitUntil(Promise.all([
+        caches.open(CACHE_NAME).then((cache) => cache.addAll(ASSETS)),
+        precacheDefaultModel()
+    ]));
 });
 
 self.addEventListener('activate', (event) => {
     event.waitUntil(
         caches.keys().then((names) => Promise.all(
-            names.map((name) => (name !== CACHE_NAME ? caches.delete(name) : Promise.resolve()))
+            names.map((name) => (name !== CACHE_NAME && name !== MODEL_CACHE ? caches.delete(name) : Promise.resolve()))
         )).then(() => self.clients.claim())
     );
 });
 
 self.addEventListener('fetch', (event) => {
     if (event.request.method !== 'GET') return;
+    const url = new URL(event.request.url);
+    if (isModelRequest(url)) {
+        event.respondWith(serveModel(event.request));
+        return;
+    }
+    if (url.href.endsWith(MODEL_MANIFEST.slice(1))) {
+        // モデル一覧は常にネットワークを優先する（オフライン時のみキャッシュ）
+        event.respondWith(fetch(event.request).then((resp) => {
+            const copy = resp.clone();
+            caches.open(CACHE_NAME).then((cache) => cache.put(event.request, copy)).catch(() => { });
+            return resp;
+        }).catch(() => caches.match(event.request, { ignoreSearch: true })));
+        return;
+    }
     event.respondWith(
         caches.match(event.request, { ignoreVary: true, ignoreSearch: true }).then((cached) => {
             if (cached) return cached;
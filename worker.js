@@ -1,4 +1,99 @@
-// Worker placeholder
-self.onmessage = function (e) {
-    console.log('Worker received message', e.data);
+// 推論ワーカー: 画像デコード・前処理・session.run をメインスレッドから分離する
+importScripts('https://cdn.jsdelivr.net/npm/onnxruntime-web/dist/ort.webgpu.min.js', './preprocess.js', './session_pool.js', './memory.js');
+
+let session = null;
+let uint8Input = false;
+// 作成済みのセッションはプールに残し、モデルを戻したときは作り直さない
+const pool = new SessionPool(64 * 1024 * 1024);
+let currentKey = null;
+// session.run は1つずつ順番に実行する（デコードは先行して並行に進める）
+let runChain = Promise.resolve();
+
+self.onmessage = async (e) => {
+  const msg = e.data;
+  try {
+    if (msg.type === 'init') {
+      Object.assign(ort.env.wasm, msg.wasm);
+      if (msg.poolBudget) pool.budgetBytes = msg.poolBudget;
+      reply(msg.id, {});
+    } else if (msg.type === 'memory') {
+      reply(msg.id, { wasmBytes: WasmMemories.bytes() });
+    } else if (msg.type === 'has') {
+      reply(msg.id, pool.has(msg.key));
+    } else if (msg.type === 'budget') {
+      pool.setBudget(msg.poolBudget, currentKey);
+      reply(msg.id, { pool: pool.stats() });
+    } else if (msg.type === 'load') {
+      // 実行中の推論が終わってから差し替える（続けて選ばれた場合も最後のモデルが残る）
+      const key = msg.key || msg.path;
+      runChain = runChain.then(async () => {
+        // model は転送されたモデルのバイト列か URL（なければ path から読む）
+        const r = await pool.get(key, () => ort.InferenceSession.create(msg.model || msg.path, msg.options), msg.size || 0);
+        session = r.session;
+        currentKey = key;
+        uint8Input = Preprocess.isUint8Model(msg.path);
+        return r;
+      }).then(
+        (r) => reply(msg.id, { createMs: r.createMs, warm: r.warm, pool: pool.stats() }),
+        (err) => fail(msg.id, err)
+      );
+    } else if (msg.type === 'prefetch') {
+      const key = msg.key || msg.path;
+      runChain = runChain.then(() => pool.prefetch(
+        key, () => ort.InferenceSession.create(msg.model || msg.path, msg.options), msg.size || 0
+      )).then(
+        (prefetched) => reply(msg.id, { prefetched, pool: pool.stats() }),
+        (err) => fail(msg.id, err)
+      );
+    } else if (msg.type === 'infer') {
+      // blobs を渡すと N 枚を1つの [N, 3, size, size] テンソルにまとめて1回で推論する
+      const blobs = msg.blobs || (msg.blob ? [msg.blob] : null);
+      // 次の画像のデコードは、前の画像の推論中に始まる
+      const decoded = blobs
+        ? decodeBatch(blobs, msg.size)
+        : Promise.resolve({
+          data: uint8Input ? new Uint8Array(msg.tensor) : new Float32Array(msg.tensor), batch: msg.batch || 1, preMs: 0
+        });
+      runChain = runChain.then(() => decoded).then((input) => infer(input, msg.size)).then(
+        (result) => reply(msg.id, result, [result.logits.buffer]),
+        (err) => fail(msg.id, err)
+      );
+    }
+  } catch (err) {
+    fail(msg.id, err);
+  }
 };
+
+function reply(id, result, transfer = []) {
+  self.postMessage({ id, ok: true, result }, transfer);
+}
+
+function fail(id, err) {
+  self.postMessage({ id, ok: false, error: err && err.message ? err.message : String(err) });
+}
+
+async function decodeBatch(blobs, size) {
+  const start = performance.now();
+  const plane = 3 * size * size;
+  const data = Preprocess.acquire(blobs.length * plane, uint8Input ? Uint8Array : Float32Array);
+  // キャンバスを使い回すので1枚ずつ順番に描画する
+  for (let n = 0; n < blobs.length; n++) {
+    await Preprocess.decodeInto(blobs[n], size, data, n * plane);
+  }
+  return { data, batch: blobs.length, preMs: performance.now() - start };
+}
+
+async function infer(input, size) {
+  if (!session) throw new Error('model not loaded');
+  const tensor = Preprocess.makeTensor(input.data, input.batch, size);
+  const start = performance.now();
+  const results = await session.run({ [session.inputNames[0]]: tensor });
+  const time = performance.now() - start;
+  // 入力は WASM 側にコピー済みなので次のバッチに使い回す
+  Preprocess.release(input.data);
+  // 出力はコピーせず、その ArrayBuffer をそのまま転送する（[N, classes] を平坦にしたもの）
+  const output = results[session.outputNames[0]].data;
+  const logits = output.byteOffset === 0 && output.byteLength === output.buffer.byteLength
+    ? output : output.slice();
+  return { logits, batch: input.batch, time, preMs: input.preMs, wasmBytes: WasmMemories.bytes() };
+}